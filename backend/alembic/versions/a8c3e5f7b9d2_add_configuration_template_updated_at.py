@@ -0,0 +1,31 @@
+"""add_configuration_template_updated_at
+
+Revision ID: a8c3e5f7b9d2
+Revises: f2a4c6e8b0d1
+Create Date: 2026-10-19 19:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a8c3e5f7b9d2'
+down_revision: Union[str, Sequence[str], None] = 'f2a4c6e8b0d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        'configuration_templates',
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+    )
+    op.create_index('ix_configuration_templates_updated_at', 'configuration_templates', ['updated_at'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_configuration_templates_updated_at', table_name='configuration_templates')
+    op.drop_column('configuration_templates', 'updated_at')
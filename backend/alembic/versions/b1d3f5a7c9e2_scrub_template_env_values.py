@@ -0,0 +1,50 @@
+"""scrub_template_env_values
+
+Revision ID: b1d3f5a7c9e2
+Revises: a8c3e5f7b9d2
+Create Date: 2026-10-20 10:00:00.000000
+
+Learned configuration templates are shared between users and used to keep
+the env_vars *values* of the project they were learned from (README/LLM
+output, possibly credentials). Templates now store variable names only;
+this rewrites existing rows' env_vars objects into sorted name lists.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b1d3f5a7c9e2'
+down_revision: Union[str, Sequence[str], None] = 'a8c3e5f7b9d2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.execute("""
+        UPDATE configuration_templates
+        SET template = jsonb_set(
+                template::jsonb,
+                '{env_vars}',
+                (SELECT coalesce(jsonb_agg(name ORDER BY name), '[]'::jsonb)
+                 FROM jsonb_object_keys(template::jsonb -> 'env_vars') AS name)
+            )::json,
+            updated_at = now()
+        WHERE jsonb_typeof(template::jsonb -> 'env_vars') = 'object'
+    """)
+
+
+def downgrade() -> None:
+    # Older code expects an object; the values are gone by design, so names map to ""
+    op.execute("""
+        UPDATE configuration_templates
+        SET template = jsonb_set(
+                template::jsonb,
+                '{env_vars}',
+                (SELECT coalesce(jsonb_object_agg(name, ''), '{}'::jsonb)
+                 FROM jsonb_array_elements_text(template::jsonb -> 'env_vars') AS name)
+            )::json
+        WHERE jsonb_typeof(template::jsonb -> 'env_vars') = 'array'
+    """)
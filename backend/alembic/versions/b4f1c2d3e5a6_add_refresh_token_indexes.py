@@ -0,0 +1,52 @@
+"""add_refresh_token_indexes
+
+Revision ID: b4f1c2d3e5a6
+Revises: 7c2a1be9b9d1
+Create Date: 2026-10-19 09:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b4f1c2d3e5a6'
+down_revision: Union[str, Sequence[str], None] = '7c2a1be9b9d1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    # CONCURRENTLY cannot run inside a transaction; build without blocking logins.
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_refresh_tokens_user_id_revoked',
+            'refresh_tokens',
+            ['user_id', 'revoked'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            'ix_refresh_tokens_expires_at',
+            'refresh_tokens',
+            ['expires_at'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_refresh_tokens_expires_at',
+            table_name='refresh_tokens',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
+        op.drop_index(
+            'ix_refresh_tokens_user_id_revoked',
+            table_name='refresh_tokens',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
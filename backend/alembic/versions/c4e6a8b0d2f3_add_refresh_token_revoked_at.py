@@ -0,0 +1,30 @@
+"""add_refresh_token_revoked_at
+
+Revision ID: c4e6a8b0d2f3
+Revises: b1d3f5a7c9e2
+Create Date: 2026-10-21 09:00:00.000000
+
+Two concurrent refreshes of one token have a single winner; the loser
+sees a revoked token. revoked_at lets /auth/refresh tell that race apart
+from real reuse, which revokes the whole token family.
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4e6a8b0d2f3'
+down_revision: Union[str, Sequence[str], None] = 'b1d3f5a7c9e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('refresh_tokens', sa.Column('revoked_at', sa.DateTime(timezone=True), nullable=True))
+
+
+def downgrade() -> None:
+    op.drop_column('refresh_tokens', 'revoked_at')
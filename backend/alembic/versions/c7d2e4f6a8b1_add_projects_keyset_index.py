@@ -0,0 +1,40 @@
+"""add_projects_keyset_index
+
+Revision ID: c7d2e4f6a8b1
+Revises: b4f1c2d3e5a6
+Create Date: 2026-10-19 10:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c7d2e4f6a8b1'
+down_revision: Union[str, Sequence[str], None] = 'b4f1c2d3e5a6'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            'ix_projects_user_id_created_at_id',
+            'projects',
+            ['user_id', sa.text('created_at DESC'), sa.text('id DESC')],
+            postgresql_include=['name', 'type', 'status', 'port'],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index(
+            'ix_projects_user_id_created_at_id',
+            table_name='projects',
+            postgresql_concurrently=True,
+            if_exists=True,
+        )
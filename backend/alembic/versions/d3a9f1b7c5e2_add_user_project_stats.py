@@ -0,0 +1,54 @@
+"""add_user_project_stats
+
+Revision ID: d3a9f1b7c5e2
+Revises: c7d2e4f6a8b1
+Create Date: 2026-10-19 12:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'd3a9f1b7c5e2'
+down_revision: Union[str, Sequence[str], None] = 'c7d2e4f6a8b1'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        'user_project_stats',
+        sa.Column('user_id', sa.String(length=50), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('total_installs', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('successful_installs', sa.Integer(), nullable=False, server_default='0'),
+    )
+    op.create_table(
+        'user_stack_counts',
+        sa.Column('user_id', sa.String(length=50), sa.ForeignKey('users.id', ondelete='CASCADE'), primary_key=True),
+        sa.Column('stack', sa.String(length=50), primary_key=True),
+        sa.Column('count', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+    # Backfill from existing projects
+    op.execute("""
+        INSERT INTO user_project_stats (user_id, total_installs, successful_installs)
+        SELECT user_id, count(*), count(*) FILTER (WHERE status = 'running')
+        FROM projects
+        WHERE user_id IS NOT NULL
+        GROUP BY user_id
+    """)
+    op.execute("""
+        INSERT INTO user_stack_counts (user_id, stack, count)
+        SELECT user_id, type, count(*)
+        FROM projects
+        WHERE user_id IS NOT NULL AND type IS NOT NULL
+        GROUP BY user_id, type
+    """)
+
+
+def downgrade() -> None:
+    op.drop_table('user_stack_counts')
+    op.drop_table('user_project_stats')
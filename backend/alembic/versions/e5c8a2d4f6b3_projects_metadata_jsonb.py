@@ -0,0 +1,97 @@
+"""projects_metadata_jsonb
+
+Revision ID: e5c8a2d4f6b3
+Revises: d3a9f1b7c5e2
+Create Date: 2026-10-19 14:00:00.000000
+
+Converts projects.metadata from json to jsonb without the table rewrite
+(and ACCESS EXCLUSIVE lock for its whole duration) that
+ALTER COLUMN ... TYPE jsonb would take:
+
+  1. add a nullable jsonb shadow column (catalog-only change)
+  2. keep it in sync with a trigger while existing rows are backfilled
+     in small committed batches
+  3. swap the columns in one short transaction
+  4. build the filter indexes CONCURRENTLY
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e5c8a2d4f6b3'
+down_revision: Union[str, Sequence[str], None] = 'd3a9f1b7c5e2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH_SIZE = 5000
+
+INDEXES = {
+    'ix_projects_user_id_detected_pm':
+        "ON projects (user_id, (metadata ->> 'detected_pm'))",
+    'ix_projects_metadata_env_vars':
+        "ON projects USING gin ((metadata -> 'env_vars'))",
+    'ix_projects_metadata_version_constraints':
+        "ON projects USING gin ((metadata -> 'version_constraints'))",
+}
+
+
+def upgrade() -> None:
+    op.execute("ALTER TABLE projects ADD COLUMN IF NOT EXISTS metadata_jsonb jsonb")
+    op.execute("""
+        CREATE OR REPLACE FUNCTION projects_metadata_jsonb_sync() RETURNS trigger AS $$
+        BEGIN
+            NEW.metadata_jsonb := NEW.metadata::jsonb;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER projects_metadata_jsonb_sync
+        BEFORE INSERT OR UPDATE OF metadata ON projects
+        FOR EACH ROW EXECUTE FUNCTION projects_metadata_jsonb_sync()
+    """)
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        while True:
+            result = bind.execute(sa.text("""
+                UPDATE projects SET metadata_jsonb = metadata::jsonb
+                WHERE id IN (
+                    SELECT id FROM projects
+                    WHERE metadata IS NOT NULL AND metadata_jsonb IS NULL
+                    LIMIT :batch
+                    FOR UPDATE SKIP LOCKED
+                )
+            """), {"batch": BACKFILL_BATCH_SIZE})
+            if result.rowcount == 0:
+                break
+
+    # Short critical section: the lock is held only for catalog updates
+    op.execute("SET LOCAL lock_timeout = '5s'")
+    op.execute("LOCK TABLE projects IN ACCESS EXCLUSIVE MODE")
+    op.execute("UPDATE projects SET metadata_jsonb = metadata::jsonb "
+               "WHERE metadata IS NOT NULL AND metadata_jsonb IS NULL")
+    op.execute("DROP TRIGGER projects_metadata_jsonb_sync ON projects")
+    op.execute("DROP FUNCTION projects_metadata_jsonb_sync()")
+    op.execute("ALTER TABLE projects DROP COLUMN metadata")
+    op.execute("ALTER TABLE projects RENAME COLUMN metadata_jsonb TO metadata")
+
+    with op.get_context().autocommit_block():
+        for name, definition in INDEXES.items():
+            op.execute(f"CREATE INDEX CONCURRENTLY IF NOT EXISTS {name} {definition}")
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for name in INDEXES:
+            op.execute(f"DROP INDEX CONCURRENTLY IF EXISTS {name}")
+
+    op.alter_column(
+        'projects', 'metadata',
+        type_=sa.JSON(),
+        postgresql_using='metadata::json',
+    )
@@ -0,0 +1,56 @@
+"""add_installation_events
+
+Revision ID: e7f1b3c5d9a2
+Revises: e5c8a2d4f6b3
+Create Date: 2026-10-19 16:00:00.000000
+
+Append-only step events, range-partitioned by month on ts. Upcoming
+partitions are created by the maintenance.install_event_partitions task;
+this migration creates the current month and the next three.
+
+"""
+from datetime import date
+from typing import Sequence, Union
+
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e7f1b3c5d9a2'
+down_revision: Union[str, Sequence[str], None] = 'e5c8a2d4f6b3'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+INITIAL_MONTHS = 4
+
+
+def _month_start(day: date, offset: int) -> date:
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def upgrade() -> None:
+    op.execute("""
+        CREATE TABLE installation_events (
+            history_id  INTEGER      NOT NULL,
+            ts          TIMESTAMPTZ  NOT NULL,
+            seq         BIGINT       NOT NULL,
+            project_id  VARCHAR(50)  NOT NULL,
+            step        VARCHAR(100),
+            kind        VARCHAR(20)  NOT NULL,
+            message     TEXT,
+            data        JSONB,
+            PRIMARY KEY (history_id, ts, seq)
+        ) PARTITION BY RANGE (ts)
+    """)
+    today = date.today()
+    for offset in range(INITIAL_MONTHS):
+        month = _month_start(today, offset)
+        op.execute(
+            f"CREATE TABLE installation_events_{month:%Y_%m} PARTITION OF installation_events "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_month_start(month, 1).isoformat()}')"
+        )
+
+
+def downgrade() -> None:
+    op.execute("DROP TABLE IF EXISTS installation_events")  # drops all partitions
@@ -0,0 +1,35 @@
+"""add_error_pattern_lsh
+
+Revision ID: f2a4c6e8b0d1
+Revises: e7f1b3c5d9a2
+Create Date: 2026-10-19 18:00:00.000000
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2a4c6e8b0d1'
+down_revision: Union[str, Sequence[str], None] = 'e7f1b3c5d9a2'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column('error_patterns', sa.Column('minhash', sa.LargeBinary(), nullable=True))
+    op.create_table(
+        'error_pattern_bands',
+        sa.Column('band', sa.SmallInteger(), primary_key=True),
+        sa.Column('bucket', sa.BigInteger(), primary_key=True),
+        sa.Column('pattern_id', sa.Integer(), sa.ForeignKey('error_patterns.id', ondelete='CASCADE'), primary_key=True),
+    )
+    op.create_index('ix_error_pattern_bands_pattern_id', 'error_pattern_bands', ['pattern_id'])
+
+
+def downgrade() -> None:
+    op.drop_index('ix_error_pattern_bands_pattern_id', table_name='error_pattern_bands')
+    op.drop_table('error_pattern_bands')
+    op.drop_column('error_patterns', 'minhash')
@@ -8,7 +8,7 @@ from sqlalchemy.ext.asyncio import AsyncSession
 from app.core.database import get_db
 from app.core.security import decode_access_token
 from app.models.user import User
-from app.services.user_service import get_user_by_id
+from app.services.user_service import get_user_by_id_cached
 
 bearer_scheme = HTTPBearer(auto_error=False)
 
@@ -30,6 +30,9 @@ async def get_current_user(
     """
     Validate the Bearer JWT and return the authenticated User.
     Raises 401 if missing, invalid, or expired.
+
+    The user is served from the snapshot cache when possible, so the
+    returned object may be detached from `db` — treat it as read-only.
     """
     if credentials is None:
         raise _401
@@ -43,7 +46,7 @@ async def get_current_user(
     if not user_id:
         raise _401
 
-    user = await get_user_by_id(db, user_id)
+    user = await get_user_by_id_cached(db, user_id)
     if user is None or not user.is_active:
         raise _401
 
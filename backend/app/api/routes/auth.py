@@ -1,7 +1,7 @@
-from datetime import datetime, timezone
 from typing import Optional
 
-from fastapi import APIRouter, Cookie, Depends, HTTPException, Request, Response, status
+from fastapi import APIRouter, Cookie, Depends, HTTPException, Query, Request, Response, status
+from fastapi import status as status_codes
 from jose import JWTError
 from sqlalchemy.ext.asyncio import AsyncSession
 
@@ -19,7 +19,7 @@ from app.core.security import (
     decode_signed_token,
     generate_refresh_token,
     hash_refresh_token,
-    verify_password,
+    verify_password_async,
 )
 from app.models.user import User
 from app.schemas.auth import (
@@ -34,15 +34,25 @@ from app.schemas.auth import (
     UserStats,
 )
 from app.services.email_service import send_password_reset_email, send_verification_email
+from app.services.project_service import (
+    CountMode,
+    InvalidCursor,
+    ProjectFilters,
+    get_user_projects_page,
+    get_user_stats,
+)
 from app.services.user_service import (
     activate_user,
     create_user,
     get_refresh_token,
     get_user_by_email,
     get_user_by_id,
+    get_user_by_id_cached,
     revoke_all_user_refresh_tokens,
-    revoke_refresh_token,
+    revoke_refresh_token_by_hash,
     revoke_token_family,
+    revoked_recently,
+    rotate_refresh_token,
     save_refresh_token,
     update_last_login,
     update_password,
@@ -81,12 +91,6 @@ def _rate_limit_error(retry_after: int) -> HTTPException:
     )
 
 
-def _as_utc(dt: datetime) -> datetime:
-    if dt.tzinfo is None:
-        return dt.replace(tzinfo=timezone.utc)
-    return dt.astimezone(timezone.utc)
-
-
 # ---------------------------------------------------------------------------
 # POST /auth/register
 # ---------------------------------------------------------------------------
@@ -154,7 +158,7 @@ async def login(
 
     # Constant-time: always verify even if user doesn't exist (dummy hash)
     _dummy = "$2b$12$aaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaaa"
-    password_ok = verify_password(body.password, user.password_hash if user else _dummy)
+    password_ok = await verify_password_async(body.password, user.password_hash if user else _dummy)
 
     if not user or not password_ok or not user.is_active or not user.is_verified:
         # Deliberately vague: never reveal which field is wrong
@@ -185,33 +189,40 @@ async def refresh_token(
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Missing refresh token")
 
     token_hash = hash_refresh_token(refresh_token)
-    rt = await get_refresh_token(db, token_hash)
+    raw_new, hashed_new = generate_refresh_token()
 
-    if rt is None:
-        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+    # Rotate: revoke old + issue new in one conditional write
+    user_id = await rotate_refresh_token(db, token_hash, hashed_new)
 
-    if rt.revoked:
-        # Reuse detected — revoke entire token family
-        await revoke_token_family(db, rt.user_id)
-        await db.commit()  # Commit revocation durably before raising
-        _clear_refresh_cookie(response)
-        raise HTTPException(
-            status_code=status.HTTP_401_UNAUTHORIZED,
-            detail="Session compromised. Please log in again.",
-        )
+    if user_id is None:
+        # Slow path: work out why the token could not be claimed
+        rt = await get_refresh_token(db, token_hash)
+        if rt is None:
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid refresh token")
+
+        if rt.revoked and revoked_recently(rt):
+            # Lost a race with a concurrent refresh (e.g. another tab): its new
+            # token is live and the cookie it set wins, so just refuse this one
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token already used")
+
+        if rt.revoked:
+            # Reuse detected — revoke entire token family
+            await revoke_token_family(db, rt.user_id)
+            await db.commit()  # Commit revocation durably before raising
+            _clear_refresh_cookie(response)
+            raise HTTPException(
+                status_code=status.HTTP_401_UNAUTHORIZED,
+                detail="Session compromised. Please log in again.",
+            )
 
-    if _as_utc(rt.expires_at) < datetime.now(timezone.utc):
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Refresh token expired")
 
-    user = await get_user_by_id(db, rt.user_id)
+    user = await get_user_by_id_cached(db, user_id)
     if not user or not user.is_active:
+        # Raising rolls the rotation back with the rest of the transaction
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Account inactive")
 
-    # Rotate: revoke old, issue new
-    await revoke_refresh_token(db, rt)
     new_access = create_access_token(user.id, user.role.value if hasattr(user.role, 'value') else user.role)
-    raw_new, hashed_new = generate_refresh_token()
-    await save_refresh_token(db, user.id, hashed_new)
 
     _set_refresh_cookie(response, raw_new)
 
@@ -230,10 +241,7 @@ async def logout(
     db: AsyncSession = Depends(get_db),
 ) -> MessageResponse:
     if refresh_token:
-        token_hash = hash_refresh_token(refresh_token)
-        rt = await get_refresh_token(db, token_hash)
-        if rt and not rt.revoked:
-            await revoke_refresh_token(db, rt)
+        await revoke_refresh_token_by_hash(db, hash_refresh_token(refresh_token))
 
     _clear_refresh_cookie(response)
     return MessageResponse(message="Logged out successfully")
@@ -313,37 +321,37 @@ async def get_me(current_user: CurrentUser) -> UserProfile:
 async def get_my_projects(
     current_user: CurrentUser,
     db: AsyncSession = Depends(get_db),
-    page: int = 1,
-    per_page: int = 20,
+    page: int = Query(1, ge=1),
+    per_page: int = Query(20, ge=1, le=100),
+    cursor: Optional[str] = None,
+    count: CountMode = "exact",
     status: Optional[str] = None,
     type: Optional[str] = None,
+    pm: Optional[str] = Query(None, max_length=50),
+    env_var: Optional[str] = Query(None, max_length=255),
+    constraint: Optional[str] = Query(None, max_length=100),
 ) -> PaginatedProjects:
-    from sqlalchemy import select, func
-    from app.models.project import Project
-
-    query = select(Project).where(Project.user_id == current_user.id)
-
-    if status:
-        query = query.where(Project.status == status)
-    if type:
-        query = query.where(Project.type == type)
-
-    count_result = await db.execute(select(func.count()).select_from(query.subquery()))
-    total = count_result.scalar_one()
-
-    query = query.order_by(Project.created_at.desc())
-    query = query.offset((page - 1) * per_page).limit(per_page)
-    result = await db.execute(query)
-    projects = result.scalars().all()
-
-    from app.schemas.auth import ProjectSummary
-    return PaginatedProjects(
-        items=[ProjectSummary.model_validate(p) for p in projects],
-        total=total,
-        page=page,
-        per_page=per_page,
-        pages=-(-total // per_page),  # ceiling division
+    """
+    Newest-first project history.
+
+    Prefer `cursor` (from the previous page's `next_cursor`) over `page`:
+    cursor pages cost the same at any depth. `count=estimate` caps the
+    total at PROJECTS_COUNT_ESTIMATE_CAP; `count=none` skips counting.
+
+    Metadata filters: `pm` (detected package manager), `env_var` (project
+    declares that env var), `constraint` (has a version constraint for it).
+    """
+    filters = ProjectFilters(
+        status=status, type=type, pm=pm, env_var=env_var, constraint=constraint,
     )
+    try:
+        payload = await get_user_projects_page(
+            db, current_user.id, per_page,
+            page=page, cursor=cursor, count=count, filters=filters,
+        )
+    except InvalidCursor:
+        raise HTTPException(status_code=status_codes.HTTP_400_BAD_REQUEST, detail="Invalid cursor")
+    return PaginatedProjects(**payload)
 
 
 # ---------------------------------------------------------------------------
@@ -355,23 +363,13 @@ async def get_my_stats(
     current_user: CurrentUser,
     db: AsyncSession = Depends(get_db),
 ) -> UserStats:
-    from sqlalchemy import select, func, case
-    from app.models.project import Project
-
-    result = await db.execute(
-        select(
-            func.count(Project.id).label("total"),
-            func.sum(case((Project.status == "running", 1), else_=0)).label("successful"),
-            func.mode().within_group(Project.type.asc()).label("most_used_stack"),
-        ).where(Project.user_id == current_user.id)
-    )
-    row = result.one()
-    total = row.total or 0
-    successful = int(row.successful or 0)
+    stats = await get_user_stats(db, current_user.id)
+    total = stats["total_installs"]
+    successful = stats["successful_installs"]
 
     return UserStats(
         total_installs=total,
         successful_installs=successful,
         success_rate=round((successful / total * 100) if total > 0 else 0.0, 1),
-        most_used_stack=row.most_used_stack,
+        most_used_stack=stats["most_used_stack"],
     )
@@ -15,10 +15,16 @@ from pydantic import BaseModel
 from typing import Optional, Dict, Any
 from app.core.analysis.project_analyzer import ProjectAnalyzer
 from app.core.analysis.nlp_processor import NLPProcessor
-from app.core.database import get_db                     # ← one import, always async
+from app.core.database import AsyncSessionLocal, get_db  # ← one import, always async
 from app.api.dependencies import CurrentUser
-from app.db.crud import project_crud
+from app.services.project_service import create_user_project, set_project_status
 from app.models.project import Project, ProjectStatus
+from app.models.installation_history import InstallationHistory
+from app.services.install_events import get_install_timeline
+from app.services.port_allocator import port_allocator
+from app.services.process_supervisor import supervisor
+from app.services.step_executor import build_plan, find_run_step, install_project
+from app.services.template_index import apply_template, find_template
 
 logger = logging.getLogger(__name__)
 
@@ -43,7 +49,7 @@ PATH_MAPPINGS = [
 TASK_PROGRESS: Dict[str, Dict[str, Any]] = {}
 TASK_PROGRESS_LOCK = threading.Lock()
 TASK_CANCELLED: set[str] = set()
-TASK_PROCESSES: Dict[str, subprocess.Popen] = {}
+TASK_PROCESSES: Dict[str, set[subprocess.Popen]] = {}   # parallel install steps run several at once
 
 
 class TaskCancelledError(Exception):
@@ -61,14 +67,21 @@ def _register_task_process(task_id: Optional[str], process: subprocess.Popen) ->
     if not task_id:
         return
     with TASK_PROGRESS_LOCK:
-        TASK_PROCESSES[task_id] = process
+        TASK_PROCESSES.setdefault(task_id, set()).add(process)
 
 
-def _unregister_task_process(task_id: Optional[str]) -> None:
+def _unregister_task_process(task_id: Optional[str], process: Optional[subprocess.Popen] = None) -> None:
     if not task_id:
         return
     with TASK_PROGRESS_LOCK:
-        TASK_PROCESSES.pop(task_id, None)
+        if process is None:
+            TASK_PROCESSES.pop(task_id, None)
+            return
+        processes = TASK_PROCESSES.get(task_id)
+        if processes is not None:
+            processes.discard(process)
+            if not processes:
+                del TASK_PROCESSES[task_id]
 
 
 def _request_task_cancel(task_id: str) -> bool:
@@ -76,10 +89,11 @@ def _request_task_cancel(task_id: str) -> bool:
         if task_id not in TASK_PROGRESS:
             return False
         TASK_CANCELLED.add(task_id)
-        process = TASK_PROCESSES.get(task_id)
+        processes = list(TASK_PROCESSES.get(task_id, ()))
 
-    if process and process.poll() is None:
-        process.terminate()
+    for process in processes:
+        if process.poll() is None:
+            process.terminate()
 
     return True
 
@@ -94,6 +108,8 @@ def set_task_progress(
     error: Optional[str] = None,
     project_id: Optional[str] = None,
     host_path: Optional[str] = None,
+    history_id: Optional[int] = None,
+    ready_latency_ms: Optional[float] = None,
 ):
     payload: Dict[str, Any] = {
         "task_id": task_id,
@@ -107,6 +123,10 @@ def set_task_progress(
         payload["project_id"] = project_id
     if host_path:
         payload["host_path"] = host_path
+    if history_id:
+        payload["history_id"] = history_id
+    if ready_latency_ms is not None:
+        payload["ready_latency_ms"] = ready_latency_ms
 
     with TASK_PROGRESS_LOCK:
         previous = TASK_PROGRESS.get(task_id, {})
@@ -223,17 +243,28 @@ async def create_project(
             logger.exception("detect_project_type failed: %s", e)
             raise HTTPException(status_code=500, detail=f"Project analysis failed: {e}")
 
+        template = None
         try:
-            set_task_progress(
-                task_id,
-                stage="analyzing",
-                progress=86,
-                message="Parsing README instructions...",
-            )
-            nlp_result = await loop.run_in_executor(None, nlp.parse_readme, project_path)
-            info = nlp.merge_with_project_info(info, nlp_result)
+            template = await find_template(db, info.primary_language, info.primary_pm)
         except Exception as e:
-            logger.warning("NLP analysis failed (non-fatal): %s", e)
+            logger.warning("Template lookup failed (non-fatal): %s", e)
+
+        if template is not None:
+            # Known-good setup for this stack: no README parsing / LLM round trip
+            logger.info("Using configuration template %s (score %.2f)", template.id, template.score)
+            info = apply_template(info, template)
+        else:
+            try:
+                set_task_progress(
+                    task_id,
+                    stage="analyzing",
+                    progress=86,
+                    message="Parsing README instructions...",
+                )
+                nlp_result = await loop.run_in_executor(None, nlp.parse_readme, project_path)
+                info = nlp.merge_with_project_info(info, nlp_result)
+            except Exception as e:
+                logger.warning("NLP analysis failed (non-fatal): %s", e)
 
         if _is_task_cancelled(task_id):
             raise TaskCancelledError("task_cancelled")
@@ -247,7 +278,7 @@ async def create_project(
                 progress=93,
                 message="Saving project metadata...",
             )
-            await project_crud.create(db, {       # ← await added
+            await create_user_project(db, {
                 "id": project_id,
                 "name": project_name,
                 "user_id": current_user.id,      # <-- added user_id
@@ -259,6 +290,7 @@ async def create_project(
                     "steps": info.steps,
                     "env_vars": info.env_vars,
                     "version_constraints": info.version_constraints,
+                    "template_id": template.id if template else None,
                 },
             })
             logger.info("Project '%s' saved with id '%s'", project_name, project_id)
@@ -288,6 +320,7 @@ async def create_project(
             "steps": info.steps,
             "env_vars": info.env_vars,
             "version_constraints": info.version_constraints,
+            "template_id": template.id if template else None,
         }
 
     except TaskCancelledError:
@@ -378,6 +411,214 @@ async def get_project(
         "metadata": project.metadata_,
     }
 
+
+@router.get("/api/projects/{project_id}/installations/{history_id}/timeline")
+async def get_installation_timeline(
+    project_id: str,
+    history_id: int,
+    current_user: CurrentUser,
+    include_output: bool = True,
+    db: AsyncSession = Depends(get_db),
+):
+    result = await db.execute(
+        select(InstallationHistory, Project.user_id)
+        .join(Project, Project.id == InstallationHistory.project_id)
+        .where(InstallationHistory.id == history_id, InstallationHistory.project_id == project_id)
+    )
+    row = result.one_or_none()
+    if not row:
+        raise HTTPException(status_code=404, detail="Installation not found")
+    if row.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return await get_install_timeline(db, row.InstallationHistory, include_output=include_output)
+
+_INSTALL_TASKS: set[asyncio.Task] = set()   # strong refs so running installs are not collected
+
+
+async def _run_install(project_id: str, task_id: str) -> None:
+    """Background half of POST /install: runs on its own session, reports through TASK_PROGRESS."""
+    async with AsyncSessionLocal() as db:
+        project = await db.get(Project, project_id)
+        if project is None:          # deleted since the POST
+            set_task_progress(task_id, stage="failed", progress=100, message="Project no longer exists.",
+                              done=True, error="project_not_found", project_id=project_id)
+            return
+        total, finished, history_id = 0, 0, None
+
+        def on_history(history: InstallationHistory) -> None:
+            nonlocal history_id
+            history_id = history.id
+            set_task_progress(task_id, stage="installing", progress=1, message="Installing...",
+                              project_id=project_id, history_id=history_id)
+
+        def on_step(step, result) -> None:
+            nonlocal finished
+            if result is not None:
+                finished += 1
+            set_task_progress(
+                task_id,
+                stage="installing",
+                progress=1 + 98 * finished / max(1, total),
+                message=f"Running {step.name}..." if result is None else f"{step.name}: {result.status}",
+                project_id=project_id,
+                history_id=history_id,
+            )
+
+        try:
+            metadata = project.metadata_ or {}
+            total = len(build_plan(Path(project.path), metadata.get("steps") or [], metadata.get("env_vars") or {}))
+            history = await install_project(
+                db, project,
+                is_cancelled=lambda: _is_task_cancelled(task_id),
+                on_process_start=lambda process: _register_task_process(task_id, process),
+                on_process_exit=lambda process: _unregister_task_process(task_id, process),
+                on_step=on_step,
+                on_history=on_history,
+            )
+        except Exception as e:
+            logger.exception("Installation of %s failed: %s", project_id, e)
+            await db.rollback()
+            await set_project_status(db, project_id, ProjectStatus.failed)
+            await db.commit()
+            set_task_progress(task_id, stage="failed", progress=100, message="Installation failed.",
+                              done=True, error=str(e), project_id=project_id)
+            return
+
+    if _is_task_cancelled(task_id):
+        set_task_progress(task_id, stage="failed", progress=100, message="Task cancelled by user.",
+                          done=True, error="task_cancelled", project_id=project_id, history_id=history.id)
+    elif history.success:
+        set_task_progress(task_id, stage="installed", progress=100, message="Installation complete.",
+                          done=True, project_id=project_id, history_id=history.id)
+    else:
+        set_task_progress(task_id, stage="failed", progress=100, message="Installation failed.",
+                          done=True, error="install_failed", project_id=project_id, history_id=history.id)
+
+
+@router.post("/api/projects/{project_id}/install")
+async def install_project_steps(
+    project_id: str,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db),
+):
+    project = await db.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if project.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if project.status in (ProjectStatus.installing, ProjectStatus.running):
+        raise HTTPException(status_code=409, detail=f"Project is {project.status.value}")
+    if supervisor.active(project_id) is not None:
+        raise HTTPException(status_code=409, detail="Project is running")
+    supervisor.forget(project_id)                # the next start picks up the re-installed run step
+    metadata = project.metadata_ or {}
+    try:
+        build_plan(Path(project.path), metadata.get("steps") or [], metadata.get("env_vars") or {})
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    await set_project_status(db, project_id, ProjectStatus.installing)
+    await db.commit()
+
+    task_id = f"task_{uuid.uuid4().hex[:8]}"
+    set_task_progress(task_id, stage="installing", progress=0, message="Queued", project_id=project_id)
+    task = asyncio.create_task(_run_install(project_id, task_id))
+    _INSTALL_TASKS.add(task)
+    task.add_done_callback(_INSTALL_TASKS.discard)
+    return {"project_id": project_id, "task_id": task_id, "status": "installing"}
+
+async def _owned_project(db: AsyncSession, project_id: str, current_user) -> Project:
+    project = await db.get(Project, project_id)
+    if not project:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if project.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    return project
+
+
+@router.post("/api/projects/{project_id}/start")
+async def start_project(
+    project_id: str,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db),
+):
+    project = await _owned_project(db, project_id, current_user)
+    if project.status in (ProjectStatus.queued, ProjectStatus.analyzing, ProjectStatus.installing):
+        raise HTTPException(status_code=409, detail=f"Project is {project.status.value}")
+    running = supervisor.active(project_id)
+    if running is not None:
+        return running.info()
+    previous = supervisor.get(project_id)        # e.g. stopped for being idle
+    if previous is None:
+        step = find_run_step(Path(project.path), (project.metadata_ or {}).get("steps") or [])
+        if step is None:
+            raise HTTPException(status_code=400, detail="Project has no run step")
+    port = await port_allocator.allocate(project_id, prefer=previous.port if previous else None)
+    if port is None:
+        raise HTTPException(status_code=503, detail="No free port to run the project on")
+
+    task_id = f"task_{uuid.uuid4().hex[:8]}"
+    set_task_progress(task_id, stage="starting", progress=0, message=f"Waiting for the app on port {port}...",
+                      project_id=project_id)
+
+    def _ready(managed) -> None:
+        if managed.state == "unready":
+            set_task_progress(task_id, stage="unready", progress=100, done=True, project_id=project_id,
+                              message=f"Running, but not serving HTTP on port {managed.port} "
+                                      "or any port it listens on.")
+            return
+        latency = managed.ready_latency_ms
+        served = managed.listen_port or managed.port
+        message = f"Serving on port {served}" + (f" after {latency / 1000:.1f}s" if latency is not None else "")
+        set_task_progress(task_id, stage="running", progress=100, message=message, done=True,
+                          project_id=project_id, ready_latency_ms=latency)
+
+    def _ended(_task) -> None:
+        # No-op once _ready has completed the task
+        if managed.state == "stopped":
+            set_task_progress(task_id, stage="stopped", progress=100, message="Stopped before serving traffic.",
+                              done=True, project_id=project_id)
+        else:
+            set_task_progress(task_id, stage="failed", progress=100, message="The app exited before serving traffic.",
+                              done=True, error=f"exit code {managed.exit_code}", project_id=project_id)
+
+    if previous is not None:
+        # Fast resume: the installed environment is reused as is, no plan or install steps
+        managed = await supervisor.resume(project_id, port=port, on_ready=_ready)
+    else:
+        env = {**os.environ, "PORT": str(port)}
+        managed = await supervisor.start(project_id, step.command, step.cwd, env=env, port=port, on_ready=_ready)
+    if managed.port != port:         # a concurrent request started it first
+        await port_allocator.release(port)
+        return managed.info()
+    managed.task.add_done_callback(_ended)
+    return {**managed.info(), "task_id": task_id}
+
+
+@router.post("/api/projects/{project_id}/stop")
+async def stop_project(
+    project_id: str,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db),
+):
+    await _owned_project(db, project_id, current_user)
+    if not await supervisor.stop(project_id):
+        raise HTTPException(status_code=404, detail="Project is not running")
+    return supervisor.get(project_id).info()
+
+
+@router.get("/api/projects/{project_id}/process")
+async def get_project_process(
+    project_id: str,
+    current_user: CurrentUser,
+    db: AsyncSession = Depends(get_db),
+):
+    await _owned_project(db, project_id, current_user)
+    managed = supervisor.get(project_id)
+    if managed is None:
+        raise HTTPException(status_code=404, detail="Project is not supervised")
+    return managed.info()
+
 #------------------------------------------------
 # GET api/user/me/projects is defined in auth.py
 #------------------------------------------------
@@ -459,7 +700,7 @@ def _run_git_with_progress(cmd: list[str], task_id: Optional[str], base: int, sp
                     process.wait(timeout=3)
                 except subprocess.TimeoutExpired:
                     process.kill()
-            _unregister_task_process(task_id)
+            _unregister_task_process(task_id, process)
             raise TaskCancelledError("task_cancelled")
 
         now = time.monotonic()
@@ -501,7 +742,7 @@ def _run_git_with_progress(cmd: list[str], task_id: Optional[str], base: int, sp
                 raise TaskCancelledError("task_cancelled")
             raise subprocess.CalledProcessError(return_code, cmd)
     finally:
-        _unregister_task_process(task_id)
+        _unregister_task_process(task_id, process)
 
     if task_id:
         set_task_progress(
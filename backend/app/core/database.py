@@ -1,8 +1,11 @@
-from typing import AsyncGenerator
+import time
+from typing import AsyncGenerator, Optional
 
-from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession, async_sessionmaker, create_async_engine
+from sqlalchemy.pool import AsyncAdaptedQueuePool, Pool
 
 from app.core.config import settings
+from app.core.metrics import Gauge, Histogram
 
 
 def _to_async_database_url(url: str) -> str:
@@ -13,16 +16,75 @@ def _to_async_database_url(url: str) -> str:
     return url
 
 
-engine = create_async_engine(
-    _to_async_database_url(settings.DATABASE_URL),
-    echo=settings.DEBUG,
-    pool_size=10,
-    max_overflow=20,
+# ---------------------------------------------------------------------------
+# Engine factory  (the only place the app builds a Postgres pool)
+# ---------------------------------------------------------------------------
+
+db_pool_checkout_wait = Histogram(
+    "db_pool_checkout_wait_seconds",
+    "Time spent waiting for a connection from the SQLAlchemy pool.",
 )
 
+
+class _InstrumentedQueuePool(AsyncAdaptedQueuePool):
+    """Queue pool that records how long each checkout waited for a connection."""
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            db_pool_checkout_wait.observe(time.perf_counter() - start)
+
+
+def create_engine_from_settings(poolclass: Optional[type[Pool]] = None) -> AsyncEngine:
+    """
+    Build an async engine from Settings.
+
+    The default pool is sized by DB_POOL_SIZE + DB_MAX_OVERFLOW per process, so
+    connections per replica are predictable. Pass poolclass=NullPool for
+    short-lived engines (e.g. Celery tasks running their own event loop).
+    """
+    url = _to_async_database_url(settings.DATABASE_URL)
+    kwargs: dict = {
+        "echo": settings.DEBUG,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+    if poolclass is None:
+        kwargs.update(
+            poolclass=_InstrumentedQueuePool,
+            pool_size=settings.DB_POOL_SIZE,
+            max_overflow=settings.DB_MAX_OVERFLOW,
+            pool_timeout=settings.DB_POOL_TIMEOUT_SECONDS,
+            pool_recycle=settings.DB_POOL_RECYCLE_SECONDS,
+        )
+    else:
+        kwargs["poolclass"] = poolclass
+
+    if url.startswith("postgresql+asyncpg://") and settings.DB_STATEMENT_TIMEOUT_MS > 0:
+        kwargs["connect_args"] = {
+            "server_settings": {"statement_timeout": str(settings.DB_STATEMENT_TIMEOUT_MS)},
+        }
+
+    return create_async_engine(url, **kwargs)
+
+
+engine = create_engine_from_settings()
+
 AsyncSessionLocal = async_sessionmaker(engine, expire_on_commit=False)
 
 
+def _pool_saturation() -> float:
+    capacity = settings.DB_POOL_SIZE + settings.DB_MAX_OVERFLOW
+    return engine.pool.checkedout() / capacity if capacity else 0.0
+
+
+Gauge("db_pool_size", "Configured persistent connections in the pool.", lambda: engine.pool.size())
+Gauge("db_pool_checked_out", "Connections currently checked out.", lambda: engine.pool.checkedout())
+Gauge("db_pool_overflow", "Overflow connections currently open (negative = unused headroom).", lambda: engine.pool.overflow())
+Gauge("db_pool_saturation", "Checked-out connections / (pool_size + max_overflow).", _pool_saturation)
+
+
 async def get_db() -> AsyncGenerator[AsyncSession, None]:
     async with AsyncSessionLocal() as session:
         try:
@@ -30,4 +92,4 @@ async def get_db() -> AsyncGenerator[AsyncSession, None]:
             await session.commit()
         except Exception:
             await session.rollback()
-            raise
\ No newline at end of file
+            raise
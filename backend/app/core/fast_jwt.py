@@ -0,0 +1,108 @@
+import base64
+import hashlib
+import hmac
+import json
+import time
+from calendar import timegm
+from datetime import datetime
+
+from jose.exceptions import ExpiredSignatureError, JWTClaimsError, JWTError
+
+# ---------------------------------------------------------------------------
+# Lean HMAC JWT codec
+#
+# Produces byte-identical tokens to python-jose for the HS* algorithms and
+# validates the same registered claims (exp, nbf, iat, sub), without the
+# generic JWK/JWS machinery. Raises jose's exception types so callers do
+# not need to care which implementation ran.
+# ---------------------------------------------------------------------------
+
+_HASHES = {
+    "HS256": hashlib.sha256,
+    "HS384": hashlib.sha384,
+    "HS512": hashlib.sha512,
+}
+
+SUPPORTED_ALGORITHMS = frozenset(_HASHES)
+
+
+def _b64encode(data: bytes) -> bytes:
+    return base64.urlsafe_b64encode(data).rstrip(b"=")
+
+
+def _b64decode(data: bytes) -> bytes:
+    return base64.urlsafe_b64decode(data + b"=" * (-len(data) % 4))
+
+
+def _header_segment(algorithm: str) -> bytes:
+    header = json.dumps({"alg": algorithm, "typ": "JWT"}, separators=(",", ":"), sort_keys=True)
+    return _b64encode(header.encode("utf-8"))
+
+
+_HEADER_SEGMENTS = {alg: _header_segment(alg) for alg in _HASHES}
+
+
+def _sign(signing_input: bytes, key: str, algorithm: str) -> bytes:
+    return hmac.new(key.encode("utf-8"), signing_input, _HASHES[algorithm]).digest()
+
+
+def encode(claims: dict, key: str, algorithm: str) -> str:
+    """Sign `claims`; datetime values of exp/iat/nbf become integer timestamps."""
+    claims = dict(claims)
+    for time_claim in ("exp", "iat", "nbf"):
+        value = claims.get(time_claim)
+        if isinstance(value, datetime):
+            claims[time_claim] = timegm(value.utctimetuple())
+
+    payload = _b64encode(json.dumps(claims, separators=(",", ":")).encode("utf-8"))
+    signing_input = _HEADER_SEGMENTS[algorithm] + b"." + payload
+    return (signing_input + b"." + _b64encode(_sign(signing_input, key, algorithm))).decode("utf-8")
+
+
+def decode(token: str, key: str, algorithm: str) -> dict:
+    """Verify the signature and registered claims of `token`. Raises JWTError on failure."""
+    try:
+        raw = token.encode("utf-8")
+        signing_input, signature = raw.rsplit(b".", 1)
+        header_segment, payload_segment = signing_input.split(b".", 1)
+    except ValueError:
+        raise JWTError("Not enough segments")
+
+    if header_segment != _HEADER_SEGMENTS[algorithm]:
+        # Tokens we issue always carry the canonical header; anything else
+        # is parsed only to report the same error jose would.
+        try:
+            header = json.loads(_b64decode(header_segment))
+        except (ValueError, TypeError):
+            raise JWTError("Invalid header padding")
+        if not isinstance(header, dict) or header.get("alg") != algorithm:
+            raise JWTError("The specified alg value is not allowed")
+
+    try:
+        expected = _sign(signing_input, key, algorithm)
+        if not hmac.compare_digest(expected, _b64decode(signature)):
+            raise JWTError("Signature verification failed.")
+        claims = json.loads(_b64decode(payload_segment))
+    except (ValueError, TypeError) as e:
+        raise JWTError(f"Invalid payload string: {e}")
+
+    if not isinstance(claims, dict):
+        raise JWTError("Invalid payload string: must be a json object")
+
+    now = timegm(time.gmtime())
+    if "iat" in claims and not isinstance(claims["iat"], (int, float)):
+        raise JWTClaimsError("Issued At claim (iat) must be an integer.")
+    if "nbf" in claims:
+        if not isinstance(claims["nbf"], (int, float)):
+            raise JWTClaimsError("Not Before claim (nbf) must be an integer.")
+        if claims["nbf"] > now:
+            raise JWTClaimsError("The token is not yet valid (nbf)")
+    if "exp" in claims:
+        if not isinstance(claims["exp"], (int, float)):
+            raise JWTClaimsError("Expiration Time claim (exp) must be an integer.")
+        if claims["exp"] < now:
+            raise ExpiredSignatureError("Signature has expired.")
+    if "sub" in claims and not isinstance(claims["sub"], str):
+        raise JWTClaimsError("Subject must be a string.")
+
+    return claims
@@ -0,0 +1,79 @@
+from sqlalchemy import Boolean, String, literal_column
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.functions import FunctionElement
+
+# ---------------------------------------------------------------------------
+# JSON field predicates that render the same expressions the Postgres
+# indexes on projects.metadata are built on (see app/models/project.py).
+#
+# Field names are fixed in code and rendered inline — an expression index
+# only matches when the key is a literal, not a bind parameter. Values
+# being searched for are always bound.
+# ---------------------------------------------------------------------------
+
+
+class json_field(FunctionElement):
+    """`column -> 'field'` — a top-level field as JSON."""
+    inherit_cache = True
+
+    def __init__(self, column, field: str):
+        super().__init__(column, literal_column(f"'{field}'"))
+        self.type = column.type
+
+
+class json_text(FunctionElement):
+    """`column ->> 'field'` — a top-level field as text."""
+    type = String()
+    inherit_cache = True
+
+    def __init__(self, column, field: str):
+        super().__init__(column, literal_column(f"'{field}'"))
+
+
+class json_has_key(FunctionElement):
+    """True when the object at `column -> 'field'` has the (bound) key `key`."""
+    type = Boolean()
+    inherit_cache = True
+
+    def __init__(self, column, field: str, key):
+        super().__init__(column, literal_column(f"'{field}'"), key)
+
+
+@compiles(json_field, "postgresql")
+def _pg_json_field(element, compiler, **kw):
+    column, field = element.clauses
+    return f"({compiler.process(column, **kw)} -> {compiler.process(field, **kw)})"
+
+
+@compiles(json_field)
+def _json_field(element, compiler, **kw):
+    column, field = element.clauses
+    return f"json_extract({compiler.process(column, **kw)}, '$.' || {compiler.process(field, **kw)})"
+
+
+@compiles(json_text, "postgresql")
+def _pg_json_text(element, compiler, **kw):
+    column, field = element.clauses
+    return f"({compiler.process(column, **kw)} ->> {compiler.process(field, **kw)})"
+
+
+@compiles(json_text)
+def _json_text(element, compiler, **kw):
+    column, field = element.clauses
+    return f"json_extract({compiler.process(column, **kw)}, '$.' || {compiler.process(field, **kw)})"
+
+
+@compiles(json_has_key, "postgresql")
+def _pg_json_has_key(element, compiler, **kw):
+    column, field, key = element.clauses
+    return (
+        f"(({compiler.process(column, **kw)} -> {compiler.process(field, **kw)}) "
+        f"? {compiler.process(key, **kw)})"
+    )
+
+
+@compiles(json_has_key)
+def _json_has_key(element, compiler, **kw):
+    column, field, key = element.clauses
+    path = f"'$.' || {compiler.process(field, **kw)} || '.' || json_quote({compiler.process(key, **kw)})"
+    return f"(json_type({compiler.process(column, **kw)}, {path}) IS NOT NULL)"
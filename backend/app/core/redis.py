@@ -1,43 +1,251 @@
+import math
+import secrets
 import time
+from collections import deque
 from typing import Optional
 
 import redis.asyncio as aioredis
 
 from app.core.config import settings
+from app.core.metrics import Gauge, Histogram
 
 # ---------------------------------------------------------------------------
-# Shared async Redis client
+# Managed async Redis client  (bounded pool, timeouts, latency histograms)
 # ---------------------------------------------------------------------------
 
-_redis: Optional[aioredis.Redis] = None
+redis_command_latency = Histogram(
+    "redis_command_duration_seconds",
+    "Latency of Redis commands issued by the API, by command.",
+    label_names=("command",),
+)
 
 
-async def get_redis() -> aioredis.Redis:
-    global _redis
-    if _redis is None:
-        _redis = await aioredis.from_url(
+class _InstrumentedRedis(aioredis.Redis):
+    """Redis client that records the latency of every command it executes."""
+
+    async def execute_command(self, *args, **options):
+        start = time.perf_counter()
+        try:
+            return await super().execute_command(*args, **options)
+        finally:
+            redis_command_latency.observe(time.perf_counter() - start, str(args[0]).upper())
+
+
+class RedisManager:
+    """
+    Owns the process-wide Redis connection pool.
+
+    Started and closed by the FastAPI lifespan. Code running outside the app
+    (Celery tasks, scripts) gets a lazily started pool on first use; starting
+    is synchronous, so concurrent first callers cannot build two pools.
+    """
+
+    def __init__(self):
+        self._pool: Optional[aioredis.ConnectionPool] = None
+        self._client: Optional[aioredis.Redis] = None
+
+    @property
+    def client(self) -> aioredis.Redis:
+        if self._client is None:
+            self.start()
+        return self._client
+
+    def start(self) -> None:
+        if self._client is not None:
+            return
+        self._pool = aioredis.ConnectionPool.from_url(
             settings.REDIS_URL,
             encoding="utf-8",
             decode_responses=True,
+            max_connections=settings.REDIS_MAX_CONNECTIONS,
+            socket_timeout=settings.REDIS_SOCKET_TIMEOUT_SECONDS,
+            socket_connect_timeout=settings.REDIS_CONNECT_TIMEOUT_SECONDS,
+            retry_on_timeout=True,
+            health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL_SECONDS,
         )
-    return _redis
+        self._client = _InstrumentedRedis(connection_pool=self._pool)
+
+    async def close(self) -> None:
+        client, pool = self._client, self._pool
+        self._client = self._pool = None
+        if client is not None:
+            await client.aclose()
+        if pool is not None:
+            await pool.disconnect()
+
+    def connections_in_use(self) -> int:
+        return len(getattr(self._pool, "_in_use_connections", ())) if self._pool else 0
+
+
+redis_manager = RedisManager()
+
+Gauge(
+    "redis_pool_connections_in_use",
+    "Redis connections currently checked out of the pool.",
+    redis_manager.connections_in_use,
+)
+Gauge(
+    "redis_pool_max_connections",
+    "Configured Redis pool size.",
+    lambda: settings.REDIS_MAX_CONNECTIONS,
+)
+
+
+async def get_redis() -> aioredis.Redis:
+    return redis_manager.client
 
 
 # ---------------------------------------------------------------------------
-# Redis-backed sliding-window rate limiter
+# Redis-backed rate limiter  (one atomic Lua round trip per check)
 # ---------------------------------------------------------------------------
 
+# Sliding window over a sorted set. Denied requests are NOT recorded, so a
+# blocked client cannot grow its set; retry-after comes from the oldest entry.
+# Returns {allowed, retry_after_ms}.
+_SLIDING_WINDOW_LUA = """
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+
+redis.call('ZREMRANGEBYSCORE', key, 0, now - window)
+if redis.call('ZCARD', key) >= limit then
+    local oldest = redis.call('ZRANGE', key, 0, 0, 'WITHSCORES')
+    local retry = window
+    if oldest[2] then
+        retry = tonumber(oldest[2]) + window - now
+    end
+    return {0, retry}
+end
+redis.call('ZADD', key, now, now .. '-' .. ARGV[3])
+redis.call('PEXPIRE', key, window)
+return {1, 0}
+"""
+
+# GCRA (token bucket equivalent): a single "theoretical arrival time" per key,
+# so state is O(1) regardless of traffic. Allows bursts of `limit`, refilling
+# one slot every window/limit. Returns {allowed, retry_after_ms}.
+_GCRA_LUA = """
+local key = KEYS[1]
+local window = tonumber(ARGV[1])
+local limit = tonumber(ARGV[2])
+local interval = window / limit
+local t = redis.call('TIME')
+local now = t[1] * 1000 + math.floor(t[2] / 1000)
+
+local tat = tonumber(redis.call('GET', key)) or now
+if tat < now then
+    tat = now
+end
+local new_tat = tat + interval
+local allow_at = new_tat - window
+if allow_at > now then
+    return {0, math.ceil(allow_at - now)}
+end
+redis.call('SET', key, string.format('%d', math.ceil(new_tat)), 'PX', math.ceil(new_tat - now))
+return {1, 0}
+"""
+
+_SCRIPTS = {
+    "sliding_window": _SLIDING_WINDOW_LUA,
+    "gcra": _GCRA_LUA,
+}
+
+
 class RateLimiter:
     """
-    Sliding window rate limiter using a sorted set per key.
+    Redis rate limiter; the whole decision runs server-side in one EVALSHA.
+
+    algorithm:
+        'sliding_window' — exact count of requests in the last `window_seconds`
+                           (sorted set per key, bounded by `max_attempts`).
+        'gcra'           — generic cell rate algorithm: same long-run rate and
+                           burst size, one integer of state per key.
+
+    Timestamps come from the Redis server clock, so replicas never disagree.
 
-    Each member of the set is a unique request timestamp (float).
-    Members older than `window_seconds` are pruned on every check.
+    With `local_tier` enabled, an in-process pre-filter sits in front of Redis.
+    It remembers "denied until T" answers from Redis and counts the requests
+    this process got approved in the current window. Requests that are certain
+    to be denied are rejected without network I/O; everything else still goes
+    to Redis, which stays the source of truth, so allowed traffic keeps its
+    exact limits.
     """
 
-    def __init__(self, max_attempts: int, window_seconds: int):
+    def __init__(
+        self,
+        max_attempts: int,
+        window_seconds: int,
+        algorithm: str = "sliding_window",
+        local_tier: bool = True,
+    ):
+        if algorithm not in _SCRIPTS:
+            raise ValueError(f"Unknown rate limit algorithm '{algorithm}'")
         self.max_attempts = max_attempts
         self.window_seconds = window_seconds
+        self.algorithm = algorithm
+        self.local_tier = local_tier
+        self._script = None
+        self._denied_until: dict[str, float] = {}
+        self._approved: dict[str, deque[float]] = {}
+
+    def _key(self, identifier: str) -> str:
+        if self.algorithm == "gcra":
+            return f"ratelimit:gcra:{identifier}"
+        return f"ratelimit:{identifier}"
+
+    # -- local tier ---------------------------------------------------------
+
+    @staticmethod
+    def _bounded_set(store: dict, identifier: str, value) -> None:
+        if identifier not in store and len(store) >= settings.RATE_LIMIT_LOCAL_MAX_KEYS:
+            store.pop(next(iter(store)))  # evict the oldest identifier
+        store[identifier] = value
+
+    def _local_retry_after(self, identifier: str, now: float) -> Optional[float]:
+        """Seconds until the identifier may retry, if it is certainly over the limit."""
+        denied_until = self._denied_until.get(identifier)
+        if denied_until is not None:
+            if denied_until > now:
+                return denied_until - now
+            del self._denied_until[identifier]
+
+        if self.algorithm == "sliding_window":
+            # Approvals seen by this process are a lower bound on the global count
+            hits = self._approved.get(identifier)
+            if hits:
+                while hits and hits[0] <= now - self.window_seconds:
+                    hits.popleft()
+                if len(hits) >= self.max_attempts:
+                    return hits[0] + self.window_seconds - now
+                if not hits:
+                    del self._approved[identifier]
+        return None
+
+    def _record_local(self, identifier: str, allowed: bool, retry_after_ms: int, now: float) -> None:
+        if not allowed:
+            self._bounded_set(self._denied_until, identifier, now + retry_after_ms / 1000)
+        elif self.algorithm == "sliding_window":
+            hits = self._approved.get(identifier)
+            if hits is None:
+                hits = deque(maxlen=self.max_attempts)
+                self._bounded_set(self._approved, identifier, hits)
+            hits.append(now)
+
+    # -- Redis tier ---------------------------------------------------------
+
+    async def _check_remote(self, identifier: str) -> tuple[bool, int]:
+        """Run the limiter script; returns (allowed, retry_after_ms)."""
+        redis = await get_redis()
+        if self._script is None or self._script.registered_client is not redis:
+            self._script = redis.register_script(_SCRIPTS[self.algorithm])
+
+        allowed, retry_after_ms = await self._script(
+            keys=[self._key(identifier)],
+            args=[self.window_seconds * 1000, self.max_attempts, secrets.token_hex(4)],
+        )
+        return bool(allowed), int(retry_after_ms)
 
     async def is_allowed(self, identifier: str) -> tuple[bool, int]:
         """
@@ -50,40 +258,28 @@ class RateLimiter:
             (allowed: bool, retry_after_seconds: int)
             retry_after_seconds is 0 when allowed.
         """
-        redis = await get_redis()
-        now = time.time()
-        window_start = now - self.window_seconds
-        key = f"ratelimit:{identifier}"
-
-        pipe = redis.pipeline()
-        # Remove expired entries
-        pipe.zremrangebyscore(key, 0, window_start)
-        # Count remaining
-        pipe.zcard(key)
-        # Add current request with timestamp as both score and member
-        pipe.zadd(key, {str(now): now})
-        # Expire the whole key after one window so Redis cleans up automatically
-        pipe.expire(key, self.window_seconds)
-        results = await pipe.execute()
-
-        count = results[1]  # after pruning, before adding current request
-        if count >= self.max_attempts:
-            # Find the oldest entry to compute retry-after
-            oldest = await redis.zrange(key, 0, 0, withscores=True)
-            if oldest:
-                retry_after = int(self.window_seconds - (now - oldest[0][1])) + 1
-            else:
-                retry_after = self.window_seconds
-            return False, retry_after
-
-        return True, 0
+        if self.local_tier:
+            retry_after = self._local_retry_after(identifier, time.monotonic())
+            if retry_after is not None:
+                return False, max(1, math.ceil(retry_after))
+
+        allowed, retry_after_ms = await self._check_remote(identifier)
+
+        if self.local_tier:
+            self._record_local(identifier, allowed, retry_after_ms, time.monotonic())
+        if allowed:
+            return True, 0
+        return False, max(1, math.ceil(retry_after_ms / 1000))
 
 
 # ---------------------------------------------------------------------------
 # Pre-configured limiters matching the spec (§2.5)
 # ---------------------------------------------------------------------------
 
-login_limiter = RateLimiter(max_attempts=10, window_seconds=900)       # 10 / 15 min / IP
-register_limiter = RateLimiter(max_attempts=10, window_seconds=3600)  # 10 / 1 hr / IP
-forgot_limiter = RateLimiter(max_attempts=3, window_seconds=3600)     # 3 / 1 hr / email
-reset_limiter = RateLimiter(max_attempts=5, window_seconds=3600)      # 5 / 1 hr / token
\ No newline at end of file
+_algorithm = settings.RATE_LIMIT_ALGORITHM
+_local = settings.RATE_LIMIT_LOCAL_TIER
+
+login_limiter = RateLimiter(max_attempts=10, window_seconds=900, algorithm=_algorithm, local_tier=_local)       # 10 / 15 min / IP
+register_limiter = RateLimiter(max_attempts=10, window_seconds=3600, algorithm=_algorithm, local_tier=_local)  # 10 / 1 hr / IP
+forgot_limiter = RateLimiter(max_attempts=3, window_seconds=3600, algorithm=_algorithm, local_tier=_local)     # 3 / 1 hr / email
+reset_limiter = RateLimiter(max_attempts=5, window_seconds=3600, algorithm=_algorithm, local_tier=_local)      # 5 / 1 hr / token
\ No newline at end of file
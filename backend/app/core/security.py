@@ -1,5 +1,11 @@
+import asyncio
 import hashlib
+import os
 import secrets
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
@@ -7,6 +13,7 @@ import bcrypt
 from jose.exceptions import JWTError
 from jose import jwt
 
+from app.core import fast_jwt
 from app.core.config import settings
 
 
@@ -23,10 +30,63 @@ def verify_password(plain: str, hashed: str) -> bool:
     """Constant-time bcrypt comparison."""
     return bcrypt.checkpw(plain.encode(), hashed.encode())
 
+
+# ---------------------------------------------------------------------------
+# Off-loop password hashing  (dedicated pool + admission limit)
+# ---------------------------------------------------------------------------
+
+class PasswordHasherBusy(Exception):
+    """Raised when too many hash/verify calls are in flight; callers answer 503."""
+
+
+_hash_executor: Optional[ThreadPoolExecutor] = None
+_hash_pending = 0
+
+
+def _get_hash_executor() -> ThreadPoolExecutor:
+    global _hash_executor
+    if _hash_executor is None:
+        workers = settings.PASSWORD_HASH_WORKERS or os.cpu_count() or 1
+        _hash_executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="bcrypt")
+    return _hash_executor
+
+
+async def _run_in_hash_pool(fn, *args):
+    """
+    Run a bcrypt call on the hash pool without blocking the event loop.
+
+    bcrypt releases the GIL, so the pool scales with cores. Calls beyond
+    PASSWORD_HASH_MAX_PENDING are rejected immediately instead of queueing.
+    """
+    global _hash_pending
+    if _hash_pending >= settings.PASSWORD_HASH_MAX_PENDING:
+        raise PasswordHasherBusy()
+    _hash_pending += 1
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_get_hash_executor(), fn, *args)
+    finally:
+        _hash_pending -= 1
+
+
+async def hash_password_async(plain: str) -> str:
+    """Async variant of hash_password, executed on the hash pool."""
+    return await _run_in_hash_pool(hash_password, plain)
+
+
+async def verify_password_async(plain: str, hashed: str) -> bool:
+    """Async variant of verify_password, executed on the hash pool."""
+    return await _run_in_hash_pool(verify_password, plain, hashed)
+
+
 # ---------------------------------------------------------------------------
 # JWT access tokens  (configured TTL)
 # ---------------------------------------------------------------------------
 
+def _use_fast_jwt() -> bool:
+    return settings.JWT_FAST_PATH and settings.JWT_ALGORITHM in fast_jwt.SUPPORTED_ALGORITHMS
+
+
 def create_access_token(subject: str, role: str) -> str:
     """Create a signed JWT access token."""
     now = datetime.now(timezone.utc)
@@ -36,12 +96,51 @@ def create_access_token(subject: str, role: str) -> str:
         "iat": now,
         "exp": now + timedelta(minutes=settings.ACCESS_TOKEN_TTL_MINUTES),
     }
+    if _use_fast_jwt():
+        return fast_jwt.encode(payload, settings.JWT_SECRET_KEY, settings.JWT_ALGORITHM)
     return jwt.encode(payload, settings.JWT_SECRET_KEY, algorithm=settings.JWT_ALGORITHM)
 
 
+# Verified-claims LRU: sha256(token) -> (exp, claims). Entries are served only
+# until the token's own expiry, so a hit never outlives what a full decode allows.
+_verified_tokens: "OrderedDict[bytes, tuple[float, dict]]" = OrderedDict()
+_verified_tokens_lock = threading.Lock()
+
+
+def _decode_access_token_uncached(token: str) -> dict:
+    if _use_fast_jwt():
+        return fast_jwt.decode(token, settings.JWT_SECRET_KEY, settings.JWT_ALGORITHM)
+    return jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+
+
 def decode_access_token(token: str) -> dict:
     """Decode and verify a JWT access token. Raises JWTError on failure."""
-    return jwt.decode(token, settings.JWT_SECRET_KEY, algorithms=[settings.JWT_ALGORITHM])
+    if settings.ACCESS_TOKEN_CACHE_SIZE <= 0:
+        return _decode_access_token_uncached(token)
+
+    digest = hashlib.sha256(token.encode()).digest()
+    with _verified_tokens_lock:
+        entry = _verified_tokens.get(digest)
+        if entry is not None:
+            if entry[0] > time.time():
+                _verified_tokens.move_to_end(digest)
+                return dict(entry[1])
+            del _verified_tokens[digest]
+
+    claims = _decode_access_token_uncached(token)
+
+    exp = claims.get("exp")
+    if isinstance(exp, (int, float)):
+        with _verified_tokens_lock:
+            _verified_tokens[digest] = (exp, dict(claims))
+            while len(_verified_tokens) > settings.ACCESS_TOKEN_CACHE_SIZE:
+                _verified_tokens.popitem(last=False)
+    return claims
+
+
+def clear_verified_token_cache() -> None:
+    with _verified_tokens_lock:
+        _verified_tokens.clear()
 
 
 # ---------------------------------------------------------------------------
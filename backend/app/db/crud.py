@@ -1,48 +1,234 @@
+import asyncio
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, delete
-from typing import TypeVar, Generic, Type, Optional, List, Any
+from sqlalchemy import select, delete, insert, update, inspect
+from sqlalchemy.dialects import postgresql, sqlite
+from typing import TypeVar, Generic, Type, Optional, List, Dict, Any, Iterable, Sequence
 
 ModelType = TypeVar("ModelType")
 
 
+class BatchLoader(Generic[ModelType]):
+    """
+    DataLoader-style coalescer bound to one session (i.e. one request).
+
+    load() calls made in the same event-loop tick are merged into a single
+    get_many() query; results stay cached for the life of the session, so
+    repeated lookups of the same id cost nothing. One dispatcher task runs
+    the batches one after another, so loads made while a batch is in flight
+    wait for the next batch instead of querying the session concurrently.
+    The session must not be used for other queries while a batch is in flight.
+    """
+
+    def __init__(self, crud: "CRUDBase[ModelType]", db: AsyncSession, max_batch_size: int = 500):
+        self._crud = crud
+        self._db = db
+        self._max_batch_size = max_batch_size
+        self._cache: Dict[Any, asyncio.Future] = {}
+        self._queue: Dict[Any, asyncio.Future] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    def load(self, id: Any) -> "asyncio.Future[Optional[ModelType]]":
+        future = self._cache.get(id)
+        if future is None:
+            loop = asyncio.get_running_loop()
+            future = self._cache[id] = loop.create_future()
+            self._queue[id] = future
+            if self._task is None:
+                self._task = loop.create_task(self._run())
+        return future
+
+    async def load_many(self, ids: Iterable[Any]) -> List[Optional[ModelType]]:
+        return list(await asyncio.gather(*(self.load(id) for id in ids)))
+
+    def prime(self, obj: ModelType) -> None:
+        """Seed the cache with an already loaded object."""
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(obj)
+        self._cache[obj.id] = future
+
+    def clear(self, id: Any) -> None:
+        if id not in self._queue:
+            self._cache.pop(id, None)
+
+    async def _run(self) -> None:
+        try:
+            await asyncio.sleep(0)      # let loads from tasks started this tick join the batch
+            while self._queue:
+                await self._dispatch()
+        finally:
+            self._task = None
+
+    async def _dispatch(self) -> None:
+        batch, self._queue = self._queue, {}
+        ids = list(batch)
+        for start in range(0, len(ids), self._max_batch_size):
+            chunk = ids[start:start + self._max_batch_size]
+            try:
+                found = await self._crud.get_many(self._db, chunk)
+            except Exception as e:
+                for id in chunk:
+                    self._cache.pop(id, None)   # let a later load retry
+                    if not batch[id].done():
+                        batch[id].set_exception(e)
+                continue
+            for id in chunk:
+                if not batch[id].done():
+                    batch[id].set_result(found.get(id))
+
+
 class CRUDBase(Generic[ModelType]):
-    """Base class for async CRUD operations on any model."""
+    """
+    Base class for async CRUD operations on any model.
+
+    Writes use INSERT/UPDATE ... RETURNING, so each one is a single round
+    trip and the returned objects are already loaded into the session.
+    Bulk methods send one executemany per batch.
+    """
 
     def __init__(self, model: Type[ModelType]):
         self.model = model
 
+    def _supports_returning(self, db: AsyncSession) -> bool:
+        dialect = db.get_bind().dialect
+        return dialect.insert_returning and dialect.update_returning
+
+    def _column_name(self, attr: str) -> str:
+        # obj_in dicts use attribute names (e.g. metadata_ -> "metadata")
+        return inspect(self.model).attrs[attr].columns[0].name
+
     async def get(self, db: AsyncSession, id: Any) -> Optional[ModelType]:
         result = await db.execute(select(self.model).where(self.model.id == id))
         return result.scalar_one_or_none()
 
+    async def get_many(self, db: AsyncSession, ids: Iterable[Any]) -> Dict[Any, ModelType]:
+        """Fetch rows by primary key in one query. Missing ids are absent from the result."""
+        ids = list(dict.fromkeys(ids))
+        if not ids:
+            return {}
+        result = await db.execute(select(self.model).where(self.model.id.in_(ids)))
+        return {obj.id: obj for obj in result.scalars()}
+
+    def loader(self, db: AsyncSession) -> BatchLoader[ModelType]:
+        """The batch loader for this model, scoped to the session `db`."""
+        key = ("batch_loader", self.model)
+        batch_loader = db.info.get(key)
+        if batch_loader is None:
+            batch_loader = db.info[key] = BatchLoader(self, db)
+        return batch_loader
+
+    def _forget(self, db: AsyncSession, id: Any) -> None:
+        batch_loader = db.info.get(("batch_loader", self.model))
+        if batch_loader is not None:
+            batch_loader.clear(id)
+
     async def get_all(self, db: AsyncSession, skip: int = 0, limit: int = 100) -> List[ModelType]:
         result = await db.execute(select(self.model).offset(skip).limit(limit))
         return result.scalars().all()
 
     async def create(self, db: AsyncSession, obj_in: dict) -> ModelType:
-        db_obj = self.model(**obj_in)
-        db.add(db_obj)
-        await db.flush()
-        await db.refresh(db_obj)
-        return db_obj
+        if not self._supports_returning(db):
+            db_obj = self.model(**obj_in)
+            db.add(db_obj)
+            await db.flush()
+            await db.refresh(db_obj)
+            return db_obj
+
+        result = await db.execute(insert(self.model).values(**obj_in).returning(self.model))
+        return result.scalar_one()
+
+    async def create_many(self, db: AsyncSession, objs_in: Sequence[dict]) -> List[ModelType]:
+        """Insert many rows in one batched statement; results keep input order."""
+        if not objs_in:
+            return []
+        result = await db.scalars(
+            insert(self.model).returning(self.model, sort_by_parameter_order=True),
+            list(objs_in),
+        )
+        return result.all()
+
+    async def upsert_many(
+        self,
+        db: AsyncSession,
+        objs_in: Sequence[dict],
+        index_elements: Iterable[str] = ("id",),
+        update_fields: Optional[Iterable[str]] = None,
+    ) -> List[ModelType]:
+        """
+        INSERT ... ON CONFLICT (index_elements) DO UPDATE for many rows.
+        By default every supplied field except the conflict keys is updated.
+        """
+        if not objs_in:
+            return []
+        dialect = db.get_bind().dialect.name
+        if dialect == "postgresql":
+            stmt = postgresql.insert(self.model)
+        elif dialect == "sqlite":
+            stmt = sqlite.insert(self.model)
+        else:
+            raise NotImplementedError(f"upsert_many is not supported on {dialect}")
+
+        index_elements = list(index_elements)
+        if update_fields is None:
+            update_fields = [k for k in objs_in[0] if k not in index_elements]
+        set_ = {
+            self._column_name(f): stmt.excluded[self._column_name(f)]
+            for f in update_fields
+        }
+        conflict = [self._column_name(f) for f in index_elements]
+        stmt = (
+            stmt.on_conflict_do_update(index_elements=conflict, set_=set_)
+            if set_ else stmt.on_conflict_do_nothing(index_elements=conflict)
+        )
+        result = await db.scalars(
+            stmt.returning(self.model, sort_by_parameter_order=True),
+            list(objs_in),
+            execution_options={"populate_existing": True},
+        )
+        return result.all()
 
     async def update(self, db: AsyncSession, db_obj: ModelType, obj_in: dict) -> ModelType:
-        for field, value in obj_in.items():
-            setattr(db_obj, field, value)
-        db.add(db_obj)
-        await db.flush()
-        await db.refresh(db_obj)
-        return db_obj
+        if not obj_in:
+            return db_obj
+        if not self._supports_returning(db):
+            for field, value in obj_in.items():
+                setattr(db_obj, field, value)
+            db.add(db_obj)
+            await db.flush()
+            await db.refresh(db_obj)
+            return db_obj
+
+        stmt = (
+            update(self.model)
+            .where(self.model.id == db_obj.id)
+            .values(**obj_in)
+            .returning(self.model)
+            .execution_options(populate_existing=True, synchronize_session=False)
+        )
+        result = await db.execute(stmt)
+        return result.scalar_one()
+
+    async def update_where(self, db: AsyncSession, values: dict, *criteria) -> int:
+        """Set-based UPDATE of every row matching `criteria`. Returns the row count."""
+        stmt = (
+            update(self.model)
+            .where(*criteria)
+            .values(**values)
+            .execution_options(synchronize_session="fetch")
+        )
+        result = await db.execute(stmt)
+        return result.rowcount
 
     async def delete(self, db: AsyncSession, id: Any) -> bool:
         stmt = delete(self.model).where(self.model.id == id)
         result = await db.execute(stmt)
         await db.flush()
+        self._forget(db, id)
         return result.rowcount > 0
 
     async def delete_obj(self, db: AsyncSession, db_obj: ModelType) -> None:
         await db.delete(db_obj)
         await db.flush()
+        self._forget(db, db_obj.id)
 
 
 from app.models import Project, InstallationHistory, ErrorPattern, ConfigurationTemplate
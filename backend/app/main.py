@@ -6,20 +6,45 @@ logging.basicConfig(
     level=logging.INFO,
     format="%(asctime)s [%(levelname)s] %(name)s: %(message)s",
 )
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import JSONResponse, PlainTextResponse
 from app.api.routes import projects
 from app.core.config import settings
+from app.core.database import AsyncSessionLocal, engine
 from app.api.routes.auth import auth_router
+from app.core.metrics import render_metrics
+from app.core.redis import redis_manager
+from app.core.security import PasswordHasherBusy
+from app.services.install_events import install_events
+from app.services.port_allocator import port_allocator
+from app.services.process_supervisor import supervisor
+from app.services.readiness import readiness_prober
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    redis_manager.start()
+    install_events.start(engine)
+    supervisor.ready_check = readiness_prober.check
+    supervisor.start_background(AsyncSessionLocal)
+    port_allocator.start_background()
+    yield
+    await supervisor.close()
+    await port_allocator.close()
+    await readiness_prober.close()
+    await install_events.close()
+    await redis_manager.close()
+    await engine.dispose()
+
 
 app = FastAPI(
     title="Intelligent Assistant API",
     version="0.1.0",
     docs_url="/docs" if settings.DEBUG else None,
     redoc_url="/redoc" if settings.DEBUG else None,
-
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -30,6 +55,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+@app.exception_handler(PasswordHasherBusy)
+async def password_hasher_busy_handler(request: Request, exc: PasswordHasherBusy):
+    """Shed logins/registrations when the bcrypt pool is saturated."""
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "Server busy, please retry"},
+        headers={"Retry-After": "1"},
+    )
+
 app.include_router(projects.router)
 app.include_router(auth_router, tags=["auth"])
 
@@ -37,7 +71,6 @@ app.include_router(auth_router, tags=["auth"])
 async def health():
     """Used by the VS Code extension for online/offline detection."""
     from app.core.redis import get_redis
-    from app.core.database import engine
     try:
         redis = await get_redis()
         await redis.ping()
@@ -54,3 +87,8 @@ async def health():
 
     return {"status": "ok", "db": db_status, "redis": redis_status}
 
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus scrape endpoint (Redis/DB latency histograms, pool gauges)."""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -1,13 +1,17 @@
 from app.models.base import Base
 from app.models.project import Project, ProjectStatus
 from app.models.installation_history import InstallationHistory
-from app.models.error_pattern import ErrorPattern
+from app.models.installation_event import InstallationEvent
+from app.models.error_pattern import ErrorPattern, ErrorPatternBand
 from app.models.configuration_template import ConfigurationTemplate
 from app.models.user import User, UserRole
 from app.models.refresh_token import RefreshToken
+from app.models.user_project_stats import UserProjectStats, UserStackCount
 
 __all__ = [
     'Base', 'Project', 'ProjectStatus',
-    'InstallationHistory', 'ErrorPattern', 'ConfigurationTemplate',
+    'InstallationHistory', 'InstallationEvent', 'ErrorPattern', 'ErrorPatternBand',
+    'ConfigurationTemplate',
     'User', 'RefreshToken',
+    'UserProjectStats', 'UserStackCount',
 ]
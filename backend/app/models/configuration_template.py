@@ -1,12 +1,16 @@
-from sqlalchemy import Column, Integer, String, JSON
+from sqlalchemy import Column, Integer, String, JSON, DateTime, Index, func
 from app.models.base import Base
  
 class ConfigurationTemplate(Base):
     __tablename__ = 'configuration_templates'
+    __table_args__ = (
+        Index('ix_configuration_templates_updated_at', 'updated_at'),   # incremental index refresh
+    )
  
     id           = Column(Integer, primary_key=True, autoincrement=True)
     project_type = Column(String(50))
-    framework    = Column(String(100))
-    template     = Column(JSON)
+    framework    = Column(String(100))   # detected package manager: npm | pip | maven ...
+    template     = Column(JSON)          # {"steps": [...], "env_vars": [names], "version_constraints": {...}}
     success_count = Column(Integer, default=0)
     use_count    = Column(Integer, default=0)
+    updated_at   = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
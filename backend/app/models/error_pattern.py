@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Float, JSON
+from sqlalchemy import Column, Integer, BigInteger, SmallInteger, String, Float, JSON, LargeBinary, ForeignKey, Index
 from app.models.base import Base
  
 class ErrorPattern(Base):
@@ -11,3 +11,16 @@ class ErrorPattern(Base):
     solutions    = Column(JSON)          # List[Solution]
     occurrences  = Column(Integer, default=1)
     success_rate = Column(Float)
+    minhash      = Column(LargeBinary)   # MinHash of the normalized error text (error_clustering.py)
+
+
+class ErrorPatternBand(Base):
+    """LSH index: one row per (band, bucket) of each pattern's MinHash."""
+    __tablename__ = 'error_pattern_bands'
+    __table_args__ = (
+        Index('ix_error_pattern_bands_pattern_id', 'pattern_id'),   # cascade deletes
+    )
+
+    band       = Column(SmallInteger, primary_key=True)
+    bucket     = Column(BigInteger, primary_key=True)
+    pattern_id = Column(Integer, ForeignKey('error_patterns.id', ondelete='CASCADE'), primary_key=True)
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, BigInteger, String, Text, DateTime, JSON
+from sqlalchemy.dialects.postgresql import JSONB
+from app.models.base import Base
+
+# Append-only per-step log of an installation run. Range-partitioned by
+# month on `ts` in Postgres (see alembic e7f1b3c5d9a2); rows are never
+# updated. No FKs so ingestion is a plain COPY with no per-row lookups.
+
+class InstallationEvent(Base):
+    __tablename__ = 'installation_events'
+    __table_args__ = {'postgresql_partition_by': 'RANGE (ts)'}
+
+    history_id = Column(Integer, primary_key=True)     # installation_history.id
+    ts         = Column(DateTime(timezone=True), primary_key=True)
+    seq        = Column(BigInteger, primary_key=True)  # orders events sharing a timestamp
+    project_id = Column(String(50), nullable=False)
+    step       = Column(String(100))
+    kind       = Column(String(20), nullable=False)    # started | output | finished | failed
+    message    = Column(Text)
+    data       = Column(JSON().with_variant(JSONB(), 'postgresql'))
@@ -1,7 +1,9 @@
-from sqlalchemy import Column, String, Integer, DateTime, JSON, ForeignKey
+from sqlalchemy import Column, String, Integer, DateTime, JSON, ForeignKey, Index
 from sqlalchemy import Enum as SAEnum
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.sql import func
 from app.models.base import Base
+from app.core.json_ops import json_field, json_text
 import enum
  
 class ProjectStatus(str, enum.Enum):
@@ -25,4 +27,34 @@ class Project(Base):
     pid        = Column(Integer)
     created_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
     updated_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now(), onupdate=func.now())
-    metadata_  = Column('metadata', JSON)  # JSONB in Postgres
+    metadata_  = Column('metadata', JSON().with_variant(JSONB(), 'postgresql'))
+
+
+# Keyset pagination of a user's history: matches ORDER BY created_at DESC, id DESC
+# and INCLUDEs the ProjectSummary columns so pages are index-only scans.
+Index(
+    'ix_projects_user_id_created_at_id',
+    Project.user_id,
+    Project.created_at.desc(),
+    Project.id.desc(),
+    postgresql_include=['name', 'type', 'status', 'port'],
+)
+
+
+# Metadata filters on /api/users/me/projects (expressions must match
+# the query predicates, so both are built from app.core.json_ops.py).
+Index(
+    'ix_projects_user_id_detected_pm',
+    Project.user_id,
+    json_text(Project.metadata_, 'detected_pm'),
+)
+Index(
+    'ix_projects_metadata_env_vars',
+    json_field(Project.metadata_, 'env_vars'),
+    postgresql_using='gin',
+)
+Index(
+    'ix_projects_metadata_version_constraints',
+    json_field(Project.metadata_, 'version_constraints'),
+    postgresql_using='gin',
+)
@@ -1,13 +1,18 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, ForeignKey, Index
 from app.models.base import Base
 from sqlalchemy.sql import func
 
 class RefreshToken(Base):
     __tablename__ = 'refresh_tokens'
+    __table_args__ = (
+        Index('ix_refresh_tokens_user_id_revoked', 'user_id', 'revoked'),  # revoke-all / reuse detection
+        Index('ix_refresh_tokens_expires_at', 'expires_at'),               # periodic purge
+    )
 
     id           = Column(Integer, primary_key=True, autoincrement=True)
     token_hash   = Column(String(255), nullable=False, unique=True) #never repeated token value
     user_id      = Column(String(50), ForeignKey('users.id'))
     expires_at   = Column(DateTime(timezone=True), nullable=False)
     revoked      = Column(Boolean, nullable=False, default=False)
+    revoked_at   = Column(DateTime(timezone=True), nullable=True)  # set with revoked; see REFRESH_TOKEN_REUSE_GRACE_SECONDS
     created_at   = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
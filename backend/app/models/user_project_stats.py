@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, ForeignKey
+from app.models.base import Base
+
+# Per-user install counters, kept in step with `projects` inside the same
+# transaction by app/services/project_service.py (create/status/delete).
+
+class UserProjectStats(Base):
+    __tablename__ = 'user_project_stats'
+
+    user_id             = Column(String(50), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    total_installs      = Column(Integer, nullable=False, default=0)
+    successful_installs = Column(Integer, nullable=False, default=0)   # projects currently 'running'
+
+
+class UserStackCount(Base):
+    __tablename__ = 'user_stack_counts'
+
+    user_id = Column(String(50), ForeignKey('users.id', ondelete='CASCADE'), primary_key=True)
+    stack   = Column(String(50), primary_key=True)   # Project.type
+    count   = Column(Integer, nullable=False, default=0)
@@ -137,10 +137,12 @@ class ProjectSummary(BaseModel):
 
 class PaginatedProjects(BaseModel):
     items: list[ProjectSummary]
-    total: int
+    total: Optional[int]           # None when count=none
+    total_exact: bool = True       # False when count=estimate hit its cap
     page: int
     per_page: int
-    pages: int
+    pages: Optional[int]
+    next_cursor: Optional[str] = None  # pass back as ?cursor= for the next page
 
 
 class UserStats(BaseModel):
@@ -0,0 +1,240 @@
+import hashlib
+import json
+import logging
+import os
+import re
+import stat
+import time
+import uuid
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+from app.services.dependency_cache import FileLinker, cache_root, runtime_version
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Build-output cache for compiled stacks (Maven, Gradle)
+#
+# Before a build step runs, the project's source tree (every file except
+# build outputs, VCS and IDE directories) is hashed together with the build
+# command and JDK version. If that key has a manifest, the outputs it lists
+# (target/*.jar, build/libs/*.jar ...) are materialized from the object
+# store and the build is skipped. After a successful build the outputs are
+# added to the store.
+#
+#   build/objects/ab/abcdef...   output files, stored once by content hash
+#   build/manifests/<key>.json   [{path, sha256, mode}] for one source tree
+#
+# The store is bounded by BUILD_CACHE_MAX_BYTES: least recently used
+# manifests (mtime, refreshed on every hit) are dropped first, then objects
+# no remaining manifest references. An object no manifest lists at all may
+# belong to a store() that has not written its manifest yet, so it is only
+# deleted once it is older than BUILD_CACHE_ORPHAN_GRACE_SECONDS (store()
+# touches the objects it reuses). A manifest whose object went missing is
+# deleted by the next restore() that reads it.
+# ---------------------------------------------------------------------------
+
+
+@dataclass(frozen=True)
+class BuildTool:
+    name: str
+    command: re.Pattern          # recognises the tool in a step command
+    markers: tuple[str, ...]     # files that identify a project built by it
+    outputs: tuple[str, ...]     # globs (relative to the step's cwd) of cacheable outputs
+    skip_dirs: frozenset[str]
+
+
+_COMMON_SKIP = {".git", ".hg", ".svn", ".idea", ".vscode", "node_modules"}
+
+BUILD_TOOLS = (
+    BuildTool(
+        "maven", re.compile(r"(?:^|[\s/])mvnw?(?:\s|$)"), ("pom.xml",),
+        ("**/target/*.jar", "**/target/*.war"),
+        frozenset(_COMMON_SKIP | {"target"}),
+    ),
+    BuildTool(
+        "gradle", re.compile(r"(?:^|[\s/])gradlew?(?:\s|$)"),
+        ("build.gradle", "build.gradle.kts", "settings.gradle", "settings.gradle.kts"),
+        ("**/build/libs/*.jar", "**/build/libs/*.war"),
+        frozenset(_COMMON_SKIP | {"build", ".gradle"}),
+    ),
+)
+_JAVA_VERSION = ("java", "-version")
+
+# (path, size, mtime_ns, inode) -> sha256: re-hashing an unchanged tree only stats files
+_digests: dict[tuple, str] = {}
+_MAX_MEMOISED_DIGESTS = 200_000
+
+
+def _file_digest(path: Path, st: os.stat_result) -> str:
+    key = (str(path), st.st_size, st.st_mtime_ns, st.st_ino)
+    digest = _digests.get(key)
+    if digest is None:
+        with open(path, "rb") as f:
+            digest = hashlib.file_digest(f, "sha256").hexdigest()
+        if len(_digests) >= _MAX_MEMOISED_DIGESTS:
+            _digests.clear()
+        _digests[key] = digest
+    return digest
+
+
+def detect_tool(step) -> Optional[BuildTool]:
+    command = " ".join(step.command)
+    for tool in BUILD_TOOLS:
+        if tool.command.search(command) and any((step.cwd / m).is_file() for m in tool.markers):
+            return tool
+    return None
+
+
+def source_tree_key(root: Path, tool: BuildTool, command: list[str]) -> str:
+    """Hash of every source file under `root` (outputs and VCS dirs excluded), the command and JDK."""
+    digest = hashlib.sha256()
+    for part in (tool.name, " ".join(command), runtime_version(_JAVA_VERSION)):
+        digest.update(part.encode() + b"\0")
+    for dirpath, dirs, names in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in tool.skip_dirs)
+        for name in sorted(names):
+            path = Path(dirpath) / name
+            st = path.lstat()
+            if not stat.S_ISREG(st.st_mode):
+                continue
+            rel = path.relative_to(root).as_posix()
+            digest.update(f"{rel}\0{st.st_mode & 0o111:o}\0{_file_digest(path, st)}\n".encode())
+    return digest.hexdigest()
+
+
+class BuildCache:
+    """StepCache for Maven/Gradle build steps (see step_executor.StepCache)."""
+
+    def __init__(self, root: Optional[Path] = None, max_bytes: Optional[int] = None):
+        self.root = (root or cache_root()) / "build"
+        self.objects = self.root / "objects"
+        self.manifests = self.root / "manifests"
+        self.max_bytes = settings.BUILD_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+        self._keys: dict[int, Optional[tuple[BuildTool, str]]] = {}
+
+    def _key(self, step) -> Optional[tuple[BuildTool, str]]:
+        if step.kind != "build":
+            return None
+        tool = detect_tool(step)
+        if tool is None:
+            return None
+        return tool, source_tree_key(step.cwd, tool, step.command)
+
+    def _object(self, sha: str) -> Path:
+        return self.objects / sha[:2] / sha
+
+    def restore(self, step) -> Optional[str]:
+        found = self._key(step)
+        self._keys[id(step)] = found     # builds may write outside their output dirs; store under this key
+        if found is None:
+            return None
+        tool, key = found
+        manifest_path = self.manifests / f"{key}.json"
+        try:
+            entries = json.loads(manifest_path.read_text())
+        except (OSError, ValueError):
+            return None
+        if not all(self._object(entry["sha256"]).exists() for entry in entries):
+            logger.warning("Build cache manifest %s lists a missing object, dropping it", key[:12])
+            manifest_path.unlink(missing_ok=True)
+            return None
+
+        # Copies (or reflinks), not hardlinks: the next `mvn package` rewrites these files in place
+        linker = FileLinker(allow_hardlink=False)
+        start = time.monotonic()
+        try:
+            for entry in entries:
+                target = step.cwd / entry["path"]
+                target.parent.mkdir(parents=True, exist_ok=True)
+                staging = target.with_name(f".{target.name}.{uuid.uuid4().hex[:8]}")
+                linker.copy(self._object(entry["sha256"]), staging)
+                staging.chmod(entry.get("mode", 0o644))    # objects are read-only
+                staging.replace(target)
+        except OSError as e:
+            logger.warning("Build cache restore into %s failed, building instead: %s", step.cwd, e)
+            return None
+        now = time.time()
+        os.utime(manifest_path, (now, now))
+        del self._keys[id(step)]
+        return (f"restored {len(entries)} {tool.name} output(s) from build cache {key[:12]} "
+                f"({time.monotonic() - start:.1f}s)")
+
+    def store(self, step) -> None:
+        found = self._keys.pop(id(step)) if id(step) in self._keys else self._key(step)
+        if found is None:
+            return
+        tool, key = found
+        manifest_path = self.manifests / f"{key}.json"
+        if manifest_path.exists():
+            return
+        outputs = sorted({p for pattern in tool.outputs for p in step.cwd.glob(pattern) if p.is_file()})
+        if not outputs:
+            return
+
+        linker = FileLinker(allow_hardlink=False)
+        entries = []
+        for path in outputs:
+            st = path.stat()
+            sha = _file_digest(path, st)
+            obj = self._object(sha)
+            try:
+                os.utime(obj)                   # reused: restart its grace period until the manifest lists it
+            except FileNotFoundError:
+                obj.parent.mkdir(parents=True, exist_ok=True)
+                staging = obj.with_name(f".{sha}.{uuid.uuid4().hex[:8]}")
+                linker.copy(path, staging)
+                os.utime(staging)               # copy2 kept the output's mtime
+                staging.chmod(0o444)
+                staging.replace(obj)
+            entries.append({
+                "path": path.relative_to(step.cwd).as_posix(),
+                "sha256": sha,
+                "mode": stat.S_IMODE(st.st_mode),
+            })
+
+        self.manifests.mkdir(parents=True, exist_ok=True)
+        staging = manifest_path.with_name(f".{manifest_path.name}.{uuid.uuid4().hex[:8]}")
+        staging.write_text(json.dumps(entries))
+        staging.replace(manifest_path)
+        self.evict()
+
+    def evict(self) -> int:
+        """Drop LRU manifests until the object store fits in max_bytes; returns manifests removed."""
+        if not self.objects.exists():
+            return 0
+        stats = {p.name: p.stat() for p in self.objects.glob("*/*") if not p.name.startswith(".")}
+        sizes = {sha: st.st_size for sha, st in stats.items()}
+        manifests = sorted(self.manifests.glob("*.json"), key=lambda p: p.stat().st_mtime)
+        shas: dict[Path, set[str]] = {}
+        refs: Counter = Counter()
+        for path in manifests:
+            try:
+                shas[path] = {e["sha256"] for e in json.loads(path.read_text())}
+            except (OSError, ValueError):
+                shas[path] = set()
+            refs.update(shas[path])
+
+        def drop(sha: str) -> None:
+            self._object(sha).unlink(missing_ok=True)
+            sizes.pop(sha, None)
+
+        # Left by interrupted stores, or written by a store whose manifest is not there yet
+        cutoff = time.time() - settings.BUILD_CACHE_ORPHAN_GRACE_SECONDS
+        for sha in [sha for sha in sizes if not refs[sha] and stats[sha].st_mtime < cutoff]:
+            drop(sha)
+        removed = 0
+        for path in manifests:
+            if sum(sizes.values()) <= self.max_bytes:
+                break
+            path.unlink(missing_ok=True)
+            removed += 1
+            for sha in shas[path]:
+                refs[sha] -= 1
+                if not refs[sha]:
+                    drop(sha)
+        return removed
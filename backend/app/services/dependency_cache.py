@@ -0,0 +1,298 @@
+import errno
+import fcntl
+import functools
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import subprocess
+import time
+import uuid
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+from app.core.config import settings
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Dependency caches
+#
+# Two layers, both under DEPENDENCY_CACHE_DIR:
+#
+#   shared/     per-ecosystem download caches (npm, pip wheels, ~/.m2,
+#               Composer, Gradle, Go modules) that every install step is
+#               pointed at through its environment — a package is
+#               downloaded once per host, not once per project;
+#
+#   snapshots/  complete environments (node_modules, vendor) keyed by a
+#               hash of the lockfile, manifest, install command and runtime
+#               version. When an install step's key is already stored, the
+#               environment is materialized by reflink (copy-on-write) or,
+#               where the filesystem cannot reflink, a plain copy, and the
+#               step is not run at all, so a second copy of a repo skips
+#               resolution and download entirely.
+#
+# Snapshots are only taken where a lockfile pins the result. Virtualenvs
+# are not snapshotted (their scripts embed absolute paths); Python installs
+# benefit from the shared wheel cache instead. Projects never share inodes
+# with the store: postinstall scripts, patch-package and dev tools edit
+# node_modules in place, and read-only bits do not stop the app (running
+# as root) from writing through a hardlink.
+# ---------------------------------------------------------------------------
+
+_FICLONE = 0x40049409        # linux/fs.h: reflink one file onto another
+_LAST_USED = ".last_used"
+
+
+@dataclass(frozen=True)
+class Ecosystem:
+    name: str
+    lockfiles: tuple[str, ...]
+    manifests: tuple[str, ...]
+    env_dir: str
+    runtime: tuple[str, ...]     # command whose output pins binary compatibility
+
+
+ECOSYSTEMS = (
+    Ecosystem("node", ("package-lock.json", "npm-shrinkwrap.json", "yarn.lock", "pnpm-lock.yaml"),
+              ("package.json",), "node_modules", ("node", "--version")),
+    Ecosystem("composer", ("composer.lock",), ("composer.json",), "vendor", ("php", "-r", "echo PHP_VERSION;")),
+)
+
+
+def cache_root() -> Path:
+    return Path(settings.DEPENDENCY_CACHE_DIR)
+
+
+def shared_cache_env(base: Optional[dict] = None) -> dict[str, str]:
+    """Environment for install steps: `base` (default os.environ) pointed at the shared caches."""
+    env = dict(os.environ if base is None else base)
+    shared = cache_root() / "shared"
+    env.update({
+        "npm_config_cache": str(shared / "npm"),
+        "YARN_CACHE_FOLDER": str(shared / "yarn"),
+        "PIP_CACHE_DIR": str(shared / "pip"),
+        "POETRY_CACHE_DIR": str(shared / "poetry"),
+        "COMPOSER_CACHE_DIR": str(shared / "composer"),
+        "GRADLE_USER_HOME": str(shared / "gradle"),
+        "GOMODCACHE": str(shared / "go" / "mod"),
+        "BUNDLE_USER_CACHE": str(shared / "bundler"),
+    })
+    maven_repo = f"-Dmaven.repo.local={shared / 'm2' / 'repository'}"
+    env["MAVEN_OPTS"] = f"{env['MAVEN_OPTS']} {maven_repo}" if env.get("MAVEN_OPTS") else maven_repo
+    return env
+
+
+@functools.lru_cache(maxsize=None)
+def runtime_version(command: tuple[str, ...]) -> str:
+    try:
+        out = subprocess.run(command, capture_output=True, text=True, timeout=10)
+    except (OSError, subprocess.SubprocessError):
+        return ""
+    return (out.stdout or out.stderr).strip()
+
+
+def detect(cwd: Path) -> Optional[tuple[Ecosystem, Path]]:
+    """The ecosystem whose lockfile is in `cwd`, with that lockfile."""
+    for eco in ECOSYSTEMS:
+        for name in eco.lockfiles:
+            if (cwd / name).is_file():
+                return eco, cwd / name
+    return None
+
+
+def snapshot_key(eco: Ecosystem, lockfile: Path, command: list[str]) -> str:
+    digest = hashlib.sha256()
+    for part in (eco.name, " ".join(command), runtime_version(eco.runtime), os.uname().machine):
+        digest.update(part.encode() + b"\0")
+    for path in (lockfile, *(lockfile.parent / m for m in eco.manifests)):
+        digest.update(path.name.encode() + b"\0")
+        digest.update(path.read_bytes() if path.is_file() else b"")
+    return digest.hexdigest()
+
+
+# ---------------------------------------------------------------------------
+# Tree copy: reflink, else hardlink, else copy
+# ---------------------------------------------------------------------------
+
+class FileLinker:
+    """Copies files with the cheapest method the filesystem supports, remembering what failed."""
+
+    def __init__(self, allow_hardlink: bool):
+        self.reflink = True
+        self.hardlink = allow_hardlink
+
+    def _reflink(self, src: Path, dst: Path) -> bool:
+        with open(src, "rb") as s, open(dst, "wb") as d:
+            try:
+                fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+                return True
+            except OSError as e:
+                if e.errno in (errno.EOPNOTSUPP, errno.ENOTTY, errno.EXDEV, errno.EINVAL, errno.ENOSYS):
+                    self.reflink = False
+                    return False
+                raise
+
+    def copy(self, src: Path, dst: Path) -> None:
+        if self.reflink and self._reflink(src, dst):
+            shutil.copystat(src, dst)
+            return
+        if self.hardlink:
+            try:
+                dst.unlink(missing_ok=True)
+                os.link(src, dst)
+                return
+            except OSError as e:
+                if e.errno not in (errno.EXDEV, errno.EPERM, errno.EMLINK):
+                    raise
+                self.hardlink = False
+        shutil.copy2(src, dst)
+
+
+def copy_tree(
+    src: Path,
+    dst: Path,
+    allow_hardlink: bool = True,
+    read_only: bool = False,
+    writable: bool = False,
+) -> int:
+    """
+    Recreate `src` at `dst` (which must not exist). `read_only` clears the
+    write bits of the copies, `writable` gives them back to the owner (for
+    copies of a read-only store). Returns the number of files.
+    """
+    linker = FileLinker(allow_hardlink)
+    files = 0
+    for root, dirs, names in os.walk(src):
+        rel = Path(root).relative_to(src)
+        target_dir = dst / rel
+        target_dir.mkdir(parents=True, exist_ok=True)
+        for name in list(dirs):
+            path = Path(root) / name
+            if path.is_symlink():          # os.walk does not follow; recreate the link itself
+                os.symlink(os.readlink(path), target_dir / name)
+                dirs.remove(name)
+        for name in names:
+            path, target = Path(root) / name, target_dir / name
+            if path.is_symlink():
+                os.symlink(os.readlink(path), target)
+                continue
+            linker.copy(path, target)
+            if read_only:
+                mode = target.stat().st_mode
+                target.chmod(mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+            elif writable:
+                target.chmod(target.stat().st_mode | stat.S_IWUSR)
+            files += 1
+    return files
+
+
+def _remove_tree(path: Path) -> None:
+    def _writable(func, p, _exc):
+        os.chmod(p, stat.S_IRWXU)
+        func(p)
+    shutil.rmtree(path, onerror=_writable)
+
+
+# ---------------------------------------------------------------------------
+# Snapshot store (StepCache for the step executor)
+# ---------------------------------------------------------------------------
+
+class DependencySnapshots:
+    """
+    Restores install steps from environment snapshots. Hooks into
+    StepExecutor: restore() before an install step, store() after it
+    finished successfully. Safe to share between concurrent installs.
+    """
+
+    def __init__(self, root: Optional[Path] = None, max_per_ecosystem: Optional[int] = None):
+        self.root = (root or cache_root()) / "snapshots"
+        self.max_per_ecosystem = max_per_ecosystem or settings.DEPENDENCY_SNAPSHOTS_PER_ECOSYSTEM
+        self._keys: dict[int, Optional[tuple[Ecosystem, Path]]] = {}
+
+    def _lookup(self, step) -> Optional[tuple[Ecosystem, Path]]:
+        if step.kind != "install":
+            return None
+        found = detect(step.cwd)
+        if found is None:
+            return None
+        eco, lockfile = found
+        return eco, self.root / eco.name / snapshot_key(eco, lockfile, step.command)
+
+    def restore(self, step) -> Optional[str]:
+        """Materialize a stored environment for `step`; returns a note when the step can be skipped."""
+        found = self._lookup(step)
+        # Remember the key of the tree *before* the install (npm may rewrite its
+        # lockfile) so store() files the snapshot where the next copy looks
+        self._keys[id(step)] = found
+        if found is None:
+            return None
+        eco, entry = found
+        snapshot = entry / eco.env_dir
+        if not snapshot.is_dir():
+            return None
+        target = step.cwd / eco.env_dir
+        staging = step.cwd / f".{eco.env_dir}.restore-{uuid.uuid4().hex[:8]}"
+        start = time.monotonic()
+        try:
+            # Reflink or copy, never hardlink: the project's tree must not alias the store
+            files = copy_tree(snapshot, staging, allow_hardlink=False, writable=True)
+            if target.exists() or target.is_symlink():
+                old = step.cwd / f".{eco.env_dir}.old-{uuid.uuid4().hex[:8]}"
+                target.rename(old)
+                _remove_tree(old)
+            staging.rename(target)
+        except OSError as e:
+            logger.warning("Snapshot restore into %s failed, installing instead: %s", target, e)
+            if staging.exists():
+                _remove_tree(staging)
+            return None
+        (entry / _LAST_USED).touch()
+        del self._keys[id(step)]
+        return f"restored {eco.env_dir} from snapshot {entry.name[:12]} ({files} files, {time.monotonic() - start:.1f}s)"
+
+    def store(self, step) -> None:
+        """Snapshot the environment a successful install step produced."""
+        found = self._keys.pop(id(step)) if id(step) in self._keys else self._lookup(step)
+        if found is None:
+            return
+        eco, entry = found
+        source = step.cwd / eco.env_dir
+        if entry.exists() or not source.is_dir():
+            return
+        staging = entry.parent / f".{entry.name}.{uuid.uuid4().hex[:8]}"
+        try:
+            # Copy, never hardlink: the project keeps writing to its own tree
+            copy_tree(source, staging / eco.env_dir, allow_hardlink=False, read_only=True)
+            (staging / "snapshot.json").write_text(json.dumps({
+                "ecosystem": eco.name, "command": step.command, "created_at": time.time(),
+            }))
+            (staging / _LAST_USED).touch()
+            staging.rename(entry)
+        except OSError as e:
+            # Includes losing a race to a concurrent install of the same lockfile
+            logger.info("Snapshot of %s not stored: %s", source, e)
+            if staging.exists():
+                _remove_tree(staging)
+            return
+        self.evict(eco)
+
+    def evict(self, eco: Ecosystem) -> int:
+        """Drop least-recently-used snapshots beyond max_per_ecosystem."""
+        directory = self.root / eco.name
+        entries = []
+        for entry in directory.iterdir():
+            if entry.name.startswith("."):
+                continue
+            marker = entry / _LAST_USED
+            entries.append((marker.stat().st_mtime if marker.exists() else 0.0, entry))
+        entries.sort(reverse=True)
+        evicted = 0
+        for _, entry in entries[self.max_per_ecosystem:]:
+            _remove_tree(entry)
+            evicted += 1
+        return evicted
@@ -0,0 +1,223 @@
+import hashlib
+import random
+import re
+import struct
+import zlib
+from collections import Counter
+from dataclasses import dataclass, field
+from typing import Iterable, Optional
+
+from sqlalchemy import select, text, tuple_, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.db.crud import error_pattern_crud
+from app.models.error_pattern import ErrorPattern, ErrorPatternBand
+
+# ---------------------------------------------------------------------------
+# Near-duplicate error clustering  (MinHash + LSH over normalized text)
+#
+# Install errors differ run to run only in paths, versions, ids and
+# timestamps. Those are normalized to placeholders, the text is shingled
+# into word 3-grams and summarised by a MinHash. The MinHash is split into
+# LSH bands stored in error_pattern_bands, so finding candidates is an
+# index lookup on (band, bucket) — not a scan of error_patterns. A candidate
+# whose estimated Jaccard similarity reaches ERROR_CLUSTER_SIMILARITY is the
+# same error: its occurrences are incremented. Otherwise a new pattern is
+# inserted with a signature regex derived from the normalized text, so the
+# matcher (error_matcher.py) recognises it next time.
+#
+# NUM_PERM / BANDS are part of the stored data: changing them requires
+# recomputing every minhash and band row.
+# ---------------------------------------------------------------------------
+
+NUM_PERM = 128
+BANDS = 16
+ROWS = NUM_PERM // BANDS          # candidate threshold ~ (1/BANDS) ** (1/ROWS) ~ 0.71
+SHINGLE_SIZE = 3
+MAX_TEXT_CHARS = 4000
+MAX_SIGNATURE_CHARS = 200
+
+_MERSENNE = (1 << 61) - 1
+_rng = random.Random(0x5EED)      # fixed: every process must derive the same permutations
+_PERMUTATIONS = [(_rng.randrange(1, _MERSENNE), _rng.randrange(0, _MERSENNE)) for _ in range(NUM_PERM)]
+
+# (pattern, placeholder, regex the placeholder stands for in a signature)
+_NORMALIZERS = [
+    (r"\d{4}-\d{2}-\d{2}[t ]\d{2}:\d{2}:\d{2}(?:[.,]\d+)?(?:z|[+-]\d{2}:?\d{2})?", "<ts>", r"\S+"),
+    (r"\b\d{1,2}:\d{2}:\d{2}(?:[.,]\d+)?\b", "<ts>", r"\S+"),
+    (r"\b[a-z][a-z0-9+.-]*://\S+", "<url>", r"\S+"),
+    (r"\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b", "<uuid>", r"[0-9a-f-]+"),
+    (r"'[^'\n]*'|\"[^\"\n]*\"", "<str>", r"(?:'[^']*'|\"[^\"]*\")"),
+    (r"\b[a-z]:\\[^\s'\"]+", "<path>", r"\S+"),
+    (r"(?<![\w<])(?:~|\.{1,2})?(?:/[\w.@+-]+)+/?", "<path>", r"\S+"),
+    (r"\b0x[0-9a-f]+\b|\b[0-9a-f]{12,}\b", "<hex>", r"\w+"),
+    (r"\bv?\d+(?:\.\d+)+(?:[-+][\w.]+)?\b", "<ver>", r"v?\d[\w.+-]*"),
+    (r"\b\d+\b", "<num>", r"\d+"),
+]
+_COMPILED = [(re.compile(p), placeholder) for p, placeholder, _ in _NORMALIZERS]
+_PLACEHOLDER_REGEX = {placeholder: regex for _, placeholder, regex in _NORMALIZERS}
+_PLACEHOLDER_SPLIT = re.compile("(" + "|".join(re.escape(p) for p in _PLACEHOLDER_REGEX) + ")")
+_WHITESPACE = re.compile(r"\s+")
+_HEADLINE = re.compile(r"\w*(?:error|exception)\b|\bfatal\b|\bfailed\b|\berr!")
+
+
+def normalize_error(raw: str) -> str:
+    """Lower-case `raw` and replace volatile tokens (paths, versions, ids...) with placeholders."""
+    lines = []
+    for line in raw[:MAX_TEXT_CHARS].lower().splitlines():
+        for pattern, placeholder in _COMPILED:
+            line = pattern.sub(placeholder, line)
+        line = _WHITESPACE.sub(" ", line).strip()
+        if line:
+            lines.append(line)
+    return "\n".join(lines)
+
+
+def _shingles(normalized: str) -> set[bytes]:
+    tokens = normalized.split()
+    if len(tokens) < SHINGLE_SIZE:
+        return {" ".join(tokens).encode()} if tokens else set()
+    return {
+        " ".join(tokens[i:i + SHINGLE_SIZE]).encode()
+        for i in range(len(tokens) - SHINGLE_SIZE + 1)
+    }
+
+
+def minhash(normalized: str) -> list[int]:
+    hashes = [zlib.crc32(s) for s in _shingles(normalized)]
+    if not hashes:
+        return []
+    return [min((a * h + b) % _MERSENNE for h in hashes) & 0xFFFFFFFF for a, b in _PERMUTATIONS]
+
+
+def band_buckets(signature: list[int]) -> list[tuple[int, int]]:
+    """(band, bucket) pairs for the LSH index; bucket is a signed 64-bit hash of the band's rows."""
+    buckets = []
+    for band in range(BANDS):
+        rows = struct.pack(f"<{ROWS}I", *signature[band * ROWS:(band + 1) * ROWS])
+        digest = hashlib.blake2b(rows, digest_size=8).digest()
+        buckets.append((band, int.from_bytes(digest, "little", signed=True)))
+    return buckets
+
+
+def similarity(a: list[int], b: list[int]) -> float:
+    """Estimated Jaccard similarity of two MinHash signatures."""
+    return sum(x == y for x, y in zip(a, b)) / NUM_PERM
+
+
+def _pack(signature: list[int]) -> bytes:
+    return struct.pack(f"<{NUM_PERM}I", *signature)
+
+
+def _unpack(data: bytes) -> list[int]:
+    return list(struct.unpack(f"<{NUM_PERM}I", data))
+
+
+def signature_regex(normalized: str) -> str:
+    """
+    Regex for the error's headline — the first line naming an error, else
+    the first line — with placeholders widened back to their patterns.
+    """
+    lines = normalized.split("\n")
+    headline = next((line for line in lines if _HEADLINE.search(line)), lines[0])[:MAX_SIGNATURE_CHARS]
+    parts = []
+    for piece in _PLACEHOLDER_SPLIT.split(headline):
+        if piece in _PLACEHOLDER_REGEX:
+            parts.append(_PLACEHOLDER_REGEX[piece])
+        elif piece:
+            parts.append(r"\s+".join(re.escape(word) for word in piece.split(" ")))
+    return "".join(parts)
+
+
+# ---------------------------------------------------------------------------
+# Ingestion
+# ---------------------------------------------------------------------------
+
+@dataclass
+class IngestResult:
+    created: list[int] = field(default_factory=list)   # new pattern ids
+    matched: list[int] = field(default_factory=list)   # existing pattern ids whose occurrences grew
+
+
+async def _best_candidate(
+    db: AsyncSession,
+    signature: list[int],
+    buckets: list[tuple[int, int]],
+    project_type: Optional[str],
+) -> Optional[int]:
+    result = await db.execute(
+        select(ErrorPattern.id, ErrorPattern.minhash)
+        .join(ErrorPatternBand, ErrorPatternBand.pattern_id == ErrorPattern.id)
+        .where(
+            tuple_(ErrorPatternBand.band, ErrorPatternBand.bucket).in_(buckets),
+            ErrorPattern.project_type.is_(None) if project_type is None
+            else ErrorPattern.project_type == project_type,
+        )
+        .distinct()
+    )
+    best_id, best_score = None, settings.ERROR_CLUSTER_SIMILARITY
+    for pattern_id, packed in result.all():
+        score = similarity(signature, _unpack(packed))
+        if score >= best_score:
+            best_id, best_score = pattern_id, score
+    return best_id
+
+
+async def ingest_errors(
+    db: AsyncSession,
+    errors: Iterable[str],
+    project_type: Optional[str] = None,
+    category: Optional[str] = None,
+) -> IngestResult:
+    """
+    Cluster raw error texts into error_patterns within the caller's
+    transaction. After committing, call error_matcher.notify_patterns_changed()
+    if `created` is non-empty so matchers pick up the new signatures.
+    """
+    counts = Counter(n for n in (normalize_error(e) for e in errors) if n)
+    result = IngestResult()
+    postgres = db.get_bind().dialect.name == "postgresql"
+
+    prepared = []
+    for normalized, count in counts.items():
+        signature = minhash(normalized)
+        regex = signature_regex(normalized)
+        if signature and regex:
+            prepared.append((signature, regex, band_buckets(signature), count))
+    if postgres and prepared:
+        # Serialise concurrent ingestion of the same error so it is inserted once.
+        # A near-duplicate may share any single band with it, so every bucket is
+        # locked, in one sorted pass over the whole batch so two ingests cannot
+        # deadlock on each other.
+        keys = sorted({bucket for _, _, buckets, _ in prepared for _, bucket in buckets})
+        await db.execute(
+            text("SELECT pg_advisory_xact_lock(k) FROM unnest(CAST(:keys AS bigint[])) AS k ORDER BY k"),
+            {"keys": keys},
+        )
+
+    for signature, regex, buckets, count in prepared:
+        pattern_id = await _best_candidate(db, signature, buckets, project_type)
+        if pattern_id is not None:
+            await db.execute(
+                update(ErrorPattern)
+                .where(ErrorPattern.id == pattern_id)
+                .values(occurrences=ErrorPattern.occurrences + count)
+            )
+            result.matched.append(pattern_id)
+            continue
+
+        pattern = await error_pattern_crud.create(db, {
+            "signature": regex,
+            "category": category,
+            "project_type": project_type,
+            "occurrences": count,
+            "minhash": _pack(signature),
+        })
+        await db.execute(
+            ErrorPatternBand.__table__.insert(),
+            [{"band": band, "bucket": bucket, "pattern_id": pattern.id} for band, bucket in buckets],
+        )
+        result.created.append(pattern.id)
+
+    return result
@@ -0,0 +1,373 @@
+import asyncio
+import logging
+import re
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Iterable, Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.error_pattern import ErrorPattern
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Compiled ErrorPattern matcher
+#
+# All signatures that apply to a project type (its own + project_type NULL)
+# are compiled once into a single Aho-Corasick automaton, scanned over the
+# lower-cased line:
+#   - plain-substring signatures are keywords of the automaton;
+#   - a regex signature contributes a literal it cannot match without
+#     (found by a small, conservative scan of the pattern source), and the
+#     regex only runs on lines where that literal was found;
+#   - the few regexes with no such literal share one combined regex used
+#     as a gate, and are re-checked individually only when it hits.
+# Cost per line therefore depends on line length, not on pattern count.
+# Compiled matchers are cached per project type and rebuilt when the
+# pattern version in Redis changes.
+# ---------------------------------------------------------------------------
+
+_REGEX_META = set(".^$*+?{}[]\\|()")
+_BACKREF = re.compile(r"\\[1-9]|\(\?P=")
+_QUANTIFIER = re.compile(r"[*+?]|\{(\d*)(,?)(\d*)\}")
+_INLINE_FLAGS = re.compile(r"\(\?([aiLmsux]+)\)")
+_MIN_TRIGGER_CHARS = 3
+
+PATTERNS_VERSION_KEY = "error_patterns:version"
+
+
+@dataclass(frozen=True)
+class PatternMatch:
+    pattern_id: int
+    category: Optional[str]
+    solutions: Optional[list]
+    line_no: int
+    line: str
+
+
+def _skip_group(regex: str, i: int) -> int:
+    """Index just past the group opening at regex[i] (a valid pattern, so it is closed)."""
+    depth = 0
+    while i < len(regex):
+        ch = regex[i]
+        if ch == "\\":
+            i += 2
+            continue
+        if ch == "[":
+            i = _skip_class(regex, i)
+            continue
+        depth += (ch == "(") - (ch == ")")
+        i += 1
+        if depth == 0:
+            return i
+    return i
+
+
+def _skip_class(regex: str, i: int) -> int:
+    """Index just past the character class opening at regex[i]."""
+    i += 1
+    if i < len(regex) and regex[i] == "^":
+        i += 1
+    if i < len(regex) and regex[i] == "]":      # a leading ] is a member
+        i += 1
+    while i < len(regex) and regex[i] != "]":
+        i += 2 if regex[i] == "\\" else 1
+    return i + 1
+
+
+def _required_literal(regex: str) -> Optional[str]:
+    """
+    Longest run of literal characters every match of `regex` must contain.
+    Only the top level of the pattern is read: groups, classes, escapes
+    other than escaped punctuation and anything quantified end a run, and
+    a top-level alternation yields None.
+    """
+    try:
+        re.compile(regex)
+    except re.error:
+        return None
+    flags = _INLINE_FLAGS.match(regex)
+    if flags is not None:
+        if "x" in flags.group(1):                # verbose: whitespace and # are not literal
+            return None
+        regex = regex[flags.end():]
+
+    runs: list[str] = []
+    run: list[str] = []
+    i = 0
+    while i < len(regex):
+        ch = regex[i]
+        literal: Optional[str] = None
+        if ch == "|":
+            return None
+        if ch == "\\":
+            nxt = regex[i + 1]
+            literal = nxt if not nxt.isalnum() else None
+            i += 2
+        elif ch == "(":
+            i = _skip_group(regex, i)
+        elif ch == "[":
+            i = _skip_class(regex, i)
+        elif ch in ".^$":
+            i += 1
+        else:
+            literal = ch
+            i += 1
+
+        quantifier = _QUANTIFIER.match(regex, i)
+        if quantifier is not None:
+            i = quantifier.end()
+            if i < len(regex) and regex[i] in "?+":      # lazy / possessive
+                i += 1
+            required = quantifier.group(0) == "+" or bool(quantifier.group(1) and int(quantifier.group(1)))
+            if literal is not None and required:
+                run.append(literal)                     # present, but what follows may not be adjacent
+            literal = None
+        if literal is not None:
+            run.append(literal)
+            continue
+        runs.append("".join(run))
+        run = []
+    runs.append("".join(run))
+    best = max(runs, key=len)
+    return best.lower() if len(best) >= _MIN_TRIGGER_CHARS else None
+
+
+class _AhoCorasick:
+    """
+    Aho-Corasick automaton; scan() returns the payloads of every keyword
+    found. Transitions are memoised per node on first use (a lazily built
+    DFA), so scanning costs one dict lookup per character.
+    """
+
+    def __init__(self, keywords: Iterable[tuple[str, int]]):
+        goto: list[dict[str, int]] = [{}]
+        out: list[set[int]] = [set()]
+        for word, payload in keywords:
+            node = 0
+            for ch in word:
+                nxt = goto[node].get(ch)
+                if nxt is None:
+                    nxt = goto[node][ch] = len(goto)
+                    goto.append({})
+                    out.append(set())
+                node = nxt
+            out[node].add(payload)
+
+        fail = [0] * len(goto)
+        queue = deque(goto[0].values())
+        while queue:
+            node = queue.popleft()
+            for ch, nxt in goto[node].items():
+                queue.append(nxt)
+                f = fail[node]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f][ch] if node and ch in goto[f] else 0
+                out[nxt] |= out[fail[nxt]]
+
+        self._goto = goto
+        self._fail = fail
+        self._out = [frozenset(o) if o else None for o in out]
+        self._delta = [dict(g) for g in goto]
+
+    def _transition(self, node: int, ch: str) -> int:
+        state = node
+        while state and ch not in self._goto[state]:
+            state = self._fail[state]
+        nxt = self._goto[state].get(ch, 0)
+        self._delta[node][ch] = nxt
+        return nxt
+
+    def scan(self, text: str) -> set[int]:
+        delta, out = self._delta, self._out
+        found: set[int] = set()
+        node = 0
+        for ch in text:
+            nxt = delta[node].get(ch)
+            node = nxt if nxt is not None else self._transition(node, ch)
+            if out[node] is not None:
+                found |= out[node]
+        return found
+
+
+class ErrorMatcher:
+    """Compiled form of a set of ErrorPattern rows."""
+
+    def __init__(self, patterns: Iterable[ErrorPattern]):
+        self._patterns: dict[int, ErrorPattern] = {}
+        self._triggered: dict[int, re.Pattern] = {}          # run when their literal is seen
+        keywords: list[tuple[str, int]] = []
+        gated: list[tuple[int, re.Pattern]] = []             # no literal: behind the combined gate
+        standalone: list[tuple[int, re.Pattern]] = []        # not combinable (backrefs, inline flags)
+
+        for pattern in patterns:
+            signature = pattern.signature or ""
+            if not signature:
+                continue
+            self._patterns[pattern.id] = pattern
+            if not _REGEX_META.intersection(signature):
+                keywords.append((signature.lower(), pattern.id))
+                continue
+            try:
+                compiled = re.compile(signature, re.IGNORECASE)
+            except re.error:
+                keywords.append((signature.lower(), pattern.id))  # not a valid regex: treat as text
+                continue
+            trigger = _required_literal(signature)
+            if trigger is not None:
+                keywords.append((trigger, pattern.id))
+                self._triggered[pattern.id] = compiled
+            elif _BACKREF.search(signature) or signature.startswith("(?"):
+                standalone.append((pattern.id, compiled))
+            else:
+                gated.append((pattern.id, compiled))
+
+        self._automaton = _AhoCorasick(keywords) if keywords else None
+        self._gated = gated
+        self._standalone = standalone
+        self._gate = (
+            re.compile("|".join(f"(?:{c.pattern})" for _, c in gated), re.IGNORECASE)
+            if gated else None
+        )
+
+    def __len__(self) -> int:
+        return len(self._patterns)
+
+    def match_ids(self, line: str) -> set[int]:
+        """Ids of every pattern matching `line`."""
+        line = line[:settings.ERROR_MATCHER_MAX_LINE_CHARS]
+        found: set[int] = set()
+        if self._automaton is not None:
+            for pid in self._automaton.scan(line.lower()):
+                regex = self._triggered.get(pid)
+                if regex is None or regex.search(line):
+                    found.add(pid)
+        if self._gate is not None and self._gate.search(line):
+            found.update(pid for pid, regex in self._gated if regex.search(line))
+        for pid, regex in self._standalone:
+            if regex.search(line):
+                found.add(pid)
+        return found
+
+    def match(self, line: str, line_no: int = 0) -> list[PatternMatch]:
+        return [
+            PatternMatch(pid, self._patterns[pid].category, self._patterns[pid].solutions, line_no, line)
+            for pid in sorted(self.match_ids(line))
+        ]
+
+    def scanner(self, unique: bool = True) -> "LogScanner":
+        return LogScanner(self, unique=unique)
+
+
+class LogScanner:
+    """
+    Incremental scanner over a log stream. feed() accepts arbitrary chunks
+    (partial lines are held until their newline arrives) and returns the
+    matches found in the completed lines. With `unique`, each pattern is
+    reported only for its first matching line.
+    """
+
+    def __init__(self, matcher: ErrorMatcher, unique: bool = True):
+        self._matcher = matcher
+        self._unique = unique
+        self._seen: set[int] = set()
+        self._partial = ""
+        self.lines = 0
+
+    def feed(self, chunk: str) -> list[PatternMatch]:
+        data = self._partial + chunk
+        *complete, self._partial = data.split("\n")
+        matches: list[PatternMatch] = []
+        for line in complete:
+            matches.extend(self._scan_line(line))
+        return matches
+
+    def close(self) -> list[PatternMatch]:
+        """Scan the trailing line that had no newline."""
+        line, self._partial = self._partial, ""
+        return self._scan_line(line) if line else []
+
+    def _scan_line(self, line: str) -> list[PatternMatch]:
+        self.lines += 1
+        matches = self._matcher.match(line.rstrip("\r"), self.lines)
+        if self._unique:
+            matches = [m for m in matches if m.pattern_id not in self._seen]
+            self._seen.update(m.pattern_id for m in matches)
+        return matches
+
+
+# ---------------------------------------------------------------------------
+# Per-project-type cache with hot reload
+# ---------------------------------------------------------------------------
+
+_matchers: dict[Optional[str], tuple[Optional[str], ErrorMatcher]] = {}
+_reload_lock = asyncio.Lock()
+_version_checked_at = 0.0
+_version: Optional[str] = None
+
+
+async def _current_version() -> Optional[str]:
+    """Pattern-table version from Redis, re-read at most every ERROR_MATCHER_RELOAD_CHECK_SECONDS."""
+    global _version_checked_at, _version
+    now = time.monotonic()
+    if now - _version_checked_at < settings.ERROR_MATCHER_RELOAD_CHECK_SECONDS:
+        return _version
+    _version_checked_at = now
+    try:
+        redis = await get_redis()
+        raw = await redis.get(PATTERNS_VERSION_KEY)
+        _version = raw.decode() if isinstance(raw, bytes) else raw
+    except (RedisError, OSError) as e:
+        logger.debug("Error-pattern version check failed: %s", e)  # keep serving the cached matcher
+    return _version
+
+
+async def get_error_matcher(db: AsyncSession, project_type: Optional[str]) -> ErrorMatcher:
+    """Compiled matcher for `project_type` (plus generic patterns), rebuilt after changes."""
+    version = await _current_version()
+    cached = _matchers.get(project_type)
+    if cached is not None and cached[0] == version:
+        return cached[1]
+
+    async with _reload_lock:
+        cached = _matchers.get(project_type)
+        if cached is not None and cached[0] == version:
+            return cached[1]
+        query = select(ErrorPattern)
+        if project_type is not None:
+            query = query.where(or_(ErrorPattern.project_type == project_type, ErrorPattern.project_type.is_(None)))
+        rows = (await db.execute(query)).scalars().all()
+        start = time.perf_counter()
+        matcher = ErrorMatcher(rows)
+        logger.info(
+            "Compiled %d error patterns for %s in %.1f ms",
+            len(matcher), project_type or "all types", (time.perf_counter() - start) * 1000,
+        )
+        _matchers[project_type] = (version, matcher)
+        return matcher
+
+
+async def notify_patterns_changed() -> None:
+    """Bump the pattern version so every process rebuilds its matchers. Call after writing error_patterns."""
+    global _version_checked_at
+    _matchers.clear()
+    _version_checked_at = 0.0
+    try:
+        redis = await get_redis()
+        await redis.incr(PATTERNS_VERSION_KEY)
+    except (RedisError, OSError) as e:
+        logger.warning("Error-pattern version bump failed: %s", e)
+
+
+def clear_matcher_cache() -> None:
+    global _version_checked_at, _version
+    _matchers.clear()
+    _version_checked_at = 0.0
+    _version = None
@@ -0,0 +1,259 @@
+import asyncio
+import itertools
+import json
+import logging
+import time
+from datetime import date, datetime, timedelta, timezone
+from typing import Any, Optional
+
+from sqlalchemy import insert, select, text
+from sqlalchemy.ext.asyncio import AsyncEngine, AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import Gauge, Histogram
+from app.models.installation_event import InstallationEvent
+from app.models.installation_history import InstallationHistory
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Buffered writer  (installs emit events; one COPY / INSERT per batch)
+#
+# emit() only appends to an in-memory buffer, so a step logging thousands
+# of lines costs thousands of list appends, not thousands of statements.
+# A background task flushes every INSTALL_EVENTS_FLUSH_INTERVAL_MS or as
+# soon as INSTALL_EVENTS_MAX_BATCH events are waiting.
+# ---------------------------------------------------------------------------
+
+_COLUMNS = ("history_id", "ts", "seq", "project_id", "step", "kind", "message", "data")
+
+install_events_flush_latency = Histogram(
+    "install_events_flush_seconds",
+    "Time to write one batch of installation events.",
+)
+
+_seq = itertools.count(time.time_ns())   # monotonic within the process
+
+
+class InstallEventWriter:
+    def __init__(
+        self,
+        flush_interval_ms: Optional[int] = None,
+        max_batch: Optional[int] = None,
+        max_buffer: Optional[int] = None,
+    ):
+        self.flush_interval = (flush_interval_ms or settings.INSTALL_EVENTS_FLUSH_INTERVAL_MS) / 1000
+        self.max_batch = max_batch or settings.INSTALL_EVENTS_MAX_BATCH
+        self.max_buffer = max_buffer or settings.INSTALL_EVENTS_MAX_BUFFER
+        self.dropped = 0
+        self._buffer: list[tuple] = []
+        self._engine: Optional[AsyncEngine] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self, engine: AsyncEngine) -> None:
+        """Begin flushing on the running event loop."""
+        if self._task is not None:
+            return
+        self._engine = engine
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = self._loop.create_task(self._run())
+
+    async def close(self) -> None:
+        """Stop the flusher and write whatever is still buffered."""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        self._loop = None
+        while self._buffer:
+            await self._flush_once()
+
+    def emit(
+        self,
+        history_id: int,
+        project_id: str,
+        kind: str,
+        step: Optional[str] = None,
+        message: Optional[str] = None,
+        data: Optional[dict[str, Any]] = None,
+    ) -> None:
+        """
+        Queue one event. Never blocks and may be called from worker threads
+        (e.g. subprocess readers); drops the event if the buffer is full.
+        """
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped += 1
+            return
+        self._buffer.append((
+            history_id, datetime.now(timezone.utc), next(_seq),
+            project_id, step, kind, message, data,
+        ))
+        if len(self._buffer) >= self.max_batch and self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout=self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._wakeup.clear()
+            while self._buffer:
+                await self._flush_once()
+                if len(self._buffer) < self.max_batch:
+                    break
+
+    async def _flush_once(self) -> None:
+        batch = self._buffer[:self.max_batch]
+        del self._buffer[:len(batch)]
+        start = time.perf_counter()
+        try:
+            async with self._engine.begin() as conn:
+                await write_events(conn, batch)
+        except Exception as e:
+            # Events are diagnostics; losing a batch must not stall installs
+            self.dropped += len(batch)
+            logger.warning("Dropped %d installation events: %s", len(batch), e)
+        finally:
+            install_events_flush_latency.observe(time.perf_counter() - start)
+
+
+async def write_events(conn, rows: list[tuple]) -> None:
+    """Append `rows` (tuples in _COLUMNS order): COPY on asyncpg, one multi-row INSERT elsewhere."""
+    if conn.dialect.driver == "asyncpg":
+        raw = await conn.get_raw_connection()
+        await raw.driver_connection.copy_records_to_table(
+            InstallationEvent.__tablename__,
+            records=[
+                row[:-1] + (json.dumps(row[-1]) if row[-1] is not None else None,)
+                for row in rows
+            ],
+            columns=_COLUMNS,
+        )
+    else:
+        await conn.execute(insert(InstallationEvent), [dict(zip(_COLUMNS, row)) for row in rows])
+
+
+install_events = InstallEventWriter()
+
+Gauge(
+    "install_events_buffered",
+    "Installation events waiting to be written.",
+    lambda: len(install_events._buffer),
+)
+Gauge(
+    "install_events_dropped",
+    "Installation events dropped (buffer full or write failure) since start.",
+    lambda: install_events.dropped,
+)
+
+
+# ---------------------------------------------------------------------------
+# Timeline query
+# ---------------------------------------------------------------------------
+
+async def get_install_timeline(
+    db: AsyncSession,
+    history: InstallationHistory,
+    include_output: bool = True,
+) -> dict:
+    """
+    Rebuild a run's timeline: every event in order plus a per-step summary.
+    The query is bounded by the run's start/end so only the partitions
+    covering the run are scanned.
+    """
+    query = select(
+        InstallationEvent.ts,
+        InstallationEvent.step,
+        InstallationEvent.kind,
+        InstallationEvent.message,
+        InstallationEvent.data,
+    ).where(InstallationEvent.history_id == history.id)
+    if history.started_at is not None:
+        query = query.where(InstallationEvent.ts >= history.started_at - timedelta(minutes=1))
+    if history.completed_at is not None:
+        query = query.where(InstallationEvent.ts <= history.completed_at + timedelta(minutes=1))
+    if not include_output:
+        query = query.where(InstallationEvent.kind != "output")
+    rows = (await db.execute(query.order_by(InstallationEvent.ts, InstallationEvent.seq))).all()
+
+    steps: dict[str, dict] = {}
+    for row in rows:
+        if row.step is None:
+            continue
+        summary = steps.setdefault(row.step, {
+            "step": row.step, "status": "running",
+            "started_at": row.ts, "finished_at": None, "duration_ms": None, "output_lines": 0,
+        })
+        if row.kind == "output":
+            summary["output_lines"] += 1
+        elif row.kind in ("finished", "failed"):
+            summary["status"] = row.kind
+            summary["finished_at"] = row.ts
+            summary["duration_ms"] = int((row.ts - summary["started_at"]).total_seconds() * 1000)
+
+    return {
+        "history_id": history.id,
+        "project_id": history.project_id,
+        "steps": list(steps.values()),
+        "events": [dict(row._mapping) for row in rows],
+    }
+
+
+# ---------------------------------------------------------------------------
+# Partition maintenance  (Postgres only; run from Celery beat)
+# ---------------------------------------------------------------------------
+
+def _month_start(day: date, offset: int = 0) -> date:
+    months = day.year * 12 + day.month - 1 + offset
+    return date(months // 12, months % 12 + 1, 1)
+
+
+def _partition_name(month: date) -> str:
+    return f"{InstallationEvent.__tablename__}_{month:%Y_%m}"
+
+
+async def maintain_event_partitions(db: AsyncSession, today: Optional[date] = None) -> tuple[int, int]:
+    """
+    Create the current and upcoming monthly partitions and drop the ones
+    past retention (dropping a partition is instant, unlike DELETE).
+    Returns (created, dropped).
+    """
+    today = today or datetime.now(timezone.utc).date()
+    parent = InstallationEvent.__tablename__
+
+    existing = set((await db.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :parent"
+    ), {"parent": parent})).scalars())
+
+    created = 0
+    for offset in range(settings.INSTALL_EVENTS_PARTITIONS_AHEAD + 1):
+        month = _month_start(today, offset)
+        name = _partition_name(month)
+        if name in existing:
+            continue
+        await db.execute(text(
+            f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {parent} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_month_start(month, 1).isoformat()}')"
+        ))
+        created += 1
+
+    dropped = 0
+    if settings.INSTALL_EVENTS_RETENTION_MONTHS > 0:
+        oldest_kept = _partition_name(_month_start(today, -settings.INSTALL_EVENTS_RETENTION_MONTHS))
+        for name in sorted(existing):
+            if name < oldest_kept:
+                await db.execute(text(f"DROP TABLE IF EXISTS {name}"))
+                dropped += 1
+
+    return created, dropped
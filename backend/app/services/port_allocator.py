@@ -0,0 +1,295 @@
+import asyncio
+import errno
+import json
+import logging
+import os
+import socket
+import time
+from collections import deque
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.metrics import Gauge
+from app.core.redis import get_redis
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Port allocator for started projects
+#
+# Each worker keeps [PORT_RANGE_START, PORT_RANGE_END] as a bitmap (bit set
+# = port taken) plus a FIFO of candidate free ports: allocate pops, release
+# pushes to the back, both O(1). A candidate whose bit was set in the
+# meantime is skipped when popped.
+#
+# Ownership across workers and nodes is the Redis hash `ports:owners`
+# (port -> owner JSON: host, worker pid, app pid, project). A port is taken
+# with a single HSETNX, so two allocators can never hold the same port; the
+# loser marks the bit and pops the next candidate.
+#
+# reclaim() runs every PORT_RECLAIM_INTERVAL_SECONDS. It refreshes this
+# host's heartbeat, reads the hash once and frees reservations that nobody
+# can release any more: on this host, those whose worker and app pids are
+# both dead, or that this very worker no longer holds (a release whose Redis
+# delete failed); elsewhere, those of hosts that stopped heartbeating. It then
+# resyncs the local bitmap with what other allocators hold. Without Redis
+# the allocator degrades to this worker's bitmap.
+# ---------------------------------------------------------------------------
+
+_OWNERS_KEY = "ports:owners"
+_HOST_KEY = "ports:host:{}"
+
+# Replace (or, with an empty new value, delete) an owner entry only if it is
+# still the one the caller saw. Returns 1 when applied.
+_SWAP_OWNER_LUA = """
+if redis.call('HGET', KEYS[1], ARGV[1]) ~= ARGV[2] then
+    return 0
+end
+if ARGV[3] == '' then
+    redis.call('HDEL', KEYS[1], ARGV[1])
+else
+    redis.call('HSET', KEYS[1], ARGV[1], ARGV[3])
+end
+return 1
+"""
+
+
+class PortBitmap:
+    """Taken/free state of the ports in [low, high]; allocate, claim and release are O(1)."""
+
+    def __init__(self, low: int, high: int):
+        if not 0 < low <= high <= 65535:
+            raise ValueError(f"Invalid port range {low}-{high}")
+        self.low, self.high = low, high
+        size = high - low + 1
+        self._taken = bytearray((size + 7) // 8)
+        self._queued = bytearray(b"\xff" * len(self._taken))  # port is in _free (at most once)
+        self._free = deque(range(low, high + 1))
+        self._count = 0
+
+    def _bit(self, port: int) -> tuple[int, int]:
+        i = port - self.low
+        if not 0 <= i <= self.high - self.low:
+            raise ValueError(f"Port {port} outside {self.low}-{self.high}")
+        return i >> 3, 1 << (i & 7)
+
+    def taken(self, port: int) -> bool:
+        byte, mask = self._bit(port)
+        return bool(self._taken[byte] & mask)
+
+    def claim(self, port: int) -> bool:
+        """Mark `port` taken; False if it already was."""
+        byte, mask = self._bit(port)
+        if self._taken[byte] & mask:
+            return False
+        self._taken[byte] |= mask
+        self._count += 1
+        return True
+
+    def allocate(self) -> Optional[int]:
+        """Take the free port that has been free the longest."""
+        while self._free:
+            port = self._free.popleft()
+            byte, mask = self._bit(port)
+            self._queued[byte] &= ~mask
+            if self.claim(port):
+                return port
+        return None
+
+    def release(self, port: int) -> None:
+        byte, mask = self._bit(port)
+        if self._taken[byte] & mask:
+            self._taken[byte] &= ~mask
+            self._count -= 1
+        if not self._queued[byte] & mask:
+            self._queued[byte] |= mask
+            self._free.append(port)
+
+    def __len__(self) -> int:
+        """Number of free ports."""
+        return self.high - self.low + 1 - self._count
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _bindable(port: int) -> bool:
+    """False when something outside the allocator (another service on the host) listens on the port."""
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as s:
+        # Connections of a previous run lingering in TIME_WAIT do not make the port busy
+        s.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        try:
+            s.bind(("0.0.0.0", port))
+        except OSError as e:
+            return e.errno != errno.EADDRINUSE
+    return True
+
+
+class PortAllocator:
+    def __init__(self, low: Optional[int] = None, high: Optional[int] = None, host: Optional[str] = None):
+        self.bitmap = PortBitmap(
+            settings.PORT_RANGE_START if low is None else low,
+            settings.PORT_RANGE_END if high is None else high,
+        )
+        self.host = host or settings.PORT_NODE_ID or socket.gethostname()
+        self._owners: dict[int, str] = {}    # ports this worker holds -> owner value stored in Redis
+        self._foreign: set[int] = set()      # ports marked taken because someone else holds them
+        self._task: Optional[asyncio.Task] = None
+
+    def _owner(self, project_id: str, pid: Optional[int] = None) -> str:
+        return json.dumps({
+            "host": self.host, "worker": os.getpid(), "pid": pid,
+            "project": project_id, "at": round(time.time(), 3),
+        })
+
+    async def _swap(self, port: int, expected: str, new: str) -> bool:
+        redis = await get_redis()
+        return bool(await redis.eval(_SWAP_OWNER_LUA, 1, _OWNERS_KEY, port, expected, new))
+
+    # -- allocate / attach / release ------------------------------------------
+
+    async def allocate(self, project_id: str, prefer: Optional[int] = None) -> Optional[int]:
+        """
+        Reserve a port for `project_id` cluster-wide: `prefer` (e.g. the port
+        of its last run) if that is free, else the next free one. None when
+        the range is exhausted.
+        """
+        bitmap = self.bitmap
+        if prefer is not None and bitmap.low <= prefer <= bitmap.high and bitmap.claim(prefer):
+            if await self._reserve(prefer, project_id):
+                return prefer
+        while (port := bitmap.allocate()) is not None:
+            if await self._reserve(port, project_id):
+                return port
+        return None
+
+    async def _reserve(self, port: int, project_id: str) -> bool:
+        """Claim a port already taken in the bitmap; False (bit left set) if someone else holds it."""
+        if not _bindable(port):
+            self._foreign.add(port)
+            return False
+        owner = self._owner(project_id)
+        self._owners[port] = owner           # before HSETNX: reclaim() must not take it for a leftover
+        try:
+            redis = await get_redis()
+            claimed = await redis.hsetnx(_OWNERS_KEY, port, owner)
+        except (RedisError, OSError) as e:
+            logger.warning("Port reservation in Redis failed, allocating locally: %s", e)
+            claimed = True
+        if not claimed:
+            del self._owners[port]
+            self._foreign.add(port)          # another worker or node holds it
+            return False
+        return True
+
+    async def attach(self, port: int, pid: int) -> None:
+        """Record the app's pid on the reservation: it survives this worker as long as the app runs."""
+        current = self._owners.get(port)
+        if current is None:
+            return
+        owner = self._owner(json.loads(current)["project"], pid)
+        try:
+            if await self._swap(port, current, owner):
+                self._owners[port] = owner
+        except (RedisError, OSError) as e:
+            logger.warning("Recording pid %s for port %s failed: %s", pid, port, e)
+
+    async def release(self, port: int) -> None:
+        owner = self._owners.pop(port, None)
+        if owner is not None:
+            try:
+                await self._swap(port, owner, "")
+            except (RedisError, OSError) as e:
+                # The next reclaim pass frees it: this worker no longer holds the port
+                logger.warning("Releasing port %s in Redis failed: %s", port, e)
+        self._foreign.discard(port)
+        self.bitmap.release(port)
+
+    # -- reclamation ----------------------------------------------------------
+
+    async def reclaim(self) -> int:
+        """Free reservations held by dead pids or dead hosts and resync the bitmap; returns ports freed."""
+        redis = await get_redis()
+        await redis.set(_HOST_KEY.format(self.host), os.getpid(), ex=settings.PORT_HOST_TTL_SECONDS)
+        # allocate() and release() keep running during the awaits below: work from snapshots
+        mine, foreign = dict(self._owners), set(self._foreign)
+        owners = await redis.hgetall(_OWNERS_KEY)
+
+        parsed: dict[int, tuple[str, dict]] = {}
+        for raw_port, raw in owners.items():
+            try:
+                parsed[int(raw_port)] = (raw, json.loads(raw))
+            except (TypeError, ValueError):
+                continue
+        other_hosts = sorted({o.get("host") for _, o in parsed.values()} - {self.host})
+        flags = await asyncio.gather(*(redis.exists(_HOST_KEY.format(h)) for h in other_hosts))
+        live_hosts = {self.host, *(h for h, up in zip(other_hosts, flags) if up)}
+
+        freed = 0
+        held: set[int] = set()
+        for port, (raw, owner) in parsed.items():
+            if owner.get("host") == self.host:
+                pids = [p for p in (owner.get("worker"), owner.get("pid")) if p]
+                dead = port not in self._owners and (
+                    owner.get("worker") == os.getpid() or not any(_pid_alive(p) for p in pids)
+                )
+            else:
+                dead = owner.get("host") not in live_hosts
+            if dead and await self._swap(port, raw, ""):
+                logger.info("Reclaimed port %s from %s pid %s (project %s)",
+                            port, owner.get("host"), owner.get("pid"), owner.get("project"))
+                freed += 1
+                continue
+            held.add(port)
+
+        # Resync: ports nobody holds any more become allocatable again here
+        for port in foreign - held:
+            if port in self._foreign:
+                self._foreign.discard(port)
+                self.bitmap.release(port)
+        for port in held - mine.keys() - self._owners.keys():
+            if self.bitmap.low <= port <= self.bitmap.high and self.bitmap.claim(port):
+                self._foreign.add(port)
+        # Our own reservations missing from Redis (allocated while it was down, or lost by a restart).
+        # Ports reserved since the snapshot are being claimed by _reserve itself; released
+        # or re-attached ones are no longer what we saw.
+        for port, owner in mine.items():
+            if port in held or self._owners.get(port) != owner:
+                continue
+            if not await redis.hsetnx(_OWNERS_KEY, port, owner):
+                logger.warning("Port %s of project %s is now reserved elsewhere", port, json.loads(owner)["project"])
+        return freed
+
+    async def _reclaim_loop(self) -> None:
+        while True:
+            try:
+                await self.reclaim()
+            except (RedisError, OSError) as e:
+                logger.warning("Port reclamation failed: %s", e)
+            except Exception:
+                logger.exception("Port reclamation pass failed")   # keep the loop alive for the next pass
+            await asyncio.sleep(settings.PORT_RECLAIM_INTERVAL_SECONDS)
+
+    def start_background(self) -> None:
+        if self._task is None:
+            self._task = asyncio.create_task(self._reclaim_loop())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+port_allocator = PortAllocator()
+
+Gauge("ports_free", "Ports of the project port range this worker can still allocate.", lambda: len(port_allocator.bitmap))
@@ -0,0 +1,578 @@
+import asyncio
+import logging
+import os
+import re
+import signal
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.metrics import Gauge, Histogram
+from app.models.project import ProjectStatus
+from app.services.port_allocator import port_allocator
+from app.services.project_service import set_project_statuses
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Process supervisor  (run steps of installed projects)
+#
+# Each project's app runs in its own process group (start_new_session), so
+# stop() signals the whole tree — npm start, mvn spring-boot:run and the
+# like fork the real server. One coroutine per process drains its output
+# and applies the restart policy when it exits; there are no threads, so a
+# node can hold thousands of children.
+#
+# Resource usage is sampled in one pass over /proc every
+# SUPERVISOR_SAMPLE_INTERVAL_SECONDS, summing CPU ticks and RSS per process
+# group, rather than one syscall round per project.
+#
+# Status transitions are not written as they happen: they are coalesced per
+# project (last one wins) and flushed every SUPERVISOR_STATUS_FLUSH_MS in
+# one transaction through project_service.set_project_statuses.
+#
+# Idle projects are stopped: the same sampling pass reads /proc/net/tcp{,6}
+# once and counts any connection to each app's port as traffic (readiness
+# probes included), in every state but LISTEN. A short request finished
+# between two samples still shows as TIME_WAIT (or the CLOSE_WAIT/FIN_WAIT
+# states) for up to a minute, so it is not missed. An app with neither traffic nor output for
+# SUPERVISOR_IDLE_STOP_MINUTES is stopped like a user stop. resume() later
+# restarts it with the command and environment of its last run, skipping
+# plan building and install steps.
+# ---------------------------------------------------------------------------
+
+_LINE_BREAK = re.compile(rb"\r\n|\r|\n")
+_CLK_TCK = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+_PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+supervisor_status_flush_latency = Histogram(
+    "supervisor_status_flush_seconds",
+    "Time to write one batch of supervised project status changes.",
+)
+
+
+@dataclass(frozen=True)
+class RestartPolicy:
+    mode: str = "on-failure"         # never | on-failure | always
+    max_restarts: Optional[int] = None
+    backoff: Optional[float] = None
+    backoff_max: Optional[float] = None
+
+    def should_restart(self, exit_code: Optional[int]) -> bool:
+        if self.mode == "always":
+            return True
+        return self.mode == "on-failure" and exit_code != 0
+
+    def delay(self, restarts: int) -> float:
+        base = self.backoff if self.backoff is not None else settings.SUPERVISOR_RESTART_BACKOFF_SECONDS
+        cap = self.backoff_max if self.backoff_max is not None else settings.SUPERVISOR_RESTART_BACKOFF_MAX_SECONDS
+        return min(cap, base * 2 ** restarts)
+
+    @property
+    def limit(self) -> int:
+        return self.max_restarts if self.max_restarts is not None else settings.SUPERVISOR_MAX_RESTARTS
+
+
+@dataclass
+class ManagedProcess:
+    project_id: str
+    command: list[str]
+    cwd: Path
+    env: Optional[dict]
+    policy: RestartPolicy
+    port: Optional[int] = None       # reserved through port_allocator, released when supervision ends
+    listen_port: Optional[int] = None        # where the app actually serves, when it ignores PORT
+    state: str = "starting"          # starting | running | unready | backoff | stopping | stopped | exited | failed
+    pid: Optional[int] = None
+    restarts: int = 0
+    started_at: Optional[float] = None       # time.time() of the current run
+    exit_code: Optional[int] = None
+    cpu_percent: float = 0.0
+    rss_bytes: int = 0
+    last_output_at: Optional[float] = None   # time.monotonic()
+    last_traffic_at: Optional[float] = None  # time.monotonic() a connection to `port` was last seen
+    stop_reason: Optional[str] = None        # requested | idle
+    ready_latency_ms: Optional[float] = None # spawn -> ready_check passed, for the current run
+    tail: deque = field(default_factory=lambda: deque(maxlen=settings.SUPERVISOR_LOG_TAIL_LINES))
+    process: Optional[asyncio.subprocess.Process] = field(default=None, repr=False)
+    task: Optional[asyncio.Task] = field(default=None, repr=False)
+    stop_requested: asyncio.Event = field(default_factory=asyncio.Event, repr=False)
+    on_ready: Optional[Callable[["ManagedProcess"], None]] = field(default=None, repr=False)
+    _cpu_ticks: Optional[int] = field(default=None, repr=False)
+    _sampled_at: Optional[float] = field(default=None, repr=False)
+
+    def info(self) -> dict:
+        return {
+            "project_id": self.project_id,
+            "state": self.state,
+            "pid": self.pid,
+            "port": self.port,
+            "listen_port": self.listen_port,
+            "restarts": self.restarts,
+            "exit_code": self.exit_code,
+            "started_at": self.started_at,
+            "ready_latency_ms": self.ready_latency_ms,
+            "stop_reason": self.stop_reason,
+            "cpu_percent": round(self.cpu_percent, 1),
+            "rss_bytes": self.rss_bytes,
+            "output": list(self.tail),
+        }
+
+
+def read_proc_groups(pgids: set[int], proc: Path = Path("/proc")) -> dict[int, tuple[int, int]]:
+    """
+    One pass over /proc: {pgid: (utime + stime ticks, rss bytes)} summed
+    over every live process in each of `pgids`.
+    """
+    totals: dict[int, list[int]] = {}
+    try:
+        entries = os.listdir(proc)
+    except OSError:
+        return {}
+    for name in entries:
+        if not name.isdigit():
+            continue
+        try:
+            with open(proc / name / "stat", "rb") as f:
+                raw = f.read()
+        except OSError:
+            continue                     # exited between listdir and open
+        # comm may contain spaces and parens: fields start after the last ')'
+        fields = raw[raw.rfind(b")") + 2:].split()
+        try:
+            pgrp = int(fields[2])
+            if pgrp not in pgids:
+                continue
+            ticks = int(fields[11]) + int(fields[12])
+            rss = int(fields[21]) * _PAGE_SIZE
+        except (IndexError, ValueError):
+            continue
+        total = totals.setdefault(pgrp, [0, 0])
+        total[0] += ticks
+        total[1] += rss
+    return {pgid: (t[0], t[1]) for pgid, t in totals.items()}
+
+
+# 127.0.0.1, ::1 and ::ffff:127.0.0.1 as /proc/net/tcp{,6} print them (host-order words)
+_LOOPBACK = (b"0100007F", b"00000000000000000000000001000000", b"0000000000000000FFFF00000100007F")
+
+
+def read_tcp_activity(ports: set[int], proc: Path = Path("/proc")) -> set[int]:
+    """
+    The ports among `ports` with at least one TCP connection (IPv4 and IPv6)
+    in any state but LISTEN, including recently closed ones (TIME_WAIT).
+    The client side of a local connection (e.g. a reverse proxy on this
+    host) counts too: it is the one left in TIME_WAIT when it closes first.
+    """
+    active: set[int] = set()
+    for table in ("tcp", "tcp6"):
+        try:
+            with open(proc / "net" / table, "rb") as f:
+                next(f, None)                # header
+                for line in f:
+                    fields = line.split()
+                    if len(fields) < 4 or fields[3] == b"0A":     # 0A = LISTEN
+                        continue
+                    port = int(fields[1].rsplit(b":", 1)[1], 16)   # local_address is ADDR:PORT in hex
+                    if port in ports:
+                        active.add(port)
+                        continue
+                    address, remote = fields[2].rsplit(b":", 1)
+                    remote = int(remote, 16)
+                    if remote in ports and address in _LOOPBACK:
+                        active.add(remote)
+        except (OSError, ValueError, IndexError):
+            continue
+    return active
+
+
+def read_listening_ports(pgid: int, proc: Path = Path("/proc")) -> set[int]:
+    """TCP ports (IPv4 and IPv6) that processes of group `pgid` listen on, matched by socket inode."""
+    inodes: set[bytes] = set()
+    try:
+        entries = os.listdir(proc)
+    except OSError:
+        return set()
+    for name in entries:
+        if not name.isdigit():
+            continue
+        try:
+            with open(proc / name / "stat", "rb") as f:
+                raw = f.read()
+            if int(raw[raw.rfind(b")") + 2:].split()[2]) != pgid:
+                continue
+            fds = os.listdir(proc / name / "fd")
+        except (OSError, IndexError, ValueError):
+            continue
+        for fd in fds:
+            try:
+                link = os.readlink(proc / name / "fd" / fd)
+            except OSError:
+                continue
+            if link.startswith("socket:["):
+                inodes.add(link[8:-1].encode())
+    ports: set[int] = set()
+    if not inodes:
+        return ports
+    for table in ("tcp", "tcp6"):
+        try:
+            with open(proc / "net" / table, "rb") as f:
+                next(f, None)                # header
+                for line in f:
+                    fields = line.split()
+                    if len(fields) > 9 and fields[3] == b"0A" and fields[9] in inodes:   # 0A = LISTEN
+                        ports.add(int(fields[1].rsplit(b":", 1)[1], 16))
+        except (OSError, ValueError, IndexError):
+            continue
+    return ports
+
+
+def _signal_group(pid: int, sig: int) -> None:
+    try:
+        os.killpg(pid, sig)
+    except (ProcessLookupError, PermissionError):
+        pass
+
+
+class ProcessSupervisor:
+    def __init__(self, session_factory: Optional[Callable[[], AsyncSession]] = None):
+        self.session_factory = session_factory
+        self._procs: dict[str, ManagedProcess] = {}
+        self._pending_status: dict[str, dict] = {}
+        self._flush_wakeup: Optional[asyncio.Event] = None
+        self._tasks: list[asyncio.Task] = []
+        # Decides when a started process counts as running (e.g. a readiness probe);
+        # None marks it running as soon as it is spawned.
+        self.ready_check: Optional[Callable[[ManagedProcess], Awaitable[bool]]] = None
+
+    # -- lifecycle ------------------------------------------------------------
+
+    def start_background(self, session_factory: Callable[[], AsyncSession]) -> None:
+        """Start the sampler and the status flusher on the running loop."""
+        if self._tasks:
+            return
+        self.session_factory = session_factory
+        self._flush_wakeup = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._sample_loop()),
+            asyncio.create_task(self._flush_loop()),
+        ]
+
+    async def close(self) -> None:
+        """Stop every managed process, then the background tasks, flushing final statuses."""
+        await asyncio.gather(*(self.stop(pid) for pid in list(self._procs)), return_exceptions=True)
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self.flush()
+
+    def get(self, project_id: str) -> Optional[ManagedProcess]:
+        return self._procs.get(project_id)
+
+    def active(self, project_id: str) -> Optional[ManagedProcess]:
+        """The project's process if it is being supervised (starting, running, unready or in backoff)."""
+        managed = self._procs.get(project_id)
+        if managed is not None and managed.task is not None and not managed.task.done():
+            return managed
+        return None
+
+    def __len__(self) -> int:
+        return sum(1 for p in self._procs.values() if p.pid is not None)
+
+    # -- start / stop ---------------------------------------------------------
+
+    async def start(
+        self,
+        project_id: str,
+        command: list[str],
+        cwd: Path,
+        env: Optional[dict] = None,
+        policy: Optional[RestartPolicy] = None,
+        port: Optional[int] = None,
+        on_ready: Optional[Callable[[ManagedProcess], None]] = None,
+    ) -> ManagedProcess:
+        """
+        Launch `command` for a project (no-op if it is already supervised and
+        alive). The supervisor takes over `port` and releases it once the
+        process is stopped for good; `on_ready` is called each time a run
+        passes ready_check, or is left running as unready after failing it.
+        """
+        current = self.active(project_id)
+        if current is not None:
+            return current
+        managed = ManagedProcess(project_id, command, Path(cwd), env, policy or RestartPolicy(), port)
+        managed.on_ready = on_ready
+        self._procs[project_id] = managed
+        managed.task = asyncio.create_task(self._supervise(managed))
+        return managed
+
+    async def resume(
+        self,
+        project_id: str,
+        port: Optional[int] = None,
+        on_ready: Optional[Callable[[ManagedProcess], None]] = None,
+    ) -> Optional[ManagedProcess]:
+        """
+        Restart a stopped project with the command, cwd, env and policy of its
+        last run here (PORT rewritten to `port`). None if it never ran on
+        this supervisor; the running process if it is still supervised.
+        """
+        previous = self._procs.get(project_id)
+        if previous is None:
+            return None
+        env = previous.env
+        if port is not None:
+            env = {**(os.environ if env is None else env), "PORT": str(port)}
+        return await self.start(project_id, previous.command, previous.cwd, env, previous.policy, port, on_ready)
+
+    def forget(self, project_id: str) -> None:
+        """Drop a stopped project's last run (e.g. after re-installing), so the next start re-reads its steps."""
+        if self.active(project_id) is None:
+            self._procs.pop(project_id, None)
+
+    async def stop(self, project_id: str, grace: Optional[float] = None, reason: str = "requested") -> bool:
+        """SIGTERM the project's process group, SIGKILL after `grace`; no restart follows."""
+        managed = self._procs.get(project_id)
+        if managed is None:
+            return False
+        if not managed.stop_requested.is_set():
+            managed.stop_reason = reason
+        managed.stop_requested.set()
+        process = managed.process
+        if process is not None and process.returncode is None:
+            managed.state = "stopping"
+            _signal_group(process.pid, signal.SIGTERM)
+        # A spawn still in flight sees stop_requested and signals its own group (see _run)
+        if managed.task is not None:
+            grace = grace if grace is not None else settings.SUPERVISOR_STOP_GRACE_SECONDS
+            done, _ = await asyncio.wait({managed.task}, timeout=grace)
+            if not done:
+                if managed.process is not None:
+                    _signal_group(managed.process.pid, signal.SIGKILL)
+                await asyncio.gather(managed.task, return_exceptions=True)
+        return True
+
+    # -- supervision ----------------------------------------------------------
+
+    async def _spawn(self, managed: ManagedProcess) -> None:
+        managed.process = await asyncio.create_subprocess_exec(
+            *managed.command,
+            cwd=str(managed.cwd),
+            env=managed.env,
+            stdin=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.STDOUT,
+            start_new_session=True,
+        )
+        managed.pid = managed.process.pid
+        managed.started_at = time.time()
+        managed.exit_code = managed.ready_latency_ms = managed.listen_port = None
+        managed._cpu_ticks = managed._sampled_at = None
+        if managed.port is not None:
+            await port_allocator.attach(managed.port, managed.pid)
+
+    async def _drain(self, managed: ManagedProcess) -> None:
+        stream = managed.process.stdout
+        buffer = b""
+        while chunk := await stream.read(65536):
+            *lines, buffer = _LINE_BREAK.split(buffer + chunk)
+            for line in lines:
+                if line.strip():
+                    managed.tail.append(line.decode("utf-8", errors="replace"))
+            managed.last_output_at = time.monotonic()
+        if buffer.strip():
+            managed.tail.append(buffer.decode("utf-8", errors="replace"))
+
+    async def _mark_ready(self, managed: ManagedProcess) -> None:
+        process = managed.process
+        ready = True
+        if self.ready_check is not None:
+            ready = await self.ready_check(managed)
+            if process.returncode is not None:
+                return
+            if not ready:
+                # Alive but not answering HTTP where we looked (or not a web app at
+                # all): report it and leave it running rather than guess
+                logger.warning("%s is not serving HTTP; leaving it running as unready", managed.project_id)
+                managed.tail.append("[supervisor] not serving HTTP in time, left running as unready")
+        if managed.state == "starting":
+            managed.state = "running" if ready else "unready"
+            managed.last_traffic_at = time.monotonic()     # the readiness probe was its first request
+            if ready:
+                # Unready keeps the project's current status: nothing is known to serve on its port
+                self._queue_status(managed.project_id, ProjectStatus.running, managed.pid,
+                                   managed.listen_port or managed.port)
+            if managed.on_ready is not None:
+                managed.on_ready(managed)
+
+    async def _supervise(self, managed: ManagedProcess) -> None:
+        try:
+            await self._run(managed)
+        finally:
+            if managed.port is not None:
+                await port_allocator.release(managed.port)
+
+    async def _run(self, managed: ManagedProcess) -> None:
+        while True:
+            if managed.stop_requested.is_set():          # stopped before the first spawn
+                managed.state = "stopped"
+                self._queue_status(managed.project_id, ProjectStatus.stopped, None)
+                return
+            managed.state = "starting"
+            try:
+                await self._spawn(managed)
+            except OSError as e:
+                logger.warning("Could not start %s: %s", managed.project_id, e)
+                managed.tail.append(str(e))
+                managed.state, managed.pid = "failed", None
+                self._queue_status(managed.project_id, ProjectStatus.failed, None)
+                return
+            if managed.stop_requested.is_set():
+                # stop() ran while spawning and had no process group to signal yet
+                managed.state = "stopping"
+                _signal_group(managed.process.pid, signal.SIGTERM)
+
+            ready = asyncio.create_task(self._mark_ready(managed))
+            await self._drain(managed)
+            managed.exit_code = await managed.process.wait()
+            ready.cancel()
+            uptime = time.time() - managed.started_at
+            managed.pid, managed.cpu_percent, managed.rss_bytes = None, 0.0, 0
+
+            if managed.stop_requested.is_set():
+                managed.state = "stopped"
+                self._queue_status(managed.project_id, ProjectStatus.stopped, None)
+                return
+            if not managed.policy.should_restart(managed.exit_code):
+                managed.state = "exited" if managed.exit_code == 0 else "failed"
+                self._queue_status(
+                    managed.project_id,
+                    ProjectStatus.stopped if managed.exit_code == 0 else ProjectStatus.failed,
+                    None,
+                )
+                return
+            if uptime >= settings.SUPERVISOR_STABLE_SECONDS:
+                managed.restarts = 0
+            if managed.restarts >= managed.policy.limit:
+                logger.warning("%s exited %s; restart limit reached", managed.project_id, managed.exit_code)
+                managed.state = "failed"
+                self._queue_status(managed.project_id, ProjectStatus.failed, None)
+                return
+
+            delay = managed.policy.delay(managed.restarts)
+            managed.restarts += 1
+            managed.state = "backoff"
+            self._queue_status(managed.project_id, ProjectStatus.failed, None)
+            logger.info("%s exited %s; restart %d in %.1fs", managed.project_id, managed.exit_code,
+                        managed.restarts, delay)
+            try:
+                await asyncio.wait_for(managed.stop_requested.wait(), delay)
+            except asyncio.TimeoutError:
+                continue
+            managed.state = "stopped"
+            self._queue_status(managed.project_id, ProjectStatus.stopped, None)
+            return
+
+    # -- /proc sampling -------------------------------------------------------
+
+    def sample(self) -> None:
+        """Refresh cpu_percent / rss_bytes / last_traffic_at of every live process group."""
+        live = {m.pid: m for m in self._procs.values() if m.pid is not None}
+        if not live:
+            return
+        now = time.monotonic()
+        usage = read_proc_groups(set(live))
+        ports = {m.listen_port or m.port for m in live.values()} - {None}
+        busy = read_tcp_activity(ports)
+        for pgid, managed in live.items():
+            ticks, rss = usage.get(pgid, (0, 0))
+            if managed._cpu_ticks is not None and now > managed._sampled_at:
+                delta = max(0, ticks - managed._cpu_ticks)
+                managed.cpu_percent = 100.0 * delta / _CLK_TCK / (now - managed._sampled_at)
+            managed._cpu_ticks, managed._sampled_at = ticks, now
+            managed.rss_bytes = rss
+            if (managed.listen_port or managed.port) in busy:
+                managed.last_traffic_at = now
+
+    def idle(self, now: Optional[float] = None) -> list[ManagedProcess]:
+        """Running processes with no traffic and no output for SUPERVISOR_IDLE_STOP_MINUTES (0 disables)."""
+        limit = settings.SUPERVISOR_IDLE_STOP_MINUTES * 60
+        if limit <= 0:
+            return []
+        now = time.monotonic() if now is None else now
+        return [
+            m for m in self._procs.values()
+            if m.state == "running"
+            and now - max(m.last_traffic_at or 0.0, m.last_output_at or 0.0) >= limit
+        ]
+
+    async def stop_idle(self) -> int:
+        """Stop every idle process (in parallel); returns how many were stopped."""
+        idle = self.idle()
+        for managed in idle:
+            logger.info("Stopping idle project %s (no traffic or output for %.0f min)",
+                        managed.project_id, settings.SUPERVISOR_IDLE_STOP_MINUTES)
+        await asyncio.gather(*(self.stop(m.project_id, reason="idle") for m in idle))
+        return len(idle)
+
+    async def _sample_loop(self) -> None:
+        while True:
+            await asyncio.sleep(settings.SUPERVISOR_SAMPLE_INTERVAL_SECONDS)
+            try:
+                await asyncio.to_thread(self.sample)
+                await self.stop_idle()
+            except Exception as e:
+                logger.warning("Process sampling failed: %s", e)
+
+    # -- batched status writes ------------------------------------------------
+
+    def _queue_status(
+        self, project_id: str, status: ProjectStatus, pid: Optional[int], port: Optional[int] = None
+    ) -> None:
+        self._pending_status[project_id] = {"status": status, "pid": pid, "port": port}
+        if self._flush_wakeup is not None and len(self._pending_status) >= settings.SUPERVISOR_STATUS_MAX_BATCH:
+            self._flush_wakeup.set()
+
+    async def flush(self) -> int:
+        """Write queued status changes in one transaction; re-queued on failure."""
+        if not self._pending_status or self.session_factory is None:
+            return 0
+        batch, self._pending_status = self._pending_status, {}
+        start = time.perf_counter()
+        try:
+            async with self.session_factory() as db:
+                written = await set_project_statuses(db, batch)
+                await db.commit()
+            return written
+        except Exception as e:
+            logger.warning("Writing %d project statuses failed: %s", len(batch), e)
+            self._pending_status = {**batch, **self._pending_status}   # newer changes win
+            return 0
+        finally:
+            supervisor_status_flush_latency.observe(time.perf_counter() - start)
+
+    async def _flush_loop(self) -> None:
+        interval = settings.SUPERVISOR_STATUS_FLUSH_MS / 1000
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), timeout=interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            await self.flush()
+
+
+supervisor = ProcessSupervisor()
+
+Gauge("supervised_processes", "Project processes currently alive under the supervisor.", lambda: len(supervisor))
+Gauge(
+    "supervisor_status_pending",
+    "Project status changes waiting to be written.",
+    lambda: len(supervisor._pending_status),
+)
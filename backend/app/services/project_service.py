@@ -0,0 +1,357 @@
+import base64
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Literal, Optional
+
+from sqlalchemy import delete, func, insert, select, text, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.core.json_ops import json_has_key, json_text
+from app.db.crud import project_crud
+from app.models.project import Project, ProjectStatus
+from app.models.user_project_stats import UserProjectStats, UserStackCount
+from app.schemas.auth import ProjectSummary
+
+# ---------------------------------------------------------------------------
+# Project listing  (keyset pagination on (created_at, id))
+# ---------------------------------------------------------------------------
+
+# Only the columns ProjectSummary needs — served from the covering index
+_SUMMARY_COLUMNS = (
+    Project.id,
+    Project.name,
+    Project.type,
+    Project.status,
+    Project.created_at,
+    Project.port,
+)
+
+CountMode = Literal["exact", "estimate", "none"]     # how get_user_projects_page computes total
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(created_at: datetime, project_id: str) -> str:
+    raw = f"{created_at.isoformat()}|{project_id}".encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, str]:
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)).decode()
+        created_at, project_id = raw.split("|", 1)
+        return datetime.fromisoformat(created_at), project_id
+    except (ValueError, UnicodeDecodeError):
+        raise InvalidCursor("Invalid cursor")
+
+
+@dataclass(frozen=True)
+class ProjectFilters:
+    status: Optional[str] = None
+    type: Optional[str] = None
+    pm: Optional[str] = None            # metadata.detected_pm
+    env_var: Optional[str] = None       # key present in metadata.env_vars
+    constraint: Optional[str] = None    # key present in metadata.version_constraints
+
+
+def _filtered(query, user_id: str, filters: ProjectFilters):
+    query = query.where(Project.user_id == user_id)
+    if filters.status:
+        query = query.where(Project.status == filters.status)
+    if filters.type:
+        query = query.where(Project.type == filters.type)
+    # Metadata predicates match the expression / GIN indexes on projects
+    if filters.pm:
+        query = query.where(json_text(Project.metadata_, "detected_pm") == filters.pm)
+    if filters.env_var:
+        query = query.where(json_has_key(Project.metadata_, "env_vars", filters.env_var))
+    if filters.constraint:
+        query = query.where(json_has_key(Project.metadata_, "version_constraints", filters.constraint))
+    return query
+
+
+async def count_user_projects(
+    db: AsyncSession,
+    user_id: str,
+    filters: ProjectFilters = ProjectFilters(),
+    cap: Optional[int] = None,
+) -> int:
+    """
+    Count the user's projects matching the filters.
+    With `cap`, counting stops after `cap` rows, so the cost is bounded.
+    """
+    inner = _filtered(select(Project.id), user_id, filters)
+    if cap is not None:
+        inner = inner.limit(cap)
+    result = await db.execute(select(func.count()).select_from(inner.subquery()))
+    return result.scalar_one()
+
+
+async def list_user_projects(
+    db: AsyncSession,
+    user_id: str,
+    per_page: int,
+    cursor: Optional[str] = None,
+    offset: int = 0,
+    filters: ProjectFilters = ProjectFilters(),
+) -> tuple[list[ProjectSummary], Optional[str]]:
+    """
+    One page of the user's projects, newest first.
+
+    With `cursor` the page starts strictly after that (created_at, id) and the
+    query is an index range scan, so cost does not grow with depth. `offset`
+    is only used by legacy page-number requests.
+
+    Returns (items, next_cursor); next_cursor is None on the last page.
+    """
+    query = _filtered(select(*_SUMMARY_COLUMNS), user_id, filters)
+    if cursor:
+        created_at, project_id = decode_cursor(cursor)
+        query = query.where(tuple_(Project.created_at, Project.id) < tuple_(created_at, project_id))
+    elif offset:
+        query = query.offset(offset)
+
+    query = query.order_by(Project.created_at.desc(), Project.id.desc()).limit(per_page + 1)
+    rows = (await db.execute(query)).all()
+
+    items = [ProjectSummary(**row._mapping) for row in rows[:per_page]]
+    next_cursor = None
+    if len(rows) > per_page:
+        last = items[-1]
+        next_cursor = encode_cursor(last.created_at, last.id)
+    return items, next_cursor
+
+
+async def get_user_projects_page(
+    db: AsyncSession,
+    user_id: str,
+    per_page: int,
+    page: int = 1,
+    cursor: Optional[str] = None,
+    count: CountMode = "exact",
+    filters: ProjectFilters = ProjectFilters(),
+) -> dict:
+    """Build the PaginatedProjects payload for GET /api/users/me/projects."""
+    offset = 0 if cursor else (page - 1) * per_page
+    items, next_cursor = await list_user_projects(
+        db, user_id, per_page, cursor=cursor, offset=offset, filters=filters,
+    )
+
+    total: Optional[int] = None
+    total_exact = True
+    if count == "exact":
+        total = await count_user_projects(db, user_id, filters)
+    elif count == "estimate":
+        cap = settings.PROJECTS_COUNT_ESTIMATE_CAP
+        total = await count_user_projects(db, user_id, filters, cap=cap + 1)
+        if total > cap:
+            total, total_exact = cap, False
+
+    return {
+        "items": items,
+        "total": total,
+        "total_exact": total_exact,
+        "page": page,
+        "per_page": per_page,
+        "pages": -(-total // per_page) if total is not None else None,  # ceiling division
+        "next_cursor": next_cursor,
+    }
+
+
+# ---------------------------------------------------------------------------
+# Per-user stats  (counters maintained on write, read with one PK lookup)
+#
+# Every project insert, status change and delete must go through the
+# functions below so user_project_stats / user_stack_counts change in the
+# same transaction. rebuild_user_stats() recomputes them from `projects`.
+# ---------------------------------------------------------------------------
+
+def _upsert(db: AsyncSession, model):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert(model)
+    if dialect == "sqlite":
+        return sqlite.insert(model)
+    raise NotImplementedError(f"Stats upsert not supported on {dialect}")
+
+
+def _is_running(status) -> int:
+    return 1 if status == ProjectStatus.running else 0
+
+
+async def _bump_stats(
+    db: AsyncSession,
+    user_id: Optional[str],
+    stack: Optional[str],
+    total: int = 0,
+    successful: int = 0,
+) -> None:
+    """Add the deltas to the user's counters (INSERT ... ON CONFLICT DO UPDATE)."""
+    if not user_id or not (total or successful):
+        return
+
+    stmt = _upsert(db, UserProjectStats).values(
+        user_id=user_id, total_installs=total, successful_installs=successful,
+    )
+    await db.execute(stmt.on_conflict_do_update(
+        index_elements=[UserProjectStats.user_id],
+        set_={
+            "total_installs": UserProjectStats.total_installs + total,
+            "successful_installs": UserProjectStats.successful_installs + successful,
+        },
+    ))
+
+    if stack and total:
+        stmt = _upsert(db, UserStackCount).values(user_id=user_id, stack=stack, count=total)
+        await db.execute(stmt.on_conflict_do_update(
+            index_elements=[UserStackCount.user_id, UserStackCount.stack],
+            set_={"count": UserStackCount.count + total},
+        ))
+
+
+async def create_user_project(db: AsyncSession, obj_in: dict) -> Project:
+    """Insert a project and count it in its owner's stats."""
+    project = await project_crud.create(db, obj_in)
+    await _bump_stats(
+        db, project.user_id, project.type,
+        total=1, successful=_is_running(project.status),
+    )
+    return project
+
+
+async def _lock_project(db: AsyncSession, project_id: str):
+    result = await db.execute(
+        select(Project.user_id, Project.type, Project.status)
+        .where(Project.id == project_id)
+        .with_for_update()
+    )
+    return result.one_or_none()
+
+
+async def set_project_status(db: AsyncSession, project_id: str, status: ProjectStatus) -> bool:
+    """
+    Change a project's status and adjust successful_installs accordingly.
+    The row is locked first so concurrent transitions are counted once.
+    Returns False if the project does not exist.
+    """
+    row = await _lock_project(db, project_id)
+    if row is None:
+        return False
+    if row.status == status:
+        return True
+
+    await db.execute(update(Project).where(Project.id == project_id).values(status=status))
+    await _bump_stats(db, row.user_id, row.type, successful=_is_running(status) - _is_running(row.status))
+    return True
+
+
+async def set_project_statuses(db: AsyncSession, changes: dict[str, dict]) -> int:
+    """
+    Batched set_project_status for background writers: `changes` maps
+    project id -> column values, the same keys for every project and
+    always including "status" (e.g. {"status": ..., "pid": ...}).
+    Rows are locked in id order, updated with one executemany and the
+    stats adjusted once per user. Returns the number of projects updated.
+    """
+    if not changes:
+        return 0
+    rows = (await db.execute(
+        select(Project.id, Project.user_id, Project.type, Project.status)
+        .where(Project.id.in_(list(changes)))
+        .order_by(Project.id)
+        .with_for_update()
+    )).all()
+    if not rows:
+        return 0
+
+    columns = list(next(iter(changes.values())))
+    params = []
+    deltas: dict[tuple, int] = {}
+    for row in rows:
+        values = changes[row.id]
+        params.append({"id": row.id, **{c: values[c] for c in columns}})
+        delta = _is_running(values["status"]) - _is_running(row.status)
+        if delta:
+            deltas[(row.user_id, row.type)] = deltas.get((row.user_id, row.type), 0) + delta
+
+    await db.execute(update(Project), params)
+    for (user_id, stack), delta in deltas.items():
+        await _bump_stats(db, user_id, stack, successful=delta)
+    return len(rows)
+
+
+async def delete_user_project(db: AsyncSession, project_id: str) -> bool:
+    """Delete a project and remove it from its owner's stats."""
+    row = await _lock_project(db, project_id)
+    if row is None:
+        return False
+
+    await db.execute(delete(Project).where(Project.id == project_id))
+    await _bump_stats(db, row.user_id, row.type, total=-1, successful=-_is_running(row.status))
+    return True
+
+
+async def get_user_stats(db: AsyncSession, user_id: str) -> dict:
+    """Counters for GET /api/users/me/stats — a single-row lookup."""
+    top_stack = (
+        select(UserStackCount.stack)
+        .where(UserStackCount.user_id == user_id, UserStackCount.count > 0)
+        .order_by(UserStackCount.count.desc(), UserStackCount.stack.asc())
+        .limit(1)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        select(
+            UserProjectStats.total_installs,
+            UserProjectStats.successful_installs,
+            top_stack.label("most_used_stack"),
+        ).where(UserProjectStats.user_id == user_id)
+    )
+    row = result.one_or_none()
+    if row is None:
+        return {"total_installs": 0, "successful_installs": 0, "most_used_stack": None}
+    return dict(row._mapping)
+
+
+async def rebuild_user_stats(db: AsyncSession, user_id: Optional[str] = None) -> int:
+    """
+    Recompute the counters from `projects` (all users, or just `user_id`).
+    On Postgres, project writes are blocked until the caller commits so no
+    increment is lost in between. Returns the number of users rebuilt.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        await db.execute(text("LOCK TABLE projects IN SHARE MODE"))
+
+    clear_stats = delete(UserProjectStats)
+    clear_stacks = delete(UserStackCount)
+    owned = Project.user_id.is_not(None)
+    if user_id is not None:
+        clear_stats = clear_stats.where(UserProjectStats.user_id == user_id)
+        clear_stacks = clear_stacks.where(UserStackCount.user_id == user_id)
+        owned = Project.user_id == user_id
+    await db.execute(clear_stats)
+    await db.execute(clear_stacks)
+
+    result = await db.execute(
+        insert(UserProjectStats).from_select(
+            ["user_id", "total_installs", "successful_installs"],
+            select(
+                Project.user_id,
+                func.count(Project.id),
+                func.count(Project.id).filter(Project.status == ProjectStatus.running),
+            ).where(owned).group_by(Project.user_id),
+        )
+    )
+    await db.execute(
+        insert(UserStackCount).from_select(
+            ["user_id", "stack", "count"],
+            select(Project.user_id, Project.type, func.count(Project.id))
+            .where(owned, Project.type.is_not(None))
+            .group_by(Project.user_id, Project.type),
+        )
+    )
+    return result.rowcount
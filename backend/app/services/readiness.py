@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import random
+import time
+from typing import Callable, Iterable, Optional
+
+import httpx
+
+from app.core.config import settings
+from app.core.metrics import Histogram
+from app.services.process_supervisor import read_listening_ports
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Readiness probes for started projects
+#
+# A supervised app only counts as running once it answers HTTP on its port.
+# Every probe goes through one pooled httpx.AsyncClient, and a semaphore
+# bounds the probes in flight, so hundreds of projects starting together
+# share READINESS_MAX_CONCURRENCY connections instead of opening one client
+# each. Each target backs off on its own: READINESS_BACKOFF_INITIAL_SECONDS,
+# doubling up to READINESS_BACKOFF_MAX_SECONDS, with jitter so that targets
+# started together do not probe in lockstep. Any response below 500 means
+# the app is serving; refused connections, timeouts and 5xx do not.
+#
+# Many dev servers ignore PORT (Vite on 5173, Django on 8000, Spring on
+# 8080). While the allocated port does not answer, check() also probes the
+# ports the app's process group listens on, found through the socket inodes
+# in /proc. That scan reads every process's stat and fds, so it only starts
+# after DISCOVER_AFTER_ATTEMPTS failed probes of PORT, runs once per round
+# and in a worker thread, off the event loop. An app that serves on neither by READINESS_TIMEOUT_SECONDS is
+# reported unready and left running; it is never killed for it.
+# ---------------------------------------------------------------------------
+
+DISCOVER_AFTER_ATTEMPTS = 3      # failed probes of the allocated port before scanning /proc
+
+project_readiness_latency = Histogram(
+    "project_readiness_seconds",
+    "Time from spawning a project's run step to its first successful HTTP response.",
+    buckets=(0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300),
+)
+
+
+class ReadinessProber:
+    def __init__(self):
+        self._client: Optional[httpx.AsyncClient] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                limits=httpx.Limits(
+                    max_connections=settings.READINESS_MAX_CONCURRENCY,
+                    max_keepalive_connections=settings.READINESS_MAX_CONCURRENCY // 4,
+                ),
+                timeout=settings.READINESS_ATTEMPT_TIMEOUT_SECONDS,
+                follow_redirects=False,
+                trust_env=False,             # never send probes of 127.0.0.1 through a proxy
+            )
+            self._slots = asyncio.Semaphore(settings.READINESS_MAX_CONCURRENCY)
+        return self._client
+
+    async def probe(self, port: int) -> bool:
+        """One attempt: does something answer HTTP on `port`?"""
+        client = self.client
+        async with self._slots:
+            try:
+                response = await client.get(f"http://127.0.0.1:{port}{settings.READINESS_PATH}")
+            except httpx.HTTPError:
+                return False
+        return response.status_code < 500
+
+    async def wait_ready(
+        self,
+        port: int,
+        alive: Callable[[], bool] = lambda: True,
+        timeout: Optional[float] = None,
+        discover: Optional[Callable[[], Iterable[int]]] = None,
+    ) -> Optional[tuple[int, float]]:
+        """
+        Probe `port` with exponential backoff until it serves. After
+        DISCOVER_AFTER_ATTEMPTS misses, each round also probes the ports
+        `discover()` returns (run in a worker thread, as it may block).
+        Returns (the port that served, the seconds it took), or None if
+        `alive()` turned false or `timeout` (default
+        READINESS_TIMEOUT_SECONDS) passed first.
+        """
+        start = time.monotonic()
+        deadline = start + (settings.READINESS_TIMEOUT_SECONDS if timeout is None else timeout)
+        delay = settings.READINESS_BACKOFF_INITIAL_SECONDS
+        attempts = 0
+        while alive():
+            if await self.probe(port):
+                return port, time.monotonic() - start
+            attempts += 1
+            if discover is not None and attempts >= DISCOVER_AFTER_ATTEMPTS:
+                for other in sorted(set(await asyncio.to_thread(discover)) - {port}):
+                    if await self.probe(other):
+                        return other, time.monotonic() - start
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return None
+            await asyncio.sleep(min(remaining, delay * random.uniform(0.5, 1.0)))
+            delay = min(delay * 2, settings.READINESS_BACKOFF_MAX_SECONDS)
+        return None
+
+    async def check(self, managed) -> bool:
+        """
+        ProcessSupervisor.ready_check: wait until the managed process serves,
+        on its port or on one its process group listens on (recorded as
+        managed.listen_port).
+        """
+        if managed.port is None:
+            return True
+        process = managed.process
+        found = await self.wait_ready(
+            managed.port,
+            lambda: process.returncode is None,
+            discover=lambda: read_listening_ports(process.pid),
+        )
+        if found is None:
+            return False
+        port, latency = found
+        if port != managed.port:
+            logger.info("%s ignores PORT=%s and serves on %s", managed.project_id, managed.port, port)
+            managed.listen_port = port
+        managed.ready_latency_ms = round(latency * 1000, 1)
+        project_readiness_latency.observe(latency)
+        return True
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = self._slots = None
+
+
+readiness_prober = ReadinessProber()
@@ -0,0 +1,580 @@
+import asyncio
+import logging
+import os
+import re
+import signal
+import subprocess
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Callable, Optional, Protocol, Sequence
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from app.core.config import settings
+from app.models.installation_history import InstallationHistory
+from app.models.project import Project, ProjectStatus
+from app.services.error_clustering import ingest_errors
+from app.services.build_cache import BuildCache
+from app.services.dependency_cache import DependencySnapshots, shared_cache_env
+from app.services.error_matcher import LogScanner, get_error_matcher, notify_patterns_changed
+from app.services.install_events import install_events
+from app.services.project_service import set_project_status
+from app.services.template_index import learn_template, record_template_outcome
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Setup-step DAG
+#
+# metadata_["steps"] is an ordered list of {"order", "action", "command"}.
+# It is turned into a dependency graph so independent work runs in parallel:
+#   - toolchain checks (install_python, install_node ...) and .env generation
+#     depend on nothing;
+#   - steps in a sub-project ("cwd": "frontend" or "cd frontend && ...")
+#     run in order within that sub-project, after the toolchain checks and
+#     the last root-level step before them — sub-projects run side by side;
+#   - root-level steps are barriers: they wait for every step before them;
+#   - "run" steps start the app and are left to the process supervisor.
+# A step may list explicit "depends_on" (orders or names) instead.
+# ---------------------------------------------------------------------------
+
+_TOOLCHAIN_CHECKS = {
+    "python": ["python3", "--version"],
+    "node":   ["node", "--version"],
+    "java":   ["java", "-version"],
+    "php":    ["php", "--version"],
+    "ruby":   ["ruby", "--version"],
+    "go":     ["go", "version"],
+}
+_RUN_ACTIONS = {"run", "start", "serve", "dev"}
+_CD_PREFIX = re.compile(r"^\s*cd\s+([^\s&;|]+)\s*&&\s*")
+_LINE_BREAK = re.compile(rb"\r\n|\r|\n")
+
+ENV_STEP = "write_env"
+
+
+@dataclass
+class Step:
+    name: str
+    action: str
+    kind: str                        # toolchain | env | install | build | other | run | manual
+    command: list[str]
+    cwd: Path
+    order: int = 0
+    depends_on: set[str] = field(default_factory=set)
+    func: Optional[Callable[[], None]] = None   # in-process step (no subprocess)
+
+    @property
+    def executable(self) -> bool:
+        return self.kind not in ("run", "manual")
+
+
+@dataclass
+class StepResult:
+    name: str
+    status: str                      # finished | failed | skipped | cancelled | deferred
+    exit_code: Optional[int] = None
+    duration_ms: Optional[int] = None
+    detail: Optional[str] = None
+
+
+def _kind(action: str) -> str:
+    if action in _RUN_ACTIONS:
+        return "run"
+    if action == "install_deps":
+        return "install"
+    if action.startswith("install_"):
+        return "toolchain" if action[len("install_"):] in _TOOLCHAIN_CHECKS else "manual"
+    if action == "build":
+        return "build"
+    return "other"
+
+
+def _scope(project_path: Path, raw: dict) -> tuple[Path, str]:
+    """(working directory, command) — a leading `cd dir &&` becomes the cwd."""
+    command = (raw.get("command") or "").strip()
+    rel = raw.get("cwd")
+    match = _CD_PREFIX.match(command)
+    if rel is None and match:
+        rel, command = match.group(1), command[match.end():]
+    if not rel:
+        return project_path, command
+    cwd = (project_path / rel).resolve()
+    if cwd != project_path and project_path not in cwd.parents:
+        return project_path, (raw.get("command") or "").strip()   # leaves the project: run as written
+    return cwd, command
+
+
+def _write_env_file(path: Path, env_vars: dict) -> None:
+    """Append variables missing from `path` — values the user already set are kept."""
+    existing = set()
+    if path.exists():
+        for line in path.read_text(encoding="utf-8", errors="ignore").splitlines():
+            key = line.split("=", 1)[0].strip().removeprefix("export ").strip()
+            if key and not key.startswith("#"):
+                existing.add(key)
+    missing = {k: v for k, v in env_vars.items() if k not in existing}
+    if missing:
+        with path.open("a", encoding="utf-8") as f:
+            f.writelines(f"{k}={v}\n" for k, v in missing.items())
+
+
+def build_plan(project_path: Path, steps: list[dict], env_vars: Optional[dict] = None) -> list[Step]:
+    """Turn metadata steps into Steps with dependencies; raises ValueError on a cycle."""
+    project_path = project_path.resolve()
+    plan: list[Step] = []
+    names: set[str] = set()
+    by_order: dict[int, str] = {}
+
+    if env_vars:
+        env_path = project_path / ".env"
+        plan.append(Step(
+            name=ENV_STEP, action=ENV_STEP, kind="env", command=[], cwd=project_path,
+            func=lambda: _write_env_file(env_path, env_vars),
+        ))
+        names.add(ENV_STEP)
+
+    ordered = sorted(steps, key=lambda s: s.get("order") or 0)
+    explicit: dict[str, list] = {}
+    for position, raw in enumerate(ordered):
+        action = (raw.get("action") or "step").strip() or "step"
+        kind = _kind(action)
+        cwd, command = _scope(project_path, raw)
+        if kind == "toolchain":
+            argv = _TOOLCHAIN_CHECKS[action[len("install_"):]]
+        else:
+            argv = ["/bin/sh", "-c", command] if command else []
+            if not command and kind != "run":
+                kind = "manual"
+        order = raw.get("order") or position + 1
+        name = action if cwd == project_path else f"{action} ({cwd.relative_to(project_path)})"
+        if name in names:
+            name = f"{name} #{order}"
+        names.add(name)
+        by_order[order] = name
+        if raw.get("depends_on") is not None:
+            explicit[name] = list(raw["depends_on"])
+        plan.append(Step(name=name, action=action, kind=kind, command=argv, cwd=cwd, order=order))
+
+    toolchain = {s.name for s in plan if s.kind == "toolchain"}
+    last_in_scope: dict[Path, str] = {}
+    last_root: Optional[str] = None
+    earlier: list[str] = []
+    for step in plan:
+        if step.name in explicit:
+            for dep in explicit[step.name]:
+                dep_name = by_order.get(dep, dep)
+                if dep_name not in names:
+                    raise ValueError(f"step {step.name!r} depends on unknown step {dep!r}")
+                step.depends_on.add(dep_name)
+        elif step.kind in ("install", "build", "other"):
+            step.depends_on |= toolchain
+            if step.kind != "install" and env_vars:
+                step.depends_on.add(ENV_STEP)
+            if step.cwd == project_path:
+                step.depends_on.update(earlier)
+            else:
+                step.depends_on.update(n for n in (last_in_scope.get(step.cwd), last_root) if n)
+        if step.kind in ("install", "build", "other"):
+            earlier.append(step.name)
+            last_in_scope[step.cwd] = step.name
+            if step.cwd == project_path:
+                last_root = step.name
+
+    _check_acyclic(plan)
+    return plan
+
+
+def find_run_step(project_path: Path, steps: list[dict]) -> Optional[Step]:
+    """The step that starts the app (the last "run"-type step), if the metadata has one."""
+    runs = [s for s in build_plan(project_path, steps) if s.kind == "run" and s.command]
+    return runs[-1] if runs else None
+
+
+def _check_acyclic(plan: list[Step]) -> None:
+    remaining = {s.name: set(s.depends_on) for s in plan}
+    while remaining:
+        ready = [n for n, deps in remaining.items() if not deps & remaining.keys()]
+        if not ready:
+            raise ValueError(f"step dependency cycle among {sorted(remaining)}")
+        for n in ready:
+            del remaining[n]
+
+
+# ---------------------------------------------------------------------------
+# Subprocess runner  (same model as _run_git_with_progress: Popen + reader
+# thread + a polling loop that honours task cancellation)
+# ---------------------------------------------------------------------------
+
+@dataclass
+class ProcessOutcome:
+    returncode: Optional[int]
+    cancelled: bool = False
+    timed_out: bool = False
+
+
+def _kill_group(process: subprocess.Popen, grace: float = 3.0) -> None:
+    """SIGTERM the process group (npm, mvn ... spawn children), SIGKILL after `grace`."""
+    for sig in (signal.SIGTERM, signal.SIGKILL):
+        try:
+            os.killpg(process.pid, sig)
+        except (ProcessLookupError, PermissionError):
+            return
+        try:
+            process.wait(timeout=grace)
+            return
+        except subprocess.TimeoutExpired:
+            continue
+
+
+def run_process(
+    cmd: list[str],
+    cwd: Path,
+    on_line: Callable[[str], None],
+    is_cancelled: Callable[[], bool] = lambda: False,
+    on_start: Optional[Callable[[subprocess.Popen], None]] = None,
+    on_exit: Optional[Callable[[subprocess.Popen], None]] = None,
+    timeout: Optional[float] = None,
+    env: Optional[dict] = None,
+) -> ProcessOutcome:
+    """
+    Run `cmd` in its own process group, calling on_line for every output
+    line (stdout and stderr interleaved; \\r-separated progress counts as a
+    line). Blocking — call from a worker thread.
+    """
+    process = subprocess.Popen(
+        cmd,
+        cwd=str(cwd),
+        env=env,
+        stdin=subprocess.DEVNULL,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        bufsize=0,
+        start_new_session=True,
+    )
+    if on_start is not None:
+        on_start(process)
+
+    def _reader():
+        buffer = b""
+        for chunk in iter(lambda: process.stdout.read(65536), b""):
+            *lines, buffer = _LINE_BREAK.split(buffer + chunk)
+            for line in lines:
+                if line.strip():
+                    on_line(line.decode("utf-8", errors="replace"))
+        if buffer.strip():
+            on_line(buffer.decode("utf-8", errors="replace"))
+
+    reader = threading.Thread(target=_reader, daemon=True)
+    reader.start()
+
+    deadline = time.monotonic() + timeout if timeout else None
+    outcome = ProcessOutcome(returncode=None)
+    try:
+        while True:
+            try:
+                outcome.returncode = process.wait(timeout=0.2)
+                break
+            except subprocess.TimeoutExpired:
+                pass
+            if is_cancelled():
+                outcome.cancelled = True
+            elif deadline is not None and time.monotonic() > deadline:
+                outcome.timed_out = True
+            else:
+                continue
+            _kill_group(process)
+            outcome.returncode = process.poll()
+            break
+        reader.join(timeout=2)
+    finally:
+        if process.stdout is not None:
+            process.stdout.close()
+        if on_exit is not None:
+            on_exit(process)
+    return outcome
+
+
+# ---------------------------------------------------------------------------
+# Parallel executor
+# ---------------------------------------------------------------------------
+
+class StepCache(Protocol):
+    """Lets a step be satisfied without running it (dependency_cache.py)."""
+
+    def restore(self, step: Step) -> Optional[str]:
+        """Reproduce the step's effect if possible; a note describing it, else None."""
+
+    def store(self, step: Step) -> None:
+        """Remember the effect of a step that just finished successfully."""
+
+
+class StepExecutor:
+    """
+    Runs a plan with at most `max_parallel` steps at once, each process on
+    a worker thread. A failed step skips its dependents; independent
+    branches keep going. Cancellation stops new steps and kills running ones.
+    """
+
+    def __init__(
+        self,
+        is_cancelled: Callable[[], bool] = lambda: False,
+        on_process_start: Optional[Callable[[subprocess.Popen], None]] = None,
+        on_process_exit: Optional[Callable[[subprocess.Popen], None]] = None,
+        on_line: Optional[Callable[[Step, str], None]] = None,
+        on_step: Optional[Callable[[Step, Optional[StepResult]], None]] = None,
+        max_parallel: Optional[int] = None,
+        step_timeout: Optional[float] = None,
+        env: Optional[dict] = None,
+        caches: Sequence[StepCache] = (),
+    ):
+        self.is_cancelled = is_cancelled
+        self.on_process_start = on_process_start
+        self.on_process_exit = on_process_exit
+        self.on_line = on_line or (lambda step, line: None)
+        self.on_step = on_step or (lambda step, result: None)
+        self.max_parallel = max_parallel or settings.INSTALL_MAX_PARALLEL_STEPS
+        self.step_timeout = step_timeout if step_timeout is not None else settings.INSTALL_STEP_TIMEOUT_SECONDS
+        self.env = env
+        self.caches = caches
+
+    def _restore(self, step: Step) -> Optional[str]:
+        for cache in self.caches:
+            try:
+                note = cache.restore(step)
+            except Exception as e:
+                logger.warning("%s: cache restore failed for %s: %s", type(cache).__name__, step.name, e)
+                continue
+            if note:
+                return note
+        return None
+
+    def _store(self, step: Step) -> None:
+        for cache in self.caches:
+            try:
+                cache.store(step)
+            except Exception as e:
+                logger.warning("%s: cache store failed for %s: %s", type(cache).__name__, step.name, e)
+
+    def _run_step(self, step: Step) -> StepResult:
+        start = time.monotonic()
+        note = self._restore(step)
+        if note is not None:
+            self.on_line(step, note)
+            return StepResult(step.name, "finished", 0, int((time.monotonic() - start) * 1000), note)
+        if step.func is not None:
+            try:
+                step.func()
+                status, code, detail = "finished", None, None
+            except Exception as e:
+                status, code, detail = "failed", None, str(e)
+        else:
+            try:
+                outcome = run_process(
+                    step.command, step.cwd, lambda line: self.on_line(step, line),
+                    is_cancelled=self.is_cancelled,
+                    on_start=self.on_process_start,
+                    on_exit=self.on_process_exit,
+                    timeout=self.step_timeout or None,
+                    env=self.env,
+                )
+            except OSError as e:       # command or cwd missing
+                outcome, detail = ProcessOutcome(returncode=None), str(e)
+            else:
+                detail = "timed out" if outcome.timed_out else None
+            code = outcome.returncode
+            if outcome.cancelled:
+                status = "cancelled"
+            else:
+                status = "finished" if code == 0 and detail is None else "failed"
+        if status == "finished":
+            self._store(step)
+        return StepResult(step.name, status, code, int((time.monotonic() - start) * 1000), detail)
+
+    async def run(self, plan: list[Step]) -> dict[str, StepResult]:
+        loop = asyncio.get_running_loop()
+        results: dict[str, StepResult] = {}
+        pending = {s.name: s for s in plan if s.executable}
+        executable = set(pending)
+        for s in plan:
+            if not s.executable:
+                results[s.name] = StepResult(
+                    s.name, "deferred" if s.kind == "run" else "skipped",
+                    detail=None if s.kind == "run" else "manual step",
+                )
+        running: dict[asyncio.Future, Step] = {}
+
+        while pending or running:
+            if self.is_cancelled():
+                for name in pending:
+                    results[name] = StepResult(name, "cancelled")
+                pending.clear()
+
+            for name, step in list(pending.items()):
+                if len(running) >= self.max_parallel:
+                    break
+                if not step.depends_on <= results.keys():
+                    continue
+                del pending[name]
+                blocked = [d for d in step.depends_on if d in executable and results[d].status != "finished"]
+                if blocked:
+                    results[name] = StepResult(name, "skipped", detail=f"dependency {sorted(blocked)[0]} did not finish")
+                    self.on_step(step, results[name])
+                    continue
+                self.on_step(step, None)
+                running[loop.run_in_executor(None, self._run_step, step)] = step
+
+            if not running:
+                if pending and not any(s.depends_on <= results.keys() for s in pending.values()):
+                    raise RuntimeError("step plan stalled")  # build_plan rejects cycles; defensive
+                continue
+            done, _ = await asyncio.wait(running, return_when=asyncio.FIRST_COMPLETED)
+            for future in done:
+                step = running.pop(future)
+                results[step.name] = future.result()
+                self.on_step(step, results[step.name])
+
+        return {s.name: results[s.name] for s in plan}
+
+
+# ---------------------------------------------------------------------------
+# Installation run  (history row, status, events, error matching, outcomes)
+# ---------------------------------------------------------------------------
+
+def _step_caches() -> list[StepCache]:
+    caches: list[StepCache] = []
+    if settings.DEPENDENCY_CACHE_ENABLED:
+        caches.append(DependencySnapshots())
+    if settings.BUILD_CACHE_ENABLED:
+        caches.append(BuildCache())
+    return caches
+
+
+@dataclass
+class _StepLog:
+    tail: deque
+    scanner: Optional[LogScanner] = None
+    matches: list = field(default_factory=list)
+
+
+async def install_project(
+    db: AsyncSession,
+    project: Project,
+    is_cancelled: Callable[[], bool] = lambda: False,
+    on_process_start: Optional[Callable[[subprocess.Popen], None]] = None,
+    on_process_exit: Optional[Callable[[subprocess.Popen], None]] = None,
+    on_step: Optional[Callable[[Step, Optional[StepResult]], None]] = None,
+    on_history: Optional[Callable[[InstallationHistory], None]] = None,
+) -> InstallationHistory:
+    """
+    Execute a project's setup steps and record the run in
+    installation_history. Every output line is streamed to
+    installation_events and through the error matcher; failures no
+    pattern explains are clustered into error_patterns. Commits the
+    session at the start and the end of the run.
+    """
+    metadata = project.metadata_ or {}
+    plan = build_plan(Path(project.path), metadata.get("steps") or [], metadata.get("env_vars") or {})
+
+    history = InstallationHistory(
+        project_id=project.id,
+        started_at=datetime.now(timezone.utc),
+        resolution_used="local",
+    )
+    db.add(history)
+    await set_project_status(db, project.id, ProjectStatus.installing)
+    await db.commit()
+    if on_history is not None:
+        on_history(history)
+
+    matcher = None
+    try:
+        matcher = await get_error_matcher(db, project.type)
+    except Exception as e:
+        logger.warning("Error matcher unavailable for %s: %s", project.id, e)
+
+    logs = {
+        s.name: _StepLog(
+            tail=deque(maxlen=settings.INSTALL_ERROR_TAIL_LINES),
+            scanner=matcher.scanner() if matcher is not None else None,
+        )
+        for s in plan
+    }
+    def on_line(step: Step, line: str) -> None:       # worker thread; one thread per step
+        log = logs[step.name]
+        log.tail.append(line)
+        if log.scanner is not None:
+            log.matches.extend(log.scanner.feed(line + "\n"))
+        install_events.emit(history.id, project.id, "output", step=step.name, message=line)
+
+    def on_step_event(step: Step, result: Optional[StepResult]) -> None:
+        if result is None:
+            install_events.emit(history.id, project.id, "started", step=step.name,
+                                data={"command": step.command, "cwd": str(step.cwd)})
+        elif result.status in ("finished", "failed"):
+            install_events.emit(history.id, project.id, result.status, step=step.name, message=result.detail,
+                                data={"exit_code": result.exit_code, "duration_ms": result.duration_ms})
+        if on_step is not None:
+            on_step(step, result)
+
+    executor = StepExecutor(
+        is_cancelled=is_cancelled,
+        on_process_start=on_process_start,
+        on_process_exit=on_process_exit,
+        on_line=on_line,
+        on_step=on_step_event,
+        env=shared_cache_env() if settings.DEPENDENCY_CACHE_ENABLED else None,
+        caches=_step_caches(),
+    )
+    results = await executor.run(plan)
+
+    steps = {s.name: s for s in plan}
+    failed = [r for r in results.values() if r.status == "failed"]
+    cancelled = any(r.status == "cancelled" for r in results.values())
+    success = not failed and not cancelled
+
+    errors = []
+    for name, log in logs.items():
+        errors.extend(
+            {"step": name, "pattern_id": m.pattern_id, "category": m.category,
+             "line": m.line, "solutions": m.solutions}
+            for m in log.matches
+        )
+    for r in failed:
+        errors.append({"step": r.name, "exit_code": r.exit_code, "detail": r.detail,
+                       "output": list(logs[r.name].tail)})
+
+    history.completed_at = datetime.now(timezone.utc)
+    history.success = success
+    history.steps = [
+        {"name": r.name, "action": steps[r.name].action, "command": steps[r.name].command,
+         "cwd": str(steps[r.name].cwd), "status": r.status, "exit_code": r.exit_code,
+         "duration_ms": r.duration_ms, "detail": r.detail}
+        for r in results.values()
+    ]
+    history.errors = errors
+
+    # Installed but not started: the app itself is launched by the "run" steps
+    await set_project_status(db, project.id, ProjectStatus.failed if failed else ProjectStatus.stopped)
+
+    created_patterns = []
+    if not cancelled:
+        template_id = metadata.get("template_id")
+        if template_id is not None:
+            await record_template_outcome(db, template_id, success)
+        elif success:
+            await learn_template(db, project.type, metadata.get("detected_pm"), metadata)
+        unexplained = [r for r in failed if not logs[r.name].matches and logs[r.name].tail]
+        if unexplained:
+            ingested = await ingest_errors(
+                db, ["\n".join(logs[r.name].tail) for r in unexplained], project_type=project.type,
+            )
+            created_patterns = ingested.created
+    await db.commit()
+    if created_patterns:
+        await notify_patterns_changed()
+    return history
@@ -0,0 +1,276 @@
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable, Optional
+
+from sqlalchemy import event, func, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.analysis.project_analyzer import ProjectInfo
+from app.core.config import settings
+from app.models.configuration_template import ConfigurationTemplate
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Ranked configuration-template index
+#
+# Every ConfigurationTemplate is held in memory, bucketed by
+# (project_type, framework) and ordered by smoothed success rate
+#     (success_count + a) / (use_count + a + b)
+# with a Beta(a, b) prior from settings, so a template that worked once is
+# not ranked above one that worked 40 times out of 42. create_project
+# consults the index before parsing the README: when the best template for
+# the detected stack clears TEMPLATE_MIN_SCORE its steps are used directly
+# and the LLM call is skipped.
+#
+# After the first full load only rows whose updated_at moved are fetched,
+# at most every TEMPLATE_INDEX_REFRESH_SECONDS, together with the list of
+# ids so that deleted templates are evicted. Outcomes recorded in this
+# process are applied to the index as soon as their transaction commits
+# (Session after_commit hook); a rollback discards them.
+# ---------------------------------------------------------------------------
+
+_REFRESH_OVERLAP = timedelta(minutes=1)   # re-read rows from transactions that committed late
+_AFTER_COMMIT = "template_index_pending"  # Session.info key: {id: RankedTemplate} to apply on commit
+
+
+@dataclass(frozen=True)
+class RankedTemplate:
+    id: int
+    project_type: Optional[str]
+    framework: Optional[str]
+    template: dict
+    success_count: int
+    use_count: int
+    score: float
+
+    @property
+    def steps(self) -> list:
+        return list(self.template.get("steps") or [])
+
+
+def smoothed_success_rate(success_count: int, use_count: int) -> float:
+    a, b = settings.TEMPLATE_PRIOR_SUCCESSES, settings.TEMPLATE_PRIOR_FAILURES
+    return (success_count + a) / (max(use_count, success_count) + a + b)
+
+
+def _ranked(row: ConfigurationTemplate) -> RankedTemplate:
+    template = row.template or {}
+    if isinstance(template, list):          # bare list of steps
+        template = {"steps": template}
+    success, uses = row.success_count or 0, row.use_count or 0
+    return RankedTemplate(
+        id=row.id,
+        project_type=row.project_type,
+        framework=row.framework,
+        template=template,
+        success_count=success,
+        use_count=uses,
+        score=smoothed_success_rate(success, uses),
+    )
+
+
+class TemplateIndex:
+    def __init__(self):
+        self._by_id: dict[int, RankedTemplate] = {}
+        self._buckets: dict[tuple, list[RankedTemplate]] = {}
+        self.watermark: Optional[datetime] = None
+        self.refreshed_at = 0.0
+
+    def __len__(self) -> int:
+        return len(self._by_id)
+
+    def apply(self, rows: Iterable[ConfigurationTemplate]) -> None:
+        """Insert or replace `rows`, re-sorting only the buckets they touch."""
+        self.put(_ranked(row) for row in rows)
+
+    def put(self, entries: Iterable[RankedTemplate]) -> None:
+        touched: set[tuple] = set()
+        for entry in entries:
+            old = self._by_id.get(entry.id)
+            if old is not None:
+                old_key = (old.project_type, old.framework)
+                self._buckets[old_key] = [t for t in self._buckets[old_key] if t.id != entry.id]
+                touched.add(old_key)
+            key = (entry.project_type, entry.framework)
+            self._buckets.setdefault(key, []).append(entry)
+            self._by_id[entry.id] = entry
+            touched.add(key)
+        for key in touched:
+            bucket = self._buckets[key]
+            if bucket:
+                bucket.sort(key=lambda t: (-t.score, -t.use_count, t.id))
+            else:
+                del self._buckets[key]
+
+    def retain(self, ids: set[int]) -> int:
+        """Evict templates whose id is not in `ids` (deleted rows); returns how many."""
+        gone = self._by_id.keys() - ids
+        for template_id in gone:
+            entry = self._by_id.pop(template_id)
+            key = (entry.project_type, entry.framework)
+            self._buckets[key] = [t for t in self._buckets[key] if t.id != template_id]
+            if not self._buckets[key]:
+                del self._buckets[key]
+        return len(gone)
+
+    def ranked(self, project_type: Optional[str], framework: Optional[str]) -> list[RankedTemplate]:
+        return list(self._buckets.get((project_type, framework), ()))
+
+    def best(
+        self,
+        project_type: Optional[str],
+        framework: Optional[str],
+        min_score: Optional[float] = None,
+    ) -> Optional[RankedTemplate]:
+        """
+        Highest-ranked template with steps for the stack, falling back to
+        the project type's framework-agnostic templates (framework NULL).
+        """
+        if project_type is None:
+            return None
+        min_score = settings.TEMPLATE_MIN_SCORE if min_score is None else min_score
+        for key in ((project_type, framework), (project_type, None)):
+            for entry in self._buckets.get(key, ()):
+                if entry.score < min_score:
+                    break
+                if entry.steps:
+                    return entry
+        return None
+
+
+_index = TemplateIndex()
+_refresh_lock = asyncio.Lock()
+
+
+async def get_template_index(db: AsyncSession) -> TemplateIndex:
+    """The process-wide index, pulling changed rows first if a refresh is due."""
+    if time.monotonic() - _index.refreshed_at < settings.TEMPLATE_INDEX_REFRESH_SECONDS:
+        return _index
+    async with _refresh_lock:
+        if time.monotonic() - _index.refreshed_at < settings.TEMPLATE_INDEX_REFRESH_SECONDS:
+            return _index
+        query = select(ConfigurationTemplate)
+        if _index.watermark is not None:
+            query = query.where(ConfigurationTemplate.updated_at >= _index.watermark - _REFRESH_OVERLAP)
+        rows = (await db.execute(query)).scalars().all()
+        _index.apply(rows)
+        if _index.watermark is not None:
+            evicted = _index.retain(set((await db.execute(select(ConfigurationTemplate.id))).scalars()))
+            if evicted:
+                logger.info("Template index: %d deleted templates evicted", evicted)
+        stamps = [row.updated_at for row in rows if row.updated_at is not None]
+        if stamps:
+            _index.watermark = max([*stamps, _index.watermark] if _index.watermark else stamps)
+        _index.refreshed_at = time.monotonic()
+        if rows:
+            logger.info("Template index: %d rows refreshed, %d templates", len(rows), len(_index))
+    return _index
+
+
+async def find_template(
+    db: AsyncSession,
+    project_type: Optional[str],
+    framework: Optional[str],
+) -> Optional[RankedTemplate]:
+    """Known-good template for the detected stack, or None if none clears TEMPLATE_MIN_SCORE."""
+    return (await get_template_index(db)).best(project_type, framework)
+
+
+def _apply_on_commit(db: AsyncSession, row: ConfigurationTemplate) -> None:
+    """Put `row` (as it is now) into the index once `db`'s transaction commits."""
+    db.info.setdefault(_AFTER_COMMIT, {})[row.id] = _ranked(row)
+
+
+@event.listens_for(Session, "after_commit")
+def _apply_committed(session: Session) -> None:
+    entries = session.info.pop(_AFTER_COMMIT, None)
+    if entries:
+        _index.put(entries.values())
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_rolled_back(session: Session) -> None:
+    session.info.pop(_AFTER_COMMIT, None)
+
+
+def apply_template(info: ProjectInfo, template: RankedTemplate) -> ProjectInfo:
+    """
+    Fill `info` from a template; statically detected version constraints
+    win. Templates are shared between users, so they only name environment
+    variables: missing ones are added as empty placeholders, never with a
+    value from another project.
+    """
+    info.steps = template.steps
+    names = template.template.get("env_vars") or []      # older rows stored a dict: keys only
+    placeholders = {name: "" for name in names if name not in info.env_vars}
+    if placeholders:
+        info.env_vars = {**info.env_vars, **placeholders}
+    constraints = template.template.get("version_constraints") or {}
+    if constraints:
+        info.version_constraints = {**constraints, **info.version_constraints}
+    return info
+
+
+async def record_template_outcome(db: AsyncSession, template_id: int, success: bool) -> None:
+    """Count one use of a template (and a success) within the caller's transaction."""
+    values = {
+        "use_count": func.coalesce(ConfigurationTemplate.use_count, 0) + 1,
+        "updated_at": func.now(),
+    }
+    if success:
+        values["success_count"] = func.coalesce(ConfigurationTemplate.success_count, 0) + 1
+    row = (await db.execute(
+        update(ConfigurationTemplate)
+        .where(ConfigurationTemplate.id == template_id)
+        .values(**values)
+        .returning(ConfigurationTemplate)
+        .execution_options(populate_existing=True, synchronize_session=False)
+    )).scalar_one_or_none()
+    if row is not None:
+        _apply_on_commit(db, row)
+
+
+async def learn_template(
+    db: AsyncSession,
+    project_type: Optional[str],
+    framework: Optional[str],
+    metadata: dict,
+) -> Optional[int]:
+    """
+    Credit a successful install whose steps did not come from a template:
+    an existing template with the same steps gets the success, otherwise
+    the steps become a new template. Returns the template id.
+    """
+    steps = metadata.get("steps") or []
+    if project_type is None or not steps:
+        return None
+    index = await get_template_index(db)
+    for entry in index.ranked(project_type, framework):
+        if entry.steps == steps:
+            await record_template_outcome(db, entry.id, success=True)
+            return entry.id
+    row = ConfigurationTemplate(
+        project_type=project_type,
+        framework=framework,
+        template={
+            "steps": steps,
+            "env_vars": sorted(metadata.get("env_vars") or {}),     # names only: values may be secrets
+            "version_constraints": metadata.get("version_constraints") or {},
+        },
+        success_count=1,
+        use_count=1,
+    )
+    db.add(row)
+    await db.flush()
+    _apply_on_commit(db, row)
+    return row.id
+
+
+def clear_template_index() -> None:
+    global _index
+    _index = TemplateIndex()
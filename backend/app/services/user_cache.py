@@ -0,0 +1,147 @@
+import asyncio
+import json
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from redis.exceptions import RedisError
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+
+from app.core.config import settings
+from app.core.redis import get_redis
+from app.models.user import User, UserRole
+
+logger = logging.getLogger(__name__)
+
+# ---------------------------------------------------------------------------
+# Authenticated-user snapshot cache  (in-process tier in front of Redis)
+#
+# Only the fields needed to authorize a request and render UserProfile are
+# cached — never password_hash. Every write to a user row must go through
+# invalidate_user_on_commit(); the short local TTL bounds staleness on other
+# replicas.
+#
+# Invalidating inside the writing transaction is not enough: until it
+# commits, a concurrent read-through still sees the old row and caches it
+# again. The invalidation is therefore repeated from the session's
+# after_commit hook.
+# ---------------------------------------------------------------------------
+
+_local: dict[str, tuple[float, dict]] = {}
+_AFTER_COMMIT = "usercache_invalidate"      # Session.info key: user ids to invalidate on commit
+_background: set[asyncio.Task] = set()
+
+
+def _key(user_id: str) -> str:
+    return f"usercache:{user_id}"
+
+
+def _to_snapshot(user: User) -> dict:
+    return {
+        "id": user.id,
+        "name": user.name,
+        "email": user.email,
+        "role": user.role.value if hasattr(user.role, "value") else user.role,
+        "is_active": user.is_active,
+        "is_verified": user.is_verified,
+        "created_at": user.created_at.isoformat() if user.created_at else None,
+        "last_login": user.last_login.isoformat() if user.last_login else None,
+    }
+
+
+def _from_snapshot(snapshot: dict) -> User:
+    """Build a detached, read-only User from a cached snapshot."""
+    return User(
+        id=snapshot["id"],
+        name=snapshot["name"],
+        email=snapshot["email"],
+        role=UserRole(snapshot["role"]),
+        is_active=snapshot["is_active"],
+        is_verified=snapshot["is_verified"],
+        created_at=datetime.fromisoformat(snapshot["created_at"]) if snapshot["created_at"] else None,
+        last_login=datetime.fromisoformat(snapshot["last_login"]) if snapshot["last_login"] else None,
+    )
+
+
+def _store_local(user_id: str, snapshot: dict) -> None:
+    if len(_local) >= settings.USER_CACHE_MAX_ENTRIES and user_id not in _local:
+        _local.pop(next(iter(_local)))  # evict the oldest insertion
+    _local[user_id] = (time.monotonic() + settings.USER_CACHE_LOCAL_TTL_SECONDS, snapshot)
+
+
+async def get_cached_user(user_id: str) -> Optional[User]:
+    """Return a cached snapshot of the user, or None on a miss."""
+    entry = _local.get(user_id)
+    if entry is not None:
+        if entry[0] > time.monotonic():
+            return _from_snapshot(entry[1])
+        _local.pop(user_id, None)
+
+    try:
+        redis = await get_redis()
+        raw = await redis.get(_key(user_id))
+    except (RedisError, OSError) as e:
+        logger.debug("User cache read failed for %s: %s", user_id, e)
+        return None
+
+    if raw is None:
+        return None
+    snapshot = json.loads(raw)
+    _store_local(user_id, snapshot)
+    return _from_snapshot(snapshot)
+
+
+async def cache_user(user: User) -> None:
+    """Populate both tiers from a freshly loaded User row."""
+    snapshot = _to_snapshot(user)
+    _store_local(user.id, snapshot)
+    try:
+        redis = await get_redis()
+        await redis.set(_key(user.id), json.dumps(snapshot), ex=settings.USER_CACHE_TTL_SECONDS)
+    except (RedisError, OSError) as e:
+        logger.debug("User cache write failed for %s: %s", user.id, e)
+
+
+async def invalidate_user(user_id: str) -> None:
+    """Drop the user's snapshot from both tiers. Call after any user-row change."""
+    _local.pop(user_id, None)
+    try:
+        redis = await get_redis()
+        await redis.delete(_key(user_id))
+    except (RedisError, OSError) as e:
+        logger.warning("User cache invalidation failed for %s: %s", user_id, e)
+
+
+async def invalidate_user_on_commit(db: AsyncSession, user_id: str) -> None:
+    """invalidate_user() now and again once `db`'s transaction commits."""
+    await invalidate_user(user_id)
+    db.info.setdefault(_AFTER_COMMIT, set()).add(user_id)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_committed(session: Session) -> None:
+    user_ids = session.info.pop(_AFTER_COMMIT, None)
+    if not user_ids:
+        return
+    for user_id in user_ids:
+        _local.pop(user_id, None)
+    try:
+        loop = asyncio.get_running_loop()
+    except RuntimeError:
+        return                           # sync session outside the app: local tier only
+    for user_id in user_ids:
+        task = loop.create_task(invalidate_user(user_id))
+        _background.add(task)
+        task.add_done_callback(_background.discard)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_invalidations(session: Session) -> None:
+    session.info.pop(_AFTER_COMMIT, None)    # the row did not change
+
+
+def clear_local_cache() -> None:
+    _local.clear()
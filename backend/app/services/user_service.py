@@ -2,13 +2,14 @@ import secrets
 from datetime import datetime, timedelta, timezone
 from typing import Optional
 
-from sqlalchemy import func, select
+from sqlalchemy import delete, false, func, insert, literal, select, update
 from sqlalchemy.ext.asyncio import AsyncSession
 
 from app.core.config import settings
-from app.core.security import hash_password, verify_password
+from app.core.security import hash_password_async
 from app.models.user import User, UserRole
 from app.models.refresh_token import RefreshToken
+from app.services.user_cache import cache_user, get_cached_user, invalidate_user_on_commit
 
 
 # ---------------------------------------------------------------------------
@@ -20,6 +21,20 @@ async def get_user_by_id(db: AsyncSession, user_id: str) -> Optional[User]:
     return result.scalar_one_or_none()
 
 
+async def get_user_by_id_cached(db: AsyncSession, user_id: str) -> Optional[User]:
+    """
+    Read-through lookup used on the authenticated request path.
+    A cache hit returns a detached snapshot (no password_hash) without touching Postgres.
+    """
+    user = await get_cached_user(user_id)
+    if user is not None:
+        return user
+    user = await get_user_by_id(db, user_id)
+    if user is not None:
+        await cache_user(user)
+    return user
+
+
 async def get_user_by_email(db: AsyncSession, email: str) -> Optional[User]:
     """Always normalize email to lowercase before lookup."""
     result = await db.execute(select(User).where(User.email == email.lower()))
@@ -32,7 +47,7 @@ async def create_user(db: AsyncSession, email: str, plain_password: str, name: s
         id=f"user_{secrets.token_urlsafe(8)}",
         name=name,
         email=email.lower(),
-        password_hash=hash_password(plain_password),
+        password_hash=await hash_password_async(plain_password),
         role=UserRole.USER,
         is_active=True,
         is_verified=False,
@@ -45,16 +60,31 @@ async def create_user(db: AsyncSession, email: str, plain_password: str, name: s
 async def activate_user(db: AsyncSession, user: User) -> None:
     user.is_verified = True
     await db.flush()
+    await invalidate_user_on_commit(db, user.id)
+
+
+async def deactivate_user(db: AsyncSession, user: User) -> None:
+    user.is_active = False
+    await db.flush()
+    await invalidate_user_on_commit(db, user.id)
+
+
+async def set_user_role(db: AsyncSession, user: User, role: UserRole) -> None:
+    user.role = role
+    await db.flush()
+    await invalidate_user_on_commit(db, user.id)
 
 
 async def update_last_login(db: AsyncSession, user: User) -> None:
     user.last_login = datetime.now(timezone.utc)
     await db.flush()
+    await invalidate_user_on_commit(db, user.id)
 
 
 async def update_password(db: AsyncSession, user: User, new_plain_password: str) -> None:
-    user.password_hash = hash_password(new_plain_password)
+    user.password_hash = await hash_password_async(new_plain_password)
     await db.flush()
+    await invalidate_user_on_commit(db, user.id)
 
 
 # ---------------------------------------------------------------------------
@@ -86,20 +116,107 @@ async def get_refresh_token(
 
 async def revoke_refresh_token(db: AsyncSession, token: RefreshToken) -> None:
     token.revoked = True
+    token.revoked_at = datetime.now(timezone.utc)
     await db.flush()
 
 
-async def revoke_all_user_refresh_tokens(db: AsyncSession, user_id: str) -> None:
-    """Used on password reset — terminates all sessions across all devices."""
+async def revoke_refresh_token_by_hash(db: AsyncSession, token_hash: str) -> bool:
+    """Revoke a single token in one UPDATE. Returns False if it was unknown or already revoked."""
     result = await db.execute(
-        select(RefreshToken).where(
-            RefreshToken.user_id == user_id,
-            RefreshToken.revoked == False,  # noqa: E712
+        update(RefreshToken)
+        .where(RefreshToken.token_hash == token_hash, RefreshToken.revoked == false())
+        .values(revoked=True, revoked_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount > 0
+
+
+async def rotate_refresh_token(
+    db: AsyncSession, old_token_hash: str, new_token_hash: str
+) -> Optional[str]:
+    """
+    Refresh Token Rotation as a conditional write.
+
+    Revokes the old token only if it is still live (not revoked, not expired)
+    and stores the new one for the same user. Returns the user_id, or None if
+    the old token could not be claimed — concurrent refreshes of the same
+    token therefore have exactly one winner. The loser finds the token
+    revoked moments ago (revoked_recently), which is not treated as reuse.
+
+    On Postgres this is a single statement (UPDATE ... RETURNING inside a
+    CTE feeding the INSERT); other dialects use UPDATE ... RETURNING + INSERT.
+    """
+    now = datetime.now(timezone.utc)
+    expires_at = now + timedelta(days=settings.REFRESH_TOKEN_TTL_DAYS)
+    claim = (
+        update(RefreshToken)
+        .where(
+            RefreshToken.token_hash == old_token_hash,
+            RefreshToken.revoked == false(),
+            RefreshToken.expires_at > now,
         )
+        .values(revoked=True, revoked_at=now)
+        .returning(RefreshToken.user_id)
     )
-    for token in result.scalars().all():
-        token.revoked = True
-    await db.flush()
+
+    if db.get_bind().dialect.name == "postgresql":
+        claimed = claim.cte("claimed")
+        stmt = (
+            insert(RefreshToken)
+            .from_select(
+                ["token_hash", "user_id", "expires_at", "revoked"],
+                select(
+                    literal(new_token_hash, RefreshToken.token_hash.type),
+                    claimed.c.user_id,
+                    literal(expires_at, RefreshToken.expires_at.type),
+                    literal(False, RefreshToken.revoked.type),
+                ),
+            )
+            .add_cte(claimed)
+            .returning(RefreshToken.user_id)
+        )
+        result = await db.execute(stmt)
+        return result.scalar_one_or_none()
+
+    result = await db.execute(claim.execution_options(synchronize_session=False))
+    user_id = result.scalar_one_or_none()
+    if user_id is None:
+        return None
+    await db.execute(
+        insert(RefreshToken).values(
+            token_hash=new_token_hash, user_id=user_id, expires_at=expires_at, revoked=False
+        )
+    )
+    return user_id
+
+
+async def revoke_all_user_refresh_tokens(db: AsyncSession, user_id: str) -> int:
+    """
+    Used on password reset — terminates all sessions across all devices.
+    One set-based UPDATE regardless of how many tokens the user holds.
+    """
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.user_id == user_id, RefreshToken.revoked == false())
+        .values(revoked=True, revoked_at=datetime.now(timezone.utc))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
+
+
+def revoked_recently(token: RefreshToken) -> bool:
+    """
+    True if `token` was revoked less than REFRESH_TOKEN_REUSE_GRACE_SECONDS
+    ago — typically rotated by a concurrent refresh from another tab, which
+    is not a reuse signal.
+    """
+    if token.revoked_at is None:
+        return False
+    revoked_at = token.revoked_at
+    if revoked_at.tzinfo is None:         # SQLite drops the offset; stored values are UTC
+        revoked_at = revoked_at.replace(tzinfo=timezone.utc)
+    age = datetime.now(timezone.utc) - revoked_at
+    return age < timedelta(seconds=settings.REFRESH_TOKEN_REUSE_GRACE_SECONDS)
 
 
 async def revoke_token_family(db: AsyncSession, user_id: str) -> None:
@@ -107,4 +224,31 @@ async def revoke_token_family(db: AsyncSession, user_id: str) -> None:
     Reuse detection: a revoked token was presented.
     Revoke ALL tokens for this user and force re-login.
     """
-    await revoke_all_user_refresh_tokens(db, user_id)
\ No newline at end of file
+    await revoke_all_user_refresh_tokens(db, user_id)
+
+
+# ---------------------------------------------------------------------------
+# Refresh token garbage collection
+# ---------------------------------------------------------------------------
+
+async def purge_expired_refresh_tokens(db: AsyncSession, batch_size: int) -> int:
+    """
+    Delete one chunk of expired refresh tokens and return how many were removed.
+
+    Revoked-but-unexpired tokens are kept: reuse detection needs them until
+    they expire. Rows are picked with SKIP LOCKED (on Postgres) so the purge
+    never waits on, or blocks, a concurrent rotation.
+    """
+    doomed = (
+        select(RefreshToken.id)
+        .where(RefreshToken.expires_at < datetime.now(timezone.utc))
+        .limit(batch_size)
+        .with_for_update(skip_locked=True)
+        .scalar_subquery()
+    )
+    result = await db.execute(
+        delete(RefreshToken)
+        .where(RefreshToken.id.in_(doomed))
+        .execution_options(synchronize_session=False)
+    )
+    return result.rowcount
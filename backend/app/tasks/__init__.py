@@ -1,10 +1,25 @@
 from celery import Celery
 import os
 
+from app.core.config import settings
+
 celery = Celery(
     "app",
     broker=os.environ.get("REDIS_URL", "redis://redis:6379"),
-    backend=os.environ.get("REDIS_URL", "redis://redis:6379")
+    backend=os.environ.get("REDIS_URL", "redis://redis:6379"),
+    include=["app.tasks.maintenance"],
 )
 
 celery.conf.update(task_track_started=True)
+
+# Periodic jobs — the worker runs with --beat (see docker-compose.yaml)
+celery.conf.beat_schedule = {
+    "purge-refresh-tokens": {
+        "task": "maintenance.purge_refresh_tokens",
+        "schedule": settings.REFRESH_TOKEN_PURGE_INTERVAL_MINUTES * 60,
+    },
+    "install-event-partitions": {
+        "task": "maintenance.install_event_partitions",
+        "schedule": 24 * 60 * 60,
+    },
+}
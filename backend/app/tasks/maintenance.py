@@ -0,0 +1,92 @@
+import asyncio
+import logging
+import sys
+from typing import Optional
+
+from sqlalchemy.ext.asyncio import async_sessionmaker
+from sqlalchemy.pool import NullPool
+
+from app.core.config import settings
+from app.core.database import create_engine_from_settings
+from app.services.install_events import maintain_event_partitions
+from app.services.project_service import rebuild_user_stats as _rebuild_user_stats
+from app.services.user_service import purge_expired_refresh_tokens
+from app.tasks import celery
+
+logger = logging.getLogger(__name__)
+
+
+async def _purge_refresh_tokens() -> int:
+    # Each Celery run gets its own event loop, and pooled asyncpg connections
+    # cannot cross loops, so use a throwaway NullPool engine per run.
+    engine = create_engine_from_settings(poolclass=NullPool)
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    batch_size = settings.REFRESH_TOKEN_PURGE_BATCH_SIZE
+    total = 0
+    try:
+        for _ in range(settings.REFRESH_TOKEN_PURGE_MAX_BATCHES):
+            # One short transaction per chunk keeps row locks and WAL bursts small
+            async with session_factory() as db:
+                deleted = await purge_expired_refresh_tokens(db, batch_size)
+                await db.commit()
+            total += deleted
+            if deleted < batch_size:
+                break
+            await asyncio.sleep(settings.REFRESH_TOKEN_PURGE_PAUSE_SECONDS)
+    finally:
+        await engine.dispose()
+    return total
+
+
+@celery.task(name="maintenance.purge_refresh_tokens")
+def purge_refresh_tokens() -> int:
+    """Delete expired refresh tokens in bounded, lock-friendly chunks."""
+    total = asyncio.run(_purge_refresh_tokens())
+    logger.info("Purged %d expired refresh tokens", total)
+    return total
+
+
+async def _rebuild_stats(user_id: Optional[str]) -> int:
+    engine = create_engine_from_settings(poolclass=NullPool)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            rebuilt = await _rebuild_user_stats(db, user_id)
+            await db.commit()
+    finally:
+        await engine.dispose()
+    return rebuilt
+
+
+@celery.task(name="maintenance.rebuild_user_stats")
+def rebuild_user_stats(user_id: Optional[str] = None) -> int:
+    """Recompute per-user project stats from the projects table."""
+    rebuilt = asyncio.run(_rebuild_stats(user_id))
+    logger.info("Rebuilt project stats for %d users", rebuilt)
+    return rebuilt
+
+
+
+async def _install_event_partitions() -> tuple[int, int]:
+    engine = create_engine_from_settings(poolclass=NullPool)
+    try:
+        async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+            result = await maintain_event_partitions(db)
+            await db.commit()
+    finally:
+        await engine.dispose()
+    return result
+
+
+@celery.task(name="maintenance.install_event_partitions")
+def install_event_partitions() -> tuple[int, int]:
+    """Create upcoming installation_events partitions and drop expired ones."""
+    created, dropped = asyncio.run(_install_event_partitions())
+    logger.info("installation_events partitions: %d created, %d dropped", created, dropped)
+    return created, dropped
+
+if __name__ == "__main__":
+    # python -m app.tasks.maintenance rebuild-user-stats [USER_ID]
+    if len(sys.argv) < 2 or sys.argv[1] != "rebuild-user-stats":
+        sys.exit("usage: python -m app.tasks.maintenance rebuild-user-stats [USER_ID]")
+    count = asyncio.run(_rebuild_stats(sys.argv[2] if len(sys.argv) > 2 else None))
+    print(f"Rebuilt project stats for {count} users")
@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+"""
+Access-token micro-benchmark.
+
+Compares python-jose against the lean codec in app.core.fast_jwt for
+creating and verifying access tokens, plus decode_access_token with the
+verified-claims cache warm. Also checks both produce identical tokens.
+
+Run from backend/:
+    JWT_SECRET_KEY=bench python -m benchmarks.jwt_codec -n 20000
+"""
+import argparse
+import timeit
+from datetime import datetime, timedelta, timezone
+
+from jose import jwt
+
+from app.core import fast_jwt, security
+from app.core.config import settings
+
+
+def _claims() -> dict:
+    now = datetime.now(timezone.utc)
+    return {"sub": "user_bench", "role": "user", "iat": now, "exp": now + timedelta(minutes=30)}
+
+
+def _report(label: str, seconds: float, number: int) -> None:
+    print(f"  {label:<32} {seconds / number * 1e6:8.2f} µs/op   {number / seconds:10.0f} ops/s")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("-n", "--number", type=int, default=20000)
+    args = parser.parse_args()
+
+    key, alg, n = settings.JWT_SECRET_KEY, settings.JWT_ALGORITHM, args.number
+    claims = _claims()
+    token = jwt.encode(dict(claims), key, algorithm=alg)
+    assert fast_jwt.encode(claims, key, alg) == token, "token format differs between implementations"
+    assert fast_jwt.decode(token, key, alg) == jwt.decode(token, key, algorithms=[alg])
+
+    print(f"{alg}, {n} iterations")
+    _report("jose encode", timeit.timeit(lambda: jwt.encode(dict(claims), key, algorithm=alg), number=n), n)
+    _report("fast_jwt encode", timeit.timeit(lambda: fast_jwt.encode(claims, key, alg), number=n), n)
+    _report("jose decode", timeit.timeit(lambda: jwt.decode(token, key, algorithms=[alg]), number=n), n)
+    _report("fast_jwt decode", timeit.timeit(lambda: fast_jwt.decode(token, key, alg), number=n), n)
+
+    security.clear_verified_token_cache()
+    security.decode_access_token(token)
+    _report("decode_access_token (cached)", timeit.timeit(lambda: security.decode_access_token(token), number=n), n)
+
+
+if __name__ == "__main__":
+    main()
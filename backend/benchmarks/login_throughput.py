@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+"""
+Login throughput benchmark.
+
+Runs the FastAPI app in-process (SQLite in-memory, rate limiter bypassed),
+hammers POST /auth/login from several concurrent clients and meanwhile
+polls a trivial endpoint to measure how much logins stall the event loop.
+
+Reports logins/sec and p50/p99 latency of the unrelated endpoint, once with
+bcrypt verified inline on the event loop (the old behaviour) and once on
+the dedicated hash pool.
+
+Run from backend/:
+    JWT_SECRET_KEY=bench python -m benchmarks.login_throughput --duration 10
+"""
+import argparse
+import asyncio
+import logging
+import statistics
+import time
+from unittest.mock import AsyncMock, patch
+
+from httpx import ASGITransport, AsyncClient
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.core import security
+from app.core.database import get_db
+from app.main import app
+from app.models import Base
+from app.models.user import User, UserRole
+
+EMAIL = "bench@example.com"
+PASSWORD = "Password1"
+
+
+def _percentile(samples: list[float], pct: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+async def _setup_db():
+    engine = create_async_engine(
+        "sqlite+aiosqlite:///:memory:",
+        connect_args={"check_same_thread": False},
+        poolclass=StaticPool,
+    )
+    session_factory = async_sessionmaker(engine, expire_on_commit=False)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with session_factory() as db:
+        db.add(User(
+            id="user_bench",
+            name="Bench",
+            email=EMAIL,
+            password_hash=security.hash_password(PASSWORD),
+            role=UserRole.USER,
+            is_active=True,
+            is_verified=True,
+        ))
+        await db.commit()
+
+    async def _get_db():
+        async with session_factory() as session:
+            yield session
+            await session.commit()
+
+    return engine, _get_db
+
+
+async def _ping() -> dict:
+    return {"ok": True}
+
+
+async def _login_worker(client: AsyncClient, deadline: float, statuses: dict) -> None:
+    while time.monotonic() < deadline:
+        resp = await client.post("/auth/login", json={"email": EMAIL, "password": PASSWORD})
+        statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+
+async def _probe_worker(client: AsyncClient, deadline: float, latencies: list[float], interval: float) -> None:
+    # Latency is measured from the scheduled send time, so event-loop stalls
+    # that delay the probe itself are counted (no coordinated omission).
+    scheduled = time.perf_counter()
+    while time.monotonic() < deadline:
+        await asyncio.sleep(max(0.0, scheduled - time.perf_counter()))
+        await client.get("/bench/ping")
+        now = time.perf_counter()
+        latencies.append((now - scheduled) * 1000)
+        scheduled = max(scheduled + interval, now)
+
+
+async def run(mode: str, concurrency: int, duration: float, probe_interval: float) -> None:
+    engine, override = await _setup_db()
+    app.dependency_overrides[get_db] = override
+
+    if mode == "inline":
+        async def _verify_inline(plain: str, hashed: str) -> bool:
+            return security.verify_password(plain, hashed)
+        verify_patch = patch("app.api.routes.auth.verify_password_async", _verify_inline)
+    else:
+        verify_patch = patch("app.api.routes.auth.verify_password_async", security.verify_password_async)
+
+    statuses: dict[int, int] = {}
+    latencies: list[float] = []
+    with verify_patch, patch(
+        "app.core.redis.RateLimiter.is_allowed", new_callable=AsyncMock, return_value=(True, 0)
+    ):
+        async with AsyncClient(transport=ASGITransport(app=app), base_url="https://bench") as client:
+            deadline = time.monotonic() + duration
+            started = time.monotonic()
+            await asyncio.gather(
+                _probe_worker(client, deadline, latencies, probe_interval),
+                *(_login_worker(client, deadline, statuses) for _ in range(concurrency)),
+            )
+            elapsed = time.monotonic() - started
+
+    app.dependency_overrides.pop(get_db, None)
+    await engine.dispose()
+
+    ok = statuses.get(200, 0)
+    print(f"[{mode}] concurrency={concurrency} duration={elapsed:.1f}s")
+    print(f"  logins/sec      : {ok / elapsed:.1f}  (statuses: {dict(sorted(statuses.items()))})")
+    print(f"  ping p50 / p99  : {statistics.median(latencies) if latencies else 0:.1f} ms"
+          f" / {_percentile(latencies, 99):.1f} ms  ({len(latencies)} samples)")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--mode", choices=["inline", "pool", "both"], default="both")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--probe-interval", type=float, default=0.01, help="seconds between pings")
+    args = parser.parse_args()
+
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    app.get("/bench/ping")(_ping)
+
+    modes = ["inline", "pool"] if args.mode == "both" else [args.mode]
+    for mode in modes:
+        asyncio.run(run(mode, args.concurrency, args.duration, args.probe_interval))
+
+
+if __name__ == "__main__":
+    main()
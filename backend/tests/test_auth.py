@@ -6,6 +6,7 @@ Covers all 12 security checklist items.
 Run with:
     pytest tests/test_auth.py -v
 """
+import asyncio
 import hashlib
 from datetime import datetime, timedelta, timezone
 from typing import AsyncGenerator
@@ -27,7 +28,14 @@ from app.main import app
 from app.models.user import Base, User, UserRole
 from app.models.refresh_token import RefreshToken
 from app.models.project import Project, ProjectStatus
-from app.services.user_service import save_refresh_token
+from app.services.project_service import (
+    create_user_project,
+    delete_user_project,
+    get_user_stats,
+    rebuild_user_stats,
+    set_project_status,
+)
+from app.services.user_service import purge_expired_refresh_tokens, save_refresh_token
 
 # ---------------------------------------------------------------------------
 # Test DB setup (in-memory SQLite for speed)
@@ -63,6 +71,18 @@ async def mock_rate_limiter():
         yield
 
 
+@pytest_asyncio.fixture(autouse=True)
+async def mock_user_cache_redis():
+    """Keep the user cache in-process only; each test starts cold."""
+    from app.services.user_cache import clear_local_cache
+    redis = AsyncMock()
+    redis.get.return_value = None
+    clear_local_cache()
+    with patch("app.services.user_cache.get_redis", new_callable=AsyncMock, return_value=redis):
+        yield redis
+    clear_local_cache()
+
+
 @pytest_asyncio.fixture
 async def client() -> AsyncGenerator[AsyncClient, None]:
     async with AsyncClient(transport=ASGITransport(app=app), base_url="https://test") as c:
@@ -228,6 +248,18 @@ class TestLogin:
         expected_hash = hashlib.sha256(raw_cookie.encode()).hexdigest()
         assert rt.token_hash == expected_hash  # ✓ hash stored, not raw
 
+    @pytest.mark.asyncio
+    async def test_login_shed_when_hash_pool_saturated(self, client, db):
+        """Logins beyond the bcrypt admission limit get 503 instead of queueing."""
+        await make_user(db)
+        from app.core.config import settings
+        with patch.object(settings, "PASSWORD_HASH_MAX_PENDING", 0):
+            resp = await client.post("/auth/login", json={
+                "email": "test@example.com", "password": "Password1"
+            })
+        assert resp.status_code == status.HTTP_503_SERVICE_UNAVAILABLE
+        assert resp.headers["Retry-After"] == "1"
+
 
 # ---------------------------------------------------------------------------
 # Refresh Token Rotation (RTR) tests
@@ -258,8 +290,10 @@ class TestRefreshRotation:
         assert old_rt.revoked is True  # ✓ RTR: old revoked immediately
 
     @pytest.mark.asyncio
-    async def test_reuse_detection_revokes_entire_family(self, client, db):
+    async def test_reuse_detection_revokes_entire_family(self, client, db, monkeypatch):
         """Presenting a revoked token must revoke ALL tokens for the user."""
+        from app.core.config import settings
+        monkeypatch.setattr(settings, "REFRESH_TOKEN_REUSE_GRACE_SECONDS", 0)   # reused well after rotation
         await make_user(db)
         login_resp = await client.post("/auth/login", json={
             "email": "test@example.com", "password": "Password1"
@@ -287,6 +321,97 @@ class TestRefreshRotation:
         assert result.scalars().all() == []  # ✓ entire family revoked
 
 
+    @pytest.mark.asyncio
+    async def test_concurrent_refreshes_of_one_token_keep_the_session(self, client, tmp_path, monkeypatch):
+        """Two tabs refreshing at once: one wins, the other gets a plain 401, nothing is revoked."""
+        # A file database: the shared in-memory connection would let the loser's
+        # rollback undo the winner's rotation, which real connections never do
+        engine = create_async_engine(f"sqlite+aiosqlite:///{tmp_path / 'auth.db'}")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+
+        async def file_db() -> AsyncGenerator[AsyncSession, None]:
+            async with sessions() as session:
+                yield session
+                await session.commit()
+
+        monkeypatch.setitem(app.dependency_overrides, get_db, file_db)
+        async with sessions() as db:
+            await make_user(db)
+            await db.commit()
+        login_resp = await client.post("/auth/login", json={
+            "email": "test@example.com", "password": "Password1"
+        })
+        cookie = login_resp.cookies.get("refresh_token")
+
+        async def refresh():
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="https://test") as tab:
+                tab.cookies.set("refresh_token", cookie)
+                return await tab.post("/auth/refresh")
+
+        try:
+            results = await asyncio.gather(refresh(), refresh())
+            assert sorted(r.status_code for r in results) == [status.HTTP_200_OK, status.HTTP_401_UNAUTHORIZED]
+            winner = next(r for r in results if r.status_code == status.HTTP_200_OK)
+            loser = next(r for r in results if r.status_code != status.HTTP_200_OK)
+            assert loser.json()["detail"] == "Refresh token already used"
+
+            client.cookies.set("refresh_token", winner.cookies.get("refresh_token"))
+            assert (await client.post("/auth/refresh")).status_code == status.HTTP_200_OK
+        finally:
+            await engine.dispose()
+
+    @pytest.mark.asyncio
+    async def test_expired_refresh_token_rejected_without_revoking_family(self, client, db):
+        """An expired token is not a reuse signal: other sessions stay alive."""
+        user = await make_user(db)
+        expired_raw, expired_hash = generate_refresh_token()
+        db.add(RefreshToken(
+            token_hash=expired_hash,
+            user_id=user.id,
+            expires_at=datetime.now(timezone.utc) - timedelta(minutes=1),
+            revoked=False,
+        ))
+        _, live_hash = generate_refresh_token()
+        await save_refresh_token(db, user.id, live_hash)
+        await db.commit()
+
+        client.cookies.set("refresh_token", expired_raw)
+        resp = await client.post("/auth/refresh")
+        assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+        assert resp.json()["detail"] == "Refresh token expired"
+
+        from sqlalchemy import select
+        await db.commit()
+        result = await db.execute(
+            select(RefreshToken).where(RefreshToken.token_hash == live_hash)
+        )
+        assert result.scalar_one().revoked is False
+
+
+class TestRefreshTokenPurge:
+    @pytest.mark.asyncio
+    async def test_purge_deletes_expired_in_chunks_and_keeps_live(self, db):
+        user = await make_user(db)
+        past = datetime.now(timezone.utc) - timedelta(days=1)
+        for revoked in (False, True, True):
+            _, hashed = generate_refresh_token()
+            db.add(RefreshToken(token_hash=hashed, user_id=user.id, expires_at=past, revoked=revoked))
+        _, live_hash = generate_refresh_token()
+        live = await save_refresh_token(db, user.id, live_hash)
+        live.revoked = True  # revoked but unexpired: still needed for reuse detection
+        await db.flush()
+
+        assert await purge_expired_refresh_tokens(db, batch_size=2) == 2
+        assert await purge_expired_refresh_tokens(db, batch_size=2) == 1
+        assert await purge_expired_refresh_tokens(db, batch_size=2) == 0
+
+        from sqlalchemy import select
+        result = await db.execute(select(RefreshToken.token_hash))
+        assert result.scalars().all() == [live_hash]
+
+
         # ---------------------------------------------------------------------------
 # Forgot password — enumeration prevention
 # ---------------------------------------------------------------------------
@@ -409,4 +534,161 @@ class TestMe:
         assert "email" in body
         assert "role" in body
 
+    @pytest.mark.asyncio
+    async def test_me_served_from_user_cache(self, client, db):
+        """Repeat authenticated calls skip Postgres until the user is invalidated."""
+        user = await make_user(db)
+        login = await client.post("/auth/login", json={
+            "email": "test@example.com", "password": "Password1"
+        })
+        headers = {"Authorization": f"Bearer {login.json()['access_token']}"}
+        assert (await client.get("/api/users/me", headers=headers)).status_code == status.HTTP_200_OK
 
+        with patch("app.services.user_service.get_user_by_id", new_callable=AsyncMock) as db_lookup:
+            resp = await client.get("/api/users/me", headers=headers)
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.json()["email"] == "test@example.com"
+        db_lookup.assert_not_called()
+
+        from app.services.user_cache import cache_user, get_cached_user
+        from app.services.user_service import deactivate_user
+        stale = await get_cached_user(user.id)
+        await deactivate_user(db, user)
+        # A concurrent request read the still-committed active row and caches it again
+        await cache_user(stale)
+        await db.commit()
+        await asyncio.sleep(0)           # the after-commit Redis delete
+        resp = await client.get("/api/users/me", headers=headers)
+        assert resp.status_code == status.HTTP_401_UNAUTHORIZED
+
+
+# ---------------------------------------------------------------------------
+# Project history — keyset pagination
+# ---------------------------------------------------------------------------
+
+class TestMyProjects:
+    async def _login(self, client, db) -> dict:
+        user = await make_user(db)
+        base = datetime(2026, 1, 1, tzinfo=timezone.utc)
+        for i in range(5):
+            db.add(Project(
+                id=f"proj_{i}",
+                name=f"Project {i}",
+                path=f"/tmp/{i}",
+                type="nodejs",
+                status=ProjectStatus.queued,
+                user_id=user.id,
+                # two projects share a timestamp to exercise the id tie-breaker
+                created_at=base + timedelta(minutes=min(i, 3)),
+            ))
+        await db.commit()
+        login = await client.post("/auth/login", json={
+            "email": "test@example.com", "password": "Password1"
+        })
+        return {"Authorization": f"Bearer {login.json()['access_token']}"}
+
+    @pytest.mark.asyncio
+    async def test_cursor_pages_cover_all_projects_once(self, client, db):
+        headers = await self._login(client, db)
+        seen, cursor = [], None
+        while True:
+            params = {"per_page": 2, "count": "none"}
+            if cursor:
+                params["cursor"] = cursor
+            resp = await client.get("/api/users/me/projects", params=params, headers=headers)
+            assert resp.status_code == status.HTTP_200_OK
+            body = resp.json()
+            assert body["total"] is None
+            seen += [item["id"] for item in body["items"]]
+            cursor = body["next_cursor"]
+            if cursor is None:
+                break
+        assert seen == ["proj_4", "proj_3", "proj_2", "proj_1", "proj_0"]
+
+    @pytest.mark.asyncio
+    async def test_legacy_page_and_exact_total(self, client, db):
+        headers = await self._login(client, db)
+        resp = await client.get("/api/users/me/projects", params={"page": 2, "per_page": 2}, headers=headers)
+        body = resp.json()
+        assert [item["id"] for item in body["items"]] == ["proj_2", "proj_1"]
+        assert body["total"] == 5 and body["pages"] == 3 and body["total_exact"] is True
+
+    @pytest.mark.asyncio
+    async def test_metadata_filters(self, client, db):
+        headers = await self._login(client, db)
+        db.add_all([
+            Project(
+                id="meta_npm", name="npm app", path="/tmp/npm", user_id="user_test_test",
+                metadata_={"detected_pm": "npm", "env_vars": {"PORT": "3000"},
+                           "version_constraints": {"node": ">=18"}},
+            ),
+            Project(
+                id="meta_pip", name="pip app", path="/tmp/pip", user_id="user_test_test",
+                metadata_={"detected_pm": "pip", "env_vars": {"DATABASE_URL": ""},
+                           "version_constraints": {}},
+            ),
+        ])
+        await db.commit()
+
+        async def ids(**params):
+            resp = await client.get("/api/users/me/projects", params=params, headers=headers)
+            assert resp.status_code == status.HTTP_200_OK
+            return sorted(item["id"] for item in resp.json()["items"])
+
+        assert await ids(pm="npm") == ["meta_npm"]
+        assert await ids(env_var="DATABASE_URL") == ["meta_pip"]
+        assert await ids(constraint="node") == ["meta_npm"]
+        assert await ids(pm="pip", constraint="node") == []
+
+    @pytest.mark.asyncio
+    async def test_invalid_cursor_rejected(self, client, db):
+        headers = await self._login(client, db)
+        resp = await client.get("/api/users/me/projects", params={"cursor": "garbage"}, headers=headers)
+        assert resp.status_code == status.HTTP_400_BAD_REQUEST
+
+
+# ---------------------------------------------------------------------------
+# Per-user stats counters
+# ---------------------------------------------------------------------------
+
+class TestMyStats:
+    @pytest.mark.asyncio
+    async def test_counters_follow_project_writes(self, client, db):
+        user = await make_user(db)
+        for i, stack in enumerate(["python", "python", "nodejs", "nodejs"]):
+            await create_user_project(db, {
+                "id": f"stat_{i}", "name": f"S{i}", "path": f"/tmp/s{i}",
+                "type": stack, "status": ProjectStatus.queued, "user_id": user.id,
+            })
+        await set_project_status(db, "stat_0", ProjectStatus.running)
+        await set_project_status(db, "stat_0", ProjectStatus.running)  # no-op
+        await set_project_status(db, "stat_2", ProjectStatus.running)
+        await set_project_status(db, "stat_2", ProjectStatus.failed)
+        await delete_user_project(db, "stat_3")
+        await db.commit()
+
+        login = await client.post("/auth/login", json={
+            "email": "test@example.com", "password": "Password1"
+        })
+        resp = await client.get(
+            "/api/users/me/stats",
+            headers={"Authorization": f"Bearer {login.json()['access_token']}"},
+        )
+        assert resp.status_code == status.HTTP_200_OK
+        assert resp.json() == {
+            "total_installs": 3,
+            "successful_installs": 1,
+            "success_rate": 33.3,
+            "most_used_stack": "python",
+        }
+
+        live = await get_user_stats(db, user.id)
+        assert await rebuild_user_stats(db) == 1
+        assert await get_user_stats(db, user.id) == live
+
+    @pytest.mark.asyncio
+    async def test_no_projects_yields_zeroes(self, db):
+        user = await make_user(db)
+        assert await get_user_stats(db, user.id) == {
+            "total_installs": 0, "successful_installs": 0, "most_used_stack": None,
+        }
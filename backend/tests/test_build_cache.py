@@ -0,0 +1,89 @@
+"""
+Maven/Gradle build-output cache tests.
+
+Run with:
+    pytest tests/test_build_cache.py -v
+"""
+import os
+
+import pytest
+
+from app.services.build_cache import BuildCache
+from app.services.step_executor import StepExecutor, build_plan
+
+# Stands in for `mvn package`: records that it ran and produces target/app.jar
+BUILD = "echo built >> ../builds.log && mkdir -p target && cp src/Main.java target/app.jar"
+
+
+def _maven_project(root, name, source="class Main {}"):
+    path = root / name
+    (path / "src").mkdir(parents=True)
+    (path / "pom.xml").write_text("<project/>")
+    (path / "src" / "Main.java").write_text(source)
+    return path
+
+
+async def _build(path, cache, command=f"mvn -q package; {BUILD}"):
+    plan = build_plan(path, [{"order": 1, "action": "build", "command": command}])
+    return (await StepExecutor(caches=[cache]).run(plan))["build"]
+
+
+class TestBuildCache:
+    @pytest.mark.asyncio
+    async def test_identical_sources_restore_outputs_without_building(self, tmp_path):
+        cache = BuildCache(root=tmp_path / "cache")
+        assert (await _build(_maven_project(tmp_path, "a"), cache)).detail is None
+
+        copy = _maven_project(tmp_path, "b")
+        result = await _build(copy, cache)
+        assert result.status == "finished" and result.detail.startswith("restored 1 maven output")
+        assert (tmp_path / "builds.log").read_text() == "built\n"
+        jar = copy / "target" / "app.jar"
+        assert jar.read_text() == "class Main {}" and jar.stat().st_mode & 0o200   # writable for the next build
+
+        changed = _maven_project(tmp_path, "c", source="class Main { int x; }")
+        assert (await _build(changed, cache)).detail is None
+        assert (tmp_path / "builds.log").read_text() == "built\nbuilt\n"
+
+    @pytest.mark.asyncio
+    async def test_non_java_steps_are_ignored(self, tmp_path):
+        cache = BuildCache(root=tmp_path / "cache")
+        result = await _build(_maven_project(tmp_path, "a"), cache, command=BUILD)   # no mvn/gradle
+        assert result.detail is None and not (tmp_path / "cache" / "build").exists()
+
+    @pytest.mark.asyncio
+    async def test_lru_eviction_keeps_store_under_budget(self, tmp_path):
+        cache = BuildCache(root=tmp_path / "cache", max_bytes=30)
+        for i in range(3):
+            await _build(_maven_project(tmp_path, f"p{i}", source=f"class Main{i} {{ /* padding */ }}"), cache)
+        manifests = list((tmp_path / "cache" / "build" / "manifests").glob("*.json"))
+        objects = [p for p in (tmp_path / "cache" / "build" / "objects").glob("*/*")]
+        assert len(manifests) == 1 and len(objects) == 1
+        assert sum(p.stat().st_size for p in objects) <= 30
+
+    def test_unlisted_objects_survive_eviction_until_the_grace_period(self, tmp_path, monkeypatch):
+        cache = BuildCache(root=tmp_path / "cache")
+        objects = tmp_path / "cache" / "build" / "objects"
+        fresh, stale = objects / "aa" / ("aa" + "1" * 62), objects / "bb" / ("bb" + "2" * 62)
+        for obj in (fresh, stale):
+            obj.parent.mkdir(parents=True)
+            obj.write_text("x")
+        os.utime(stale, (0, 0))
+        cache.evict()
+        assert fresh.exists() and not stale.exists()      # fresh: a store() may be about to list it
+
+        monkeypatch.setattr("app.services.build_cache.settings.BUILD_CACHE_ORPHAN_GRACE_SECONDS", -1)
+        cache.evict()
+        assert not fresh.exists()
+
+    @pytest.mark.asyncio
+    async def test_manifest_with_a_missing_object_is_dropped(self, tmp_path):
+        cache = BuildCache(root=tmp_path / "cache")
+        await _build(_maven_project(tmp_path, "a"), cache)
+        for obj in (tmp_path / "cache" / "build" / "objects").glob("*/*"):
+            obj.chmod(0o644)
+            obj.unlink()
+
+        result = await _build(_maven_project(tmp_path, "b"), cache)
+        assert result.detail is None and (tmp_path / "builds.log").read_text() == "built\nbuilt\n"
+        assert len(list((tmp_path / "cache" / "build" / "objects").glob("*/*"))) == 1     # stored again
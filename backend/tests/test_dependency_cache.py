@@ -0,0 +1,82 @@
+"""
+Dependency cache tests (shared caches + lockfile-keyed environment snapshots).
+
+Run with:
+    pytest tests/test_dependency_cache.py -v
+"""
+import os
+
+import pytest
+
+from app.services.dependency_cache import DependencySnapshots, copy_tree, shared_cache_env
+from app.services.step_executor import StepExecutor, build_plan
+
+INSTALL = (
+    "echo run >> ../runs.log && mkdir -p node_modules/left-pad/bin node_modules/.bin "
+    "&& echo 'module.exports = 1' > node_modules/left-pad/index.js "
+    "&& ln -s ../left-pad/bin/cli node_modules/.bin/left-pad"
+)
+
+
+def _project(root, name, lock='{"lockfileVersion": 3}'):
+    path = root / name
+    path.mkdir()
+    (path / "package.json").write_text('{"name": "demo"}')
+    (path / "package-lock.json").write_text(lock)
+    return path
+
+
+async def _install(path, snapshots):
+    plan = build_plan(path, [{"order": 1, "action": "install_deps", "command": INSTALL}])
+    return (await StepExecutor(caches=[snapshots]).run(plan))["install_deps"]
+
+
+class TestSharedCaches:
+    def test_install_env_points_at_shared_caches(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.services.dependency_cache.settings.DEPENDENCY_CACHE_DIR", str(tmp_path))
+        env = shared_cache_env({"MAVEN_OPTS": "-Xmx1g", "PATH": "/usr/bin"})
+        assert env["PATH"] == "/usr/bin"
+        assert env["npm_config_cache"] == str(tmp_path / "shared" / "npm")
+        assert env["PIP_CACHE_DIR"] == str(tmp_path / "shared" / "pip")
+        assert env["MAVEN_OPTS"] == f"-Xmx1g -Dmaven.repo.local={tmp_path / 'shared' / 'm2' / 'repository'}"
+
+
+class TestSnapshots:
+    @pytest.mark.asyncio
+    async def test_second_copy_is_materialized_without_installing(self, tmp_path):
+        snapshots = DependencySnapshots(root=tmp_path / "cache")
+        first = await _install(_project(tmp_path, "a"), snapshots)
+        assert first.status == "finished" and first.detail is None
+
+        second_path = _project(tmp_path, "b")
+        second = await _install(second_path, snapshots)
+        assert second.status == "finished" and second.detail.startswith("restored node_modules")
+        assert (tmp_path / "runs.log").read_text() == "run\n"          # install ran once
+        modules = second_path / "node_modules"
+        assert (modules / "left-pad" / "index.js").read_text() == "module.exports = 1\n"
+        assert os.readlink(modules / ".bin" / "left-pad") == "../left-pad/bin/cli"
+
+        stored = next((tmp_path / "cache" / "snapshots" / "node").iterdir())
+        stored_file = stored / "node_modules" / "left-pad" / "index.js"
+        assert stored_file.stat().st_mode & 0o222 == 0                                 # store is read-only
+
+        # A postinstall script patching the restored tree must not reach the store
+        restored_file = modules / "left-pad" / "index.js"
+        assert restored_file.stat().st_ino != stored_file.stat().st_ino
+        restored_file.write_text("patched")
+        assert stored_file.read_text() == "module.exports = 1\n"
+
+    @pytest.mark.asyncio
+    async def test_lockfile_change_misses_and_lru_evicts(self, tmp_path):
+        snapshots = DependencySnapshots(root=tmp_path / "cache", max_per_ecosystem=1)
+        await _install(_project(tmp_path, "a"), snapshots)
+        changed = await _install(_project(tmp_path, "b", lock='{"lockfileVersion": 3, "x": 1}'), snapshots)
+        assert changed.detail is None
+        assert (tmp_path / "runs.log").read_text() == "run\nrun\n"
+        assert len(list((tmp_path / "cache" / "snapshots" / "node").iterdir())) == 1
+
+    def test_copy_tree_without_hardlinks(self, tmp_path):
+        (tmp_path / "src" / "d").mkdir(parents=True)
+        (tmp_path / "src" / "d" / "f").write_text("x")
+        assert copy_tree(tmp_path / "src", tmp_path / "dst", allow_hardlink=False) == 1
+        assert (tmp_path / "dst" / "d" / "f").read_text() == "x"
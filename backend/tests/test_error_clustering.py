@@ -0,0 +1,83 @@
+"""
+Near-duplicate error clustering tests.
+
+Run with:
+    pytest tests/test_error_clustering.py -v
+"""
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models import Base, ErrorPattern, ErrorPatternBand
+from app.services.error_clustering import (
+    BANDS,
+    ingest_errors,
+    minhash,
+    normalize_error,
+    signature_regex,
+    similarity,
+)
+from app.services.error_matcher import ErrorMatcher
+
+NPM_ERROR = """npm ERR! code ERESOLVE
+npm ERR! ERESOLVE unable to resolve dependency tree
+npm ERR! While resolving: my-app@1.0.3
+npm ERR! Found: react@18.2.0
+npm ERR! A complete log of this run can be found in: /root/.npm/_logs/2024-05-01T10_00_00_000Z-debug-0.log"""
+
+NPM_ERROR_OTHER_RUN = (
+    NPM_ERROR.replace("1.0.3", "2.4.1").replace("18.2.0", "17.0.2").replace("/root/", "/home/dev/")
+)
+
+PY_ERROR = """Traceback (most recent call last):
+  File "/srv/app/main.py", line 3, in <module>
+ModuleNotFoundError: No module named 'flask'"""
+
+
+@pytest_asyncio.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+class TestNormalization:
+    def test_volatile_tokens_become_placeholders(self):
+        normalized = normalize_error("Error at 2024-05-01 10:00:00 in /opt/x/y.js: v1.2.3 exited 137")
+        assert normalized == "error at <ts> in <path>: <ver> exited <num>"
+
+    def test_near_duplicates_are_similar(self):
+        same = similarity(minhash(normalize_error(NPM_ERROR)), minhash(normalize_error(NPM_ERROR_OTHER_RUN)))
+        different = similarity(minhash(normalize_error(NPM_ERROR)), minhash(normalize_error(PY_ERROR)))
+        assert same >= 0.9 and different < 0.2
+
+    def test_signature_matches_raw_error(self):
+        regex = signature_regex(normalize_error(PY_ERROR))
+        matcher = ErrorMatcher([ErrorPattern(id=1, signature=regex)])
+        assert matcher.match_ids("ModuleNotFoundError: No module named 'requests'") == {1}
+
+
+class TestIngestion:
+    @pytest.mark.asyncio
+    async def test_novel_errors_inserted_once(self, db):
+        first = await ingest_errors(db, [NPM_ERROR, NPM_ERROR, PY_ERROR], project_type="nodejs")
+        assert len(first.created) == 2
+
+        second = await ingest_errors(db, [NPM_ERROR_OTHER_RUN], project_type="nodejs")
+        assert second.created == [] and second.matched == [first.created[0]]
+
+        patterns = {p.id: p for p in (await db.execute(select(ErrorPattern))).scalars()}
+        assert len(patterns) == 2
+        assert patterns[first.created[0]].occurrences == 3
+        bands = (await db.execute(select(func.count()).select_from(ErrorPatternBand))).scalar_one()
+        assert bands == 2 * BANDS
+
+    @pytest.mark.asyncio
+    async def test_project_types_cluster_separately(self, db):
+        await ingest_errors(db, [PY_ERROR], project_type="python")
+        other = await ingest_errors(db, [PY_ERROR], project_type="nodejs")
+        assert len(other.created) == 1
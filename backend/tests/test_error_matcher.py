@@ -0,0 +1,95 @@
+"""
+Compiled error-pattern matcher tests.
+
+Run with:
+    pytest tests/test_error_matcher.py -v
+"""
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models import Base, ErrorPattern
+from app.services import error_matcher
+from app.services.error_matcher import ErrorMatcher, _required_literal, get_error_matcher
+
+PATTERNS = [
+    ErrorPattern(id=1, signature="EADDRINUSE", category="port", solutions=[{"fix": "free the port"}]),
+    ErrorPattern(id=2, signature="npm ERR! code ERESOLVE", category="dependency"),
+    ErrorPattern(id=3, signature=r"Cannot find module '([^']+)'", category="dependency"),
+    ErrorPattern(id=4, signature=r"\d+\.\d+\.\d+ is required", category="version"),
+    ErrorPattern(id=5, signature="address in use", category="port"),
+]
+
+
+class TestErrorMatcher:
+    def test_literals_and_regexes(self):
+        matcher = ErrorMatcher(PATTERNS)
+        assert matcher.match_ids("Error: listen eaddrinuse: address in use :::3000") == {1, 5}
+        assert matcher.match_ids("Error: Cannot find module 'express'") == {3}
+        assert matcher.match_ids("Cannot find module") == set()   # literal seen, regex fails
+        assert matcher.match_ids("node 18.2.0 is required") == {4}
+        assert matcher.match_ids("all good") == set()
+
+    def test_required_literal_extraction(self):
+        assert _required_literal(r"Cannot find module '([^']+)'") == "cannot find module '"
+        assert _required_literal(r"\d+\.\d+") is None
+        assert _required_literal(r"foo|bar") is None
+
+    def test_required_literal_skips_optional_and_grouped_parts(self):
+        assert _required_literal(r"(?i)npm ERR! code E[A-Z]+") == "npm err! code e"
+        assert _required_literal(r"abcd*efgh") == "efgh"                # d may be absent
+        assert _required_literal(r"abcd+efg") == "abcd"                 # d present, but maybe repeated
+        assert _required_literal(r"err(or)?: missing \.\.\.") == ": missing ..."
+        assert _required_literal(r"lit{abc}") == "lit{abc}"             # not a quantifier
+        assert _required_literal(r"[]|(]abc|x") is None                 # top-level | outside the class
+        assert _required_literal(r"[]|(]abcd") == "abcd"
+        assert _required_literal(r"(?x) abc def") is None
+        assert _required_literal(r"unbalanced (") is None
+
+    def test_scanner_handles_chunk_boundaries(self):
+        scanner = ErrorMatcher(PATTERNS).scanner()
+        assert scanner.feed("npm WARN deprecated\nnpm ERR! co") == []
+        matches = scanner.feed("de ERESOLVE\nnpm ERR! code ERESOLVE again\n")
+        assert [(m.pattern_id, m.line_no) for m in matches] == [(2, 2)]   # unique per stream
+        matches = scanner.feed("Error: listen EADDRINUSE")
+        assert matches == []
+        assert [(m.pattern_id, m.category) for m in scanner.close()] == [(1, "port")]
+
+
+@pytest_asyncio.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+class TestMatcherCache:
+    @pytest.mark.asyncio
+    async def test_reloads_when_version_changes(self, db):
+        error_matcher.clear_matcher_cache()
+        redis = AsyncMock()
+        redis.get.return_value = b"1"
+        db.add_all([
+            ErrorPattern(signature="EADDRINUSE", project_type="nodejs"),
+            ErrorPattern(signature="permission denied", project_type=None),
+            ErrorPattern(signature="ModuleNotFoundError", project_type="python"),
+        ])
+        await db.commit()
+
+        with patch("app.services.error_matcher.get_redis", return_value=redis), \
+                patch.object(error_matcher.settings, "ERROR_MATCHER_RELOAD_CHECK_SECONDS", 0):
+            first = await get_error_matcher(db, "nodejs")
+            assert len(first) == 2                       # own + generic patterns
+            assert await get_error_matcher(db, "nodejs") is first
+
+            db.add(ErrorPattern(signature="ELIFECYCLE", project_type="nodejs"))
+            await db.commit()
+            redis.get.return_value = b"2"
+            reloaded = await get_error_matcher(db, "nodejs")
+            assert reloaded is not first and len(reloaded) == 3
+        error_matcher.clear_matcher_cache()
@@ -0,0 +1,91 @@
+"""
+Installation step-event writer and timeline tests.
+
+Run with:
+    pytest tests/test_install_events.py -v
+"""
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import func, select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base, InstallationEvent, InstallationHistory, Project
+from app.services import install_events as events_module
+from app.services.install_events import InstallEventWriter, get_install_timeline
+
+
+@pytest_asyncio.fixture
+async def engine():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield engine
+    await engine.dispose()
+
+
+@pytest_asyncio.fixture
+async def history(engine):
+    async with async_sessionmaker(engine, expire_on_commit=False)() as db:
+        db.add(Project(id="proj_ev", name="Events", path="/tmp/ev"))
+        run = InstallationHistory(
+            project_id="proj_ev", started_at=datetime.now(timezone.utc) - timedelta(seconds=5),
+        )
+        db.add(run)
+        await db.commit()
+        return run
+
+
+class TestInstallEventWriter:
+    @pytest.mark.asyncio
+    async def test_events_are_written_in_batches(self, engine, history):
+        writer = InstallEventWriter(flush_interval_ms=10_000, max_batch=4)
+        calls = []
+        real_write = events_module.write_events
+
+        async def counting_write(conn, rows):
+            calls.append(len(rows))
+            await real_write(conn, rows)
+
+        with patch.object(events_module, "write_events", side_effect=counting_write):
+            writer.start(engine)
+            for i in range(10):
+                writer.emit(history.id, "proj_ev", "output", step="install", message=f"line {i}")
+            await writer.close()
+
+        assert sum(calls) == 10 and max(calls) <= 4 and len(calls) == 3
+        async with engine.connect() as conn:
+            count = (await conn.execute(select(func.count()).select_from(InstallationEvent))).scalar_one()
+        assert count == 10
+
+    @pytest.mark.asyncio
+    async def test_full_buffer_drops_instead_of_blocking(self):
+        writer = InstallEventWriter(max_batch=10, max_buffer=2)
+        for _ in range(5):
+            writer.emit(1, "p", "output")
+        assert len(writer._buffer) == 2 and writer.dropped == 3
+
+    @pytest.mark.asyncio
+    async def test_timeline_summarises_steps(self, engine, history):
+        writer = InstallEventWriter()
+        writer.start(engine)
+        writer.emit(history.id, "proj_ev", "started", step="deps")
+        writer.emit(history.id, "proj_ev", "output", step="deps", message="added 12 packages")
+        writer.emit(history.id, "proj_ev", "finished", step="deps", data={"exit_code": 0})
+        writer.emit(history.id, "proj_ev", "started", step="build")
+        writer.emit(history.id, "proj_ev", "failed", step="build", message="tsc error")
+        await writer.close()
+
+        async with async_sessionmaker(engine)() as db:
+            timeline = await get_install_timeline(db, history)
+            quiet = await get_install_timeline(db, history, include_output=False)
+
+        assert [e["kind"] for e in timeline["events"]] == ["started", "output", "finished", "started", "failed"]
+        steps = {s["step"]: s for s in timeline["steps"]}
+        assert steps["deps"]["status"] == "finished" and steps["deps"]["output_lines"] == 1
+        assert steps["build"]["status"] == "failed"
+        assert timeline["events"][2]["data"] == {"exit_code": 0}
+        assert len(quiet["events"]) == 4
@@ -0,0 +1,55 @@
+from app.core import metrics
+from app.core.metrics import Gauge, Histogram, render_metrics
+
+
+def test_histogram_renders_cumulative_buckets():
+    hist = Histogram("test_latency_seconds", "Test latency.", label_names=("op",), buckets=(0.1, 1.0))
+    try:
+        hist.observe(0.05, "get")
+        hist.observe(0.5, "get")
+        hist.observe(5.0, "get")
+        text = render_metrics()
+    finally:
+        metrics._REGISTRY.remove(hist)
+
+    assert 'test_latency_seconds_bucket{op="get",le="0.1"} 1' in text
+    assert 'test_latency_seconds_bucket{op="get",le="1.0"} 2' in text
+    assert 'test_latency_seconds_bucket{op="get",le="+Inf"} 3' in text
+    assert 'test_latency_seconds_count{op="get"} 3' in text
+
+
+def test_gauge_reads_value_at_scrape_time():
+    value = {"n": 1}
+    gauge = Gauge("test_gauge", "Test gauge.", lambda: value["n"])
+    try:
+        value["n"] = 7
+        assert "test_gauge 7" in render_metrics()
+    finally:
+        metrics._REGISTRY.remove(gauge)
+
+
+def test_engine_factory_records_pool_checkout_wait(tmp_path):
+    import asyncio
+    from unittest.mock import patch
+
+    from sqlalchemy import text
+
+    from app.core.config import settings
+    from app.core.database import create_engine_from_settings, db_pool_checkout_wait
+
+    async def _run():
+        with patch.object(settings, "DATABASE_URL", f"sqlite+aiosqlite:///{tmp_path / 'pool.db'}"), \
+             patch.object(settings, "DB_POOL_SIZE", 2), \
+             patch.object(settings, "DB_MAX_OVERFLOW", 0):
+            engine = create_engine_from_settings()
+        try:
+            before = sum(series[-2] for series in db_pool_checkout_wait._series.values())
+            async with engine.connect() as conn:
+                await conn.execute(text("SELECT 1"))
+            after = sum(series[-2] for series in db_pool_checkout_wait._series.values())
+            assert engine.pool.size() == 2
+            assert after == before + 1
+        finally:
+            await engine.dispose()
+
+    asyncio.run(_run())
@@ -8,9 +8,14 @@ Tests:
 - Database session management
 """
 
+import asyncio
+from unittest.mock import patch
+
 import pytest
+import pytest_asyncio
 from datetime import datetime
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
 from sqlalchemy.orm import sessionmaker, Session
 from sqlalchemy.pool import StaticPool
 
@@ -471,5 +476,143 @@ class TestDatabaseConstraints:
         # This test may need adjustment based on actual cascade settings
 
 
+
+@pytest_asyncio.fixture
+async def async_db():
+    """Async session on in-memory SQLite (supports RETURNING)."""
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    await engine.dispose()
+
+
+class TestBulkCRUD:
+    """Tests for RETURNING-based writes and the bulk CRUD methods."""
+
+    @pytest.mark.asyncio
+    async def test_create_and_update_return_loaded_rows(self, async_db):
+        project = await project_crud.create(async_db, {
+            "id": "ret-1", "name": "Returning", "path": "/tmp/ret", "metadata_": {"a": 1},
+        })
+        assert project.status == ProjectStatus.queued
+        assert project.created_at is not None
+
+        updated = await project_crud.update(async_db, project, {"name": "Renamed", "metadata_": {"b": 2}})
+        assert updated is project
+        assert project.name == "Renamed" and project.metadata_ == {"b": 2}
+
+    @pytest.mark.asyncio
+    async def test_create_many_keeps_input_order(self, async_db):
+        patterns = await error_pattern_crud.create_many(
+            async_db, [{"signature": f"sig-{i}"} for i in range(5)]
+        )
+        assert [p.signature for p in patterns] == [f"sig-{i}" for i in range(5)]
+        assert all(p.id is not None and p.occurrences == 1 for p in patterns)
+
+    @pytest.mark.asyncio
+    async def test_upsert_many_inserts_and_updates(self, async_db):
+        existing = await error_pattern_crud.create(async_db, {"signature": "old", "occurrences": 1})
+        rows = await error_pattern_crud.upsert_many(async_db, [
+            {"id": existing.id, "signature": "old", "occurrences": 7},
+            {"id": 500, "signature": "new", "occurrences": 1},
+        ])
+        assert [(r.id, r.occurrences) for r in rows] == [(existing.id, 7), (500, 1)]
+        assert existing.occurrences == 7
+
+    @pytest.mark.asyncio
+    async def test_update_where(self, async_db):
+        await error_pattern_crud.create_many(async_db, [
+            {"signature": "a", "project_type": "nodejs"},
+            {"signature": "b", "project_type": "nodejs"},
+            {"signature": "c", "project_type": "python"},
+        ])
+        count = await error_pattern_crud.update_where(
+            async_db, {"category": "dependency"}, ErrorPattern.project_type == "nodejs"
+        )
+        assert count == 2
+        rows = await error_pattern_crud.get_all(async_db)
+        assert sorted(r.signature for r in rows if r.category == "dependency") == ["a", "b"]
+
+
+
+class TestBatchLoader:
+    """Tests for get_many and the request-scoped batch loader."""
+
+    @pytest.mark.asyncio
+    async def test_get_many_skips_missing(self, async_db):
+        await project_crud.create_many(async_db, [
+            {"id": f"gm-{i}", "name": f"P{i}", "path": f"/tmp/gm{i}"} for i in range(3)
+        ])
+        found = await project_crud.get_many(async_db, ["gm-0", "gm-2", "gm-0", "nope"])
+        assert sorted(found) == ["gm-0", "gm-2"]
+
+    @pytest.mark.asyncio
+    async def test_loads_in_one_tick_share_one_query(self, async_db):
+        await project_crud.create_many(async_db, [
+            {"id": f"bl-{i}", "name": f"P{i}", "path": f"/tmp/bl{i}"} for i in range(4)
+        ])
+        loader = project_crud.loader(async_db)
+        assert project_crud.loader(async_db) is loader
+
+        calls = []
+        real_get_many = project_crud.get_many
+
+        async def counting_get_many(db, ids):
+            calls.append(list(ids))
+            return await real_get_many(db, ids)
+
+        with patch.object(project_crud, "get_many", side_effect=counting_get_many):
+            results = await asyncio.gather(
+                loader.load("bl-0"), loader.load("bl-3"), loader.load("missing"),
+                loader.load_many(["bl-1", "bl-0"]),
+            )
+            again = await loader.load("bl-3")
+
+        assert calls == [["bl-0", "bl-3", "missing", "bl-1"]]
+        assert results[0].id == "bl-0" and results[2] is None
+        assert [p.id for p in results[3]] == ["bl-1", "bl-0"]
+        assert again is results[1]
+
+    @pytest.mark.asyncio
+    async def test_loads_during_a_batch_wait_for_the_next_one(self, async_db):
+        await project_crud.create_many(async_db, [
+            {"id": f"sq-{i}", "name": f"P{i}", "path": f"/tmp/sq{i}"} for i in range(3)
+        ])
+        loader = project_crud.loader(async_db)
+        calls, in_flight, overlap = [], [0], [False]
+        real_get_many = project_crud.get_many
+
+        async def slow_get_many(db, ids):
+            calls.append(list(ids))
+            in_flight[0] += 1
+            overlap[0] |= in_flight[0] > 1
+            await asyncio.sleep(0.05)
+            try:
+                return await real_get_many(db, ids)
+            finally:
+                in_flight[0] -= 1
+
+        with patch.object(project_crud, "get_many", side_effect=slow_get_many):
+            first = loader.load("sq-0")
+            await asyncio.sleep(0.01)                     # first batch is now in flight
+            later = [loader.load("sq-1"), loader.load("sq-2")]
+            results = await asyncio.gather(first, *later)
+
+        assert not overlap[0]
+        assert calls == [["sq-0"], ["sq-1", "sq-2"]]
+        assert [p.id for p in results] == ["sq-0", "sq-1", "sq-2"]
+        assert loader._task is None
+
+    @pytest.mark.asyncio
+    async def test_delete_clears_cached_entry(self, async_db):
+        await project_crud.create(async_db, {"id": "del-1", "name": "D", "path": "/tmp/d"})
+        loader = project_crud.loader(async_db)
+        assert (await loader.load("del-1")) is not None
+        await project_crud.delete(async_db, "del-1")
+        assert (await loader.load("del-1")) is None
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
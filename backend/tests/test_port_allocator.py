@@ -0,0 +1,207 @@
+"""
+Port allocator tests (bitmap + Redis reservations + reclamation).
+
+Run with:
+    pytest tests/test_port_allocator.py -v
+"""
+import asyncio
+import json
+import socket
+import subprocess
+from unittest.mock import AsyncMock, patch
+
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from app.services.port_allocator import PortAllocator, PortBitmap, _bindable
+
+
+class _FakeRedis:
+    """The handful of commands the allocator uses, including its compare-and-swap script."""
+
+    def __init__(self):
+        self.owners: dict[str, str] = {}
+        self.keys: dict[str, str] = {}
+
+    async def hsetnx(self, key, field, value):
+        await asyncio.sleep(0)               # a network round trip: other tasks run meanwhile
+        if str(field) in self.owners:
+            return 0
+        self.owners[str(field)] = value
+        return 1
+
+    async def hgetall(self, key):
+        await asyncio.sleep(0)
+        return dict(self.owners)
+
+    async def set(self, key, value, ex=None):
+        self.keys[key] = str(value)
+
+    async def exists(self, *keys):
+        return sum(k in self.keys for k in keys)
+
+    async def eval(self, script, numkeys, key, field, expected, new):
+        await asyncio.sleep(0)
+        if self.owners.get(str(field)) != expected:
+            return 0
+        if new == "":
+            del self.owners[str(field)]
+        else:
+            self.owners[str(field)] = new
+        return 1
+
+
+@pytest.fixture
+def redis():
+    fake = _FakeRedis()
+    with patch("app.services.port_allocator.get_redis", new_callable=AsyncMock, return_value=fake), \
+         patch("app.services.port_allocator._bindable", return_value=True):
+        yield fake
+
+
+def _dead_pid() -> int:
+    process = subprocess.Popen(["true"])
+    process.wait()
+    return process.pid
+
+
+class TestPortBitmap:
+    def test_allocate_release_is_fifo_and_skips_claimed(self):
+        bitmap = PortBitmap(5000, 5003)
+        assert bitmap.claim(5001)
+        assert [bitmap.allocate() for _ in range(4)] == [5000, 5002, 5003, None]
+        bitmap.release(5002)
+        bitmap.release(5000)
+        bitmap.release(5000)                      # double release queues the port once
+        assert len(bitmap) == 2
+        assert [bitmap.allocate(), bitmap.allocate(), bitmap.allocate()] == [5002, 5000, None]
+
+    def test_rejects_ports_outside_range(self):
+        with pytest.raises(ValueError):
+            PortBitmap(5000, 5003).release(6000)
+
+
+class TestPortAllocator:
+    @pytest.mark.asyncio
+    async def test_workers_never_share_a_port(self, redis):
+        a = PortAllocator(6000, 6005, host="node-a")
+        b = PortAllocator(6000, 6005, host="node-b")
+        ports = [await a.allocate("p1"), await b.allocate("p2"), await a.allocate("p3"), await b.allocate("p4")]
+        assert len(set(ports)) == 4 and None not in ports
+        assert set(redis.owners) == {str(p) for p in ports}
+        assert json.loads(redis.owners[str(ports[1])])["project"] == "p2"
+
+        await a.release(ports[0])
+        assert str(ports[0]) not in redis.owners
+        assert {await b.allocate("p5"), await b.allocate("p6")} == {6004, 6005}
+        assert await b.allocate("p7") is None
+
+    @pytest.mark.asyncio
+    async def test_prefers_the_previous_port_when_free(self, redis):
+        allocator = PortAllocator(6100, 6103, host="node-a")
+        assert await allocator.allocate("p", prefer=6102) == 6102
+        assert await allocator.allocate("q", prefer=6102) == 6100       # taken: next free instead
+        await allocator.release(6102)
+        assert await allocator.allocate("p", prefer=6102) == 6102
+        assert [await allocator.allocate("r"), await allocator.allocate("s")] == [6101, 6103]
+
+    @pytest.mark.asyncio
+    async def test_reclaims_ports_of_dead_pids_and_dead_hosts(self, redis):
+        allocator = PortAllocator(7000, 7003, host="node-a")
+        port = await allocator.allocate("live")
+        await allocator.attach(port, _dead_pid())
+        assert json.loads(redis.owners[str(port)])["pid"] is not None
+
+        dead = _dead_pid()
+        redis.owners["7001"] = json.dumps({"host": "node-a", "worker": dead, "pid": dead, "project": "crashed"})
+        redis.owners["7002"] = json.dumps({"host": "node-gone", "worker": 1, "pid": 1, "project": "orphan"})
+        redis.owners["7003"] = json.dumps({"host": "node-b", "worker": 1, "pid": 1, "project": "remote"})
+        redis.keys["ports:host:node-b"] = "1"
+
+        assert await allocator.reclaim() == 2
+        assert set(redis.owners) == {str(port), "7003"}     # own reservation is kept while this worker lives
+        assert "ports:host:node-a" in redis.keys
+        assert allocator.bitmap.taken(7003)
+        assert {await allocator.allocate("x"), await allocator.allocate("y")} == {7001, 7002}
+
+        del redis.owners["7003"]                              # node-b released it
+        await allocator.reclaim()
+        assert await allocator.allocate("z") == 7003
+
+    @pytest.mark.asyncio
+    async def test_reclaims_a_release_that_failed_in_redis(self, redis):
+        allocator = PortAllocator(7100, 7101, host="node-a")
+        port = await allocator.allocate("p")
+        with patch.object(allocator, "_swap", new_callable=AsyncMock, side_effect=RedisConnectionError("down")):
+            await allocator.release(port)
+        assert str(port) in redis.owners                      # worker pid is alive, but it let go
+        assert await allocator.reclaim() == 1
+        assert redis.owners == {}
+
+    @pytest.mark.asyncio
+    async def test_allocate_and_release_during_reclaim(self, redis):
+        allocator = PortAllocator(7200, 7219, host="node-a")
+        held = [await allocator.allocate(f"p{i}") for i in range(4)]
+        redis.owners.clear()                                  # e.g. Redis restarted and lost the hash
+
+        async def later(ticks, call):
+            for _ in range(ticks):
+                await asyncio.sleep(0)
+            return await call()
+
+        # Land allocations and a release at every point of the reclaim pass
+        results = await asyncio.gather(
+            allocator.reclaim(),
+            *(later(t, lambda t=t: allocator.allocate(f"new{t}")) for t in range(10)),
+            later(5, lambda: allocator.release(held[0])),
+        )
+        new = results[1:11]
+        assert None not in new and not allocator._foreign
+        assert set(redis.owners) == {str(p) for p in [*held[1:], *new]}
+        assert all(redis.owners[str(p)] == allocator._owners[p] for p in [*held[1:], *new])
+
+    @pytest.mark.asyncio
+    async def test_reclaim_loop_survives_an_unexpected_error(self, redis, monkeypatch):
+        monkeypatch.setattr("app.services.port_allocator.settings.PORT_RECLAIM_INTERVAL_SECONDS", 0.01)
+        allocator = PortAllocator(7300, 7301, host="node-a")
+        calls = []
+
+        async def flaky_reclaim():
+            calls.append(1)
+            if len(calls) == 1:
+                raise RuntimeError("boom")
+            return 0
+
+        monkeypatch.setattr(allocator, "reclaim", flaky_reclaim)
+        allocator.start_background()
+        await asyncio.sleep(0.1)
+        assert len(calls) > 1 and not allocator._task.done()
+        await allocator.close()
+
+    @pytest.mark.asyncio
+    async def test_falls_back_to_local_bitmap_without_redis(self):
+        allocator = PortAllocator(8000, 8001, host="node-a")
+        with patch("app.services.port_allocator.get_redis", new_callable=AsyncMock,
+                   side_effect=RedisConnectionError("down")), \
+             patch("app.services.port_allocator._bindable", return_value=True):
+            assert [await allocator.allocate("a"), await allocator.allocate("b")] == [8000, 8001]
+            await allocator.release(8000)
+            assert await allocator.allocate("c") == 8000
+
+
+class TestBindable:
+    def test_listeners_block_but_time_wait_does_not(self):
+        listener = socket.socket()
+        listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)    # as Node, http.server, Netty do
+        listener.bind(("127.0.0.1", 0))
+        listener.listen()
+        port = listener.getsockname()[1]
+        assert not _bindable(port)
+
+        client = socket.create_connection(("127.0.0.1", port))
+        served, _ = listener.accept()
+        served.close()                        # server closes first: its side lingers in TIME_WAIT
+        client.recv(1)
+        client.close()
+        listener.close()
+        assert _bindable(port)
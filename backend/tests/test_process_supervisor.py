@@ -0,0 +1,229 @@
+"""
+Process supervisor tests.
+
+Run with:
+    pytest tests/test_process_supervisor.py -v
+"""
+import asyncio
+import os
+import sys
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.pool import StaticPool
+
+from app.models import Base, Project, User, UserProjectStats
+from app.models.project import ProjectStatus
+from app.services.process_supervisor import (
+    ProcessSupervisor, RestartPolicy, read_listening_ports, read_proc_groups, read_tcp_activity,
+)
+
+pytestmark = pytest.mark.skipif(not sys.platform.startswith("linux"), reason="needs /proc and process groups")
+
+
+async def _wait_for(predicate, timeout=5.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "condition not reached"
+        await asyncio.sleep(0.02)
+
+
+def _alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    with open(f"/proc/{pid}/stat") as f:          # reaped-but-zombie counts as dead
+        return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+
+
+class TestProcSampling:
+    def test_read_proc_groups_sums_by_group(self, tmp_path):
+        def stat(pid, comm, pgrp, utime, stime, rss):
+            fields = ["S", "1", str(pgrp)] + ["0"] * 8 + [str(utime), str(stime)] + ["0"] * 8 + [str(rss)]
+            (tmp_path / str(pid)).mkdir()
+            (tmp_path / str(pid) / "stat").write_text(f"{pid} ({comm}) " + " ".join(fields))
+
+        stat(10, "node", 10, 100, 50, 1000)
+        stat(11, "node) (worker", 10, 5, 5, 10)   # comm containing ") ("
+        stat(12, "other", 99, 1, 1, 1)
+        (tmp_path / "self").mkdir()
+        usage = read_proc_groups({10, 20}, proc=tmp_path)
+        assert usage == {10: (160, 1010 * os.sysconf("SC_PAGE_SIZE"))}
+
+
+    def test_read_tcp_activity_counts_every_connection_but_listeners(self, tmp_path):
+        (tmp_path / "net").mkdir()
+        header = "  sl  local_address rem_address   st tx_queue rx_queue\n"
+        (tmp_path / "net" / "tcp").write_text(header + "\n".join([
+            "   0: 0100007F:4E20 00000000:0000 0A 00000000:00000000",      # 20000 listening only
+            "   1: 0100007F:4E21 0100007F:C350 01 00000000:00000000",      # 20001 established
+            "   2: 0100007F:4E23 0A000002:C351 06 00000000:00000000",      # 20003 request done, TIME_WAIT
+            "   3: 0100007F:C352 0100007F:4E24 06 00000000:00000000",      # local client of 20004, TIME_WAIT
+            "   4: 0A000001:C353 0A000002:4E25 01 00000000:00000000",      # outgoing to a remote 20005
+        ]))
+        (tmp_path / "net" / "tcp6").write_text(header + (
+            "   0: 00000000000000000000000001000000:4E22 00000000000000000000000001000000:D431 01 0:0\n"
+        ))
+        ports = {20000, 20001, 20002, 20003, 20004, 20005, 20006}
+        assert read_tcp_activity(ports, proc=tmp_path) == {20001, 20002, 20003, 20004}
+
+    def test_read_listening_ports_matches_the_groups_socket_inodes(self, tmp_path):
+        def proc(pid, pgrp, sockets):
+            (tmp_path / str(pid) / "fd").mkdir(parents=True)
+            (tmp_path / str(pid) / "stat").write_text(f"{pid} (node) S 1 {pgrp} " + "0 " * 20)
+            for fd, target in enumerate(sockets):
+                os.symlink(target, tmp_path / str(pid) / "fd" / str(fd))
+
+        proc(10, 10, ["/dev/null", "socket:[111]"])
+        proc(11, 10, ["socket:[222]", "socket:[333]"])
+        proc(12, 99, ["socket:[444]"])
+        (tmp_path / "net").mkdir()
+        header = "  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode\n"
+        row = "   0: 0100007F:{:04X} 00000000:0000 {} 00000000:00000000 00:00000000 00000000  1000        0 {}"
+        (tmp_path / "net" / "tcp").write_text(header + "\n".join([
+            row.format(5173, "0A", 111),          # group 10 listens
+            row.format(40000, "01", 222),         # group 10, but an outgoing connection
+            row.format(8000, "0A", 444),          # another group
+        ]))
+        (tmp_path / "net" / "tcp6").write_text(header + row.format(8080, "0A", 333))
+        assert read_listening_ports(10, proc=tmp_path) == {5173, 8080}
+        assert read_listening_ports(77, proc=tmp_path) == set()
+
+
+class TestSupervisor:
+    @pytest.mark.asyncio
+    async def test_stop_kills_the_whole_process_group(self, tmp_path):
+        sup = ProcessSupervisor()
+        managed = await sup.start("proj_a", ["/bin/sh", "-c", "sleep 30 & echo child $!; wait"], tmp_path)
+        await _wait_for(lambda: managed.state == "running" and managed.tail)
+        child = int(managed.tail[0].split()[1])
+        sup.sample()
+        sup.sample()
+        assert managed.rss_bytes > 0
+
+        assert await sup.stop("proj_a", grace=2)
+        assert managed.state == "stopped" and managed.pid is None
+        await _wait_for(lambda: not _alive(child))
+        assert sup._pending_status["proj_a"] == {"status": ProjectStatus.stopped, "pid": None, "port": None}
+
+    @pytest.mark.asyncio
+    async def test_stop_right_after_start_does_not_hang(self, tmp_path):
+        sup = ProcessSupervisor()
+        managed = await sup.start("proj_race", ["sleep", "30"], tmp_path)
+        await asyncio.wait_for(sup.stop("proj_race", grace=1), 5)
+        assert managed.state == "stopped" and managed.pid is None
+        assert managed.process is None or managed.process.returncode is not None
+
+    @pytest.mark.asyncio
+    async def test_stop_kills_a_group_that_ignores_sigterm(self, tmp_path):
+        sup = ProcessSupervisor()
+        command = [sys.executable, "-c",
+                   "import signal, time; signal.signal(signal.SIGTERM, signal.SIG_IGN); print('up', flush=True); time.sleep(30)"]
+        managed = await sup.start("proj_stubborn", command, tmp_path)
+        await _wait_for(lambda: managed.tail)
+        await asyncio.wait_for(sup.stop("proj_stubborn", grace=0.3), 5)
+        assert managed.state == "stopped" and managed.exit_code == -9
+
+    @pytest.mark.asyncio
+    async def test_unready_process_is_never_queued_as_running(self, tmp_path):
+        sup = ProcessSupervisor()
+        queued = []
+        real_queue_status = sup._queue_status
+        sup._queue_status = lambda project_id, status, *args: (queued.append(status),
+                                                               real_queue_status(project_id, status, *args))
+
+        async def never_ready(managed):
+            return False
+
+        sup.ready_check = never_ready
+        managed = await sup.start("proj_unready", ["sleep", "30"], tmp_path)
+        await _wait_for(lambda: managed.state == "unready")
+        assert managed.pid is not None and ProjectStatus.running not in queued
+        await sup.stop("proj_unready", grace=2)
+        assert queued == [ProjectStatus.stopped]
+
+    @pytest.mark.asyncio
+    async def test_restart_policy_backs_off_then_gives_up(self, tmp_path):
+        sup = ProcessSupervisor()
+        policy = RestartPolicy("on-failure", max_restarts=2, backoff=0.01)
+        managed = await sup.start("proj_b", ["/bin/sh", "-c", "echo boom; exit 3"], tmp_path, policy=policy)
+        await asyncio.wait_for(managed.task, 5)
+        assert (managed.state, managed.restarts, managed.exit_code) == ("failed", 2, 3)
+        assert list(managed.tail) == ["boom"] * 3
+
+        clean = await sup.start("proj_c", ["/bin/true"], tmp_path, policy=policy)
+        await asyncio.wait_for(clean.task, 5)
+        assert (clean.state, clean.restarts) == ("exited", 0)
+
+
+class TestIdleStop:
+    @pytest.mark.asyncio
+    async def test_idle_process_is_stopped_and_resumes_with_its_last_command(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.services.process_supervisor.settings.SUPERVISOR_IDLE_STOP_MINUTES", 0.005)
+        sup = ProcessSupervisor()
+        quiet = await sup.start("quiet", ["sleep", "30"], tmp_path, env={"PORT": "1", "KEEP": "yes"})
+        chatty = await sup.start("chatty", ["/bin/sh", "-c", "while true; do echo tick; sleep 0.05; done"], tmp_path)
+        await _wait_for(lambda: quiet.state == chatty.state == "running")
+        first_pid = quiet.pid
+
+        await asyncio.sleep(0.4)
+        assert await sup.stop_idle() == 1
+        assert (quiet.state, quiet.stop_reason) == ("stopped", "idle")
+        assert chatty.state == "running"
+        assert not _alive(first_pid)
+        assert sup._pending_status["quiet"]["status"] == ProjectStatus.stopped
+
+        resumed = await sup.resume("quiet", port=None)
+        await _wait_for(lambda: resumed.state == "running")
+        assert resumed.command == ["sleep", "30"] and resumed.env == {"PORT": "1", "KEEP": "yes"}
+        assert resumed.pid != first_pid and resumed.stop_reason is None
+        assert await sup.resume("never-ran") is None
+        await sup.close()
+
+    @pytest.mark.asyncio
+    async def test_idle_stop_disabled_at_zero(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.services.process_supervisor.settings.SUPERVISOR_IDLE_STOP_MINUTES", 0)
+        sup = ProcessSupervisor()
+        managed = await sup.start("p", ["sleep", "30"], tmp_path)
+        await _wait_for(lambda: managed.state == "running")
+        assert sup.idle(now=managed.last_traffic_at + 10 ** 6) == []
+        await sup.close()
+
+
+@pytest_asyncio.fixture
+async def session_factory():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:", poolclass=StaticPool)
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    yield async_sessionmaker(engine, expire_on_commit=False)
+    await engine.dispose()
+
+
+class TestBatchedStatus:
+    @pytest.mark.asyncio
+    async def test_flush_writes_coalesced_statuses_and_stats(self, session_factory):
+        async with session_factory() as db:
+            db.add(User(id="u1", name="u1", email="u1@example.com", password_hash="x"))
+            db.add_all([
+                Project(id=f"p{i}", name=f"p{i}", user_id="u1", type="nodejs", path="/tmp",
+                        status=ProjectStatus.stopped)
+                for i in range(3)
+            ])
+            await db.commit()
+
+        sup = ProcessSupervisor(session_factory)
+        sup._queue_status("p0", ProjectStatus.running, 101)
+        sup._queue_status("p1", ProjectStatus.failed, None)
+        sup._queue_status("p1", ProjectStatus.running, 102)     # last change wins
+        sup._queue_status("missing", ProjectStatus.running, 1)
+        assert await sup.flush() == 2
+        assert sup._pending_status == {}
+
+        async with session_factory() as db:
+            rows = dict((await db.execute(select(Project.id, Project.pid))).all())
+            assert rows == {"p0": 101, "p1": 102, "p2": None}
+            stats = await db.get(UserProjectStats, "u1")
+            assert stats.successful_installs == 2
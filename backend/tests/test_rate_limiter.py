@@ -0,0 +1,109 @@
+"""
+Rate limiter tests. The Redis-backed ones need a reachable Redis (REDIS_URL)
+and are skipped otherwise; the local-tier ones mock the Redis round trip.
+"""
+import uuid
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+import redis.asyncio as aioredis
+from redis.exceptions import RedisError
+
+from app.core.config import settings
+from app.core.redis import RateLimiter
+
+
+@pytest_asyncio.fixture
+async def redis_client():
+    client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+    try:
+        await client.ping()
+    except (RedisError, OSError):
+        await client.aclose()
+        pytest.skip("Redis not available")
+    with patch("app.core.redis.get_redis", new_callable=AsyncMock, return_value=client):
+        yield client
+    await client.aclose()
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("algorithm", ["sliding_window", "gcra"])
+async def test_limit_enforced_with_retry_after(redis_client, algorithm):
+    limiter = RateLimiter(max_attempts=3, window_seconds=60, algorithm=algorithm, local_tier=False)
+    identifier = f"test:{uuid.uuid4().hex}"
+
+    for _ in range(3):
+        assert await limiter.is_allowed(identifier) == (True, 0)
+
+    allowed, retry_after = await limiter.is_allowed(identifier)
+    assert allowed is False
+    assert 1 <= retry_after <= 60
+    await redis_client.delete(limiter._key(identifier))
+
+
+@pytest.mark.asyncio
+async def test_sliding_window_does_not_record_denied_requests(redis_client):
+    limiter = RateLimiter(max_attempts=2, window_seconds=60, local_tier=False)
+    identifier = f"test:{uuid.uuid4().hex}"
+
+    for _ in range(10):
+        await limiter.is_allowed(identifier)
+
+    assert await redis_client.zcard(limiter._key(identifier)) == 2
+    await redis_client.delete(limiter._key(identifier))
+
+
+@pytest.mark.asyncio
+async def test_gcra_keeps_constant_state(redis_client):
+    limiter = RateLimiter(max_attempts=5, window_seconds=60, algorithm="gcra", local_tier=False)
+    identifier = f"test:{uuid.uuid4().hex}"
+
+    for _ in range(20):
+        await limiter.is_allowed(identifier)
+
+    key = limiter._key(identifier)
+    assert await redis_client.type(key) == "string"
+    assert 0 < await redis_client.pttl(key) <= 60_000
+    await redis_client.delete(key)
+
+
+def test_unknown_algorithm_rejected():
+    with pytest.raises(ValueError):
+        RateLimiter(max_attempts=1, window_seconds=1, algorithm="leaky")
+
+
+@pytest.mark.asyncio
+async def test_local_tier_sheds_denied_identifier_without_redis():
+    limiter = RateLimiter(max_attempts=3, window_seconds=60)
+    with patch.object(limiter, "_check_remote", new_callable=AsyncMock, return_value=(False, 30_000)) as remote:
+        assert await limiter.is_allowed("login:1.2.3.4") == (False, 30)
+        for _ in range(5):
+            allowed, retry_after = await limiter.is_allowed("login:1.2.3.4")
+            assert allowed is False and 1 <= retry_after <= 30
+        assert remote.await_count == 1
+
+        # Other identifiers are unaffected and still consult Redis
+        await limiter.is_allowed("login:5.6.7.8")
+        assert remote.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_local_tier_denies_after_local_approvals_fill_window():
+    limiter = RateLimiter(max_attempts=2, window_seconds=60)
+    with patch.object(limiter, "_check_remote", new_callable=AsyncMock, return_value=(True, 0)) as remote:
+        assert (await limiter.is_allowed("id"))[0] is True
+        assert (await limiter.is_allowed("id"))[0] is True
+        allowed, retry_after = await limiter.is_allowed("id")
+        assert allowed is False and 59 <= retry_after <= 60
+        assert remote.await_count == 2
+
+
+@pytest.mark.asyncio
+async def test_local_tier_is_bounded():
+    limiter = RateLimiter(max_attempts=1, window_seconds=60)
+    with patch.object(settings, "RATE_LIMIT_LOCAL_MAX_KEYS", 3), \
+         patch.object(limiter, "_check_remote", new_callable=AsyncMock, return_value=(False, 1000)):
+        for i in range(10):
+            await limiter.is_allowed(f"id:{i}")
+    assert len(limiter._denied_until) == 3
@@ -0,0 +1,187 @@
+"""
+Readiness prober tests.
+
+Run with:
+    pytest tests/test_readiness.py -v
+"""
+import asyncio
+import socket
+import sys
+import threading
+from unittest.mock import AsyncMock, patch
+
+import pytest
+
+from app.services.process_supervisor import ProcessSupervisor, RestartPolicy
+from app.services.readiness import ReadinessProber
+
+
+def _free_ports(n: int) -> list[int]:
+    sockets = [socket.socket() for _ in range(n)]      # held open together, so the ports are distinct
+    for s in sockets:
+        s.bind(("127.0.0.1", 0))
+    ports = [s.getsockname()[1] for s in sockets]
+    for s in sockets:
+        s.close()
+    return ports
+
+
+def _free_port() -> int:
+    return _free_ports(1)[0]
+
+
+async def _serve(port: int, status: int = 200) -> asyncio.AbstractServer:
+    async def handle(reader, writer):
+        await reader.readuntil(b"\r\n\r\n")
+        writer.write(f"HTTP/1.1 {status} X\r\nContent-Length: 0\r\nConnection: close\r\n\r\n".encode())
+        await writer.drain()
+        writer.close()
+    return await asyncio.start_server(handle, "127.0.0.1", port)
+
+
+@pytest.fixture
+def fast_backoff(monkeypatch):
+    monkeypatch.setattr("app.services.readiness.settings.READINESS_BACKOFF_INITIAL_SECONDS", 0.02)
+    monkeypatch.setattr("app.services.readiness.settings.READINESS_BACKOFF_MAX_SECONDS", 0.1)
+
+
+@pytest.mark.usefixtures("fast_backoff")
+class TestReadinessProber:
+    @pytest.mark.asyncio
+    async def test_waits_until_the_port_serves(self):
+        prober = ReadinessProber()
+        port = _free_port()
+        try:
+            waiting = asyncio.create_task(prober.wait_ready(port, timeout=5))
+            await asyncio.sleep(0.3)
+            assert not waiting.done()
+            server = await _serve(port)
+            served, latency = await waiting
+            assert served == port and latency >= 0.3
+            server.close()
+        finally:
+            await prober.close()
+
+    @pytest.mark.asyncio
+    async def test_server_errors_and_dead_processes_are_not_ready(self):
+        prober = ReadinessProber()
+        port = _free_port()
+        server = await _serve(port, status=503)
+        try:
+            assert not await prober.probe(port)
+            assert await prober.wait_ready(port, timeout=0.2) is None
+            assert await prober.wait_ready(port, alive=lambda: False) is None
+        finally:
+            server.close()
+            await prober.close()
+
+    @pytest.mark.asyncio
+    async def test_discovered_ports_are_probed_too(self):
+        prober = ReadinessProber()
+        expected, actual = _free_ports(2)
+        server = await _serve(actual)
+        loop_thread = threading.get_ident()
+        scans = []
+
+        def discover():
+            scans.append(threading.get_ident())
+            return [expected, actual]
+
+        try:
+            assert await prober.wait_ready(expected, timeout=1, discover=discover) \
+                == (actual, pytest.approx(0, abs=0.5))
+            assert len(scans) == 1 and scans[0] != loop_thread      # once, after the misses, off the loop
+        finally:
+            server.close()
+            await prober.close()
+
+    @pytest.mark.asyncio
+    async def test_probes_many_targets_through_one_client(self):
+        prober = ReadinessProber()
+        ports = _free_ports(40)
+        servers = [await _serve(p) for p in ports[::2]]
+        try:
+            waits = [prober.wait_ready(p, timeout=2) for p in ports]
+            pending = asyncio.gather(*waits)
+            await asyncio.sleep(0.4)
+            servers += [await _serve(p) for p in ports[1::2]]
+            found = await pending
+            assert all(f is not None for f in found)
+            assert [served for served, _ in found] == ports
+            latencies = [latency for _, latency in found]
+            assert min(latencies[1::2]) > 0.25 > max(latencies[::2])
+        finally:
+            for server in servers:
+                server.close()
+            await prober.close()
+
+
+@pytest.mark.usefixtures("fast_backoff")
+class TestSupervisorReadiness:
+    @pytest.mark.asyncio
+    async def test_running_only_once_the_app_serves(self, tmp_path):
+        prober = ReadinessProber()
+        sup = ProcessSupervisor()
+        sup.ready_check = prober.check
+        port = _free_port()
+        ready = []
+        command = [sys.executable, "-c",
+                   f"import time, http.server; time.sleep(0.5); "
+                   f"http.server.HTTPServer(('127.0.0.1', {port}), http.server.SimpleHTTPRequestHandler).serve_forever()"]
+        with patch("app.services.process_supervisor.port_allocator", AsyncMock()):
+            managed = await sup.start("proj_r", command, tmp_path, port=port, on_ready=ready.append)
+            await asyncio.sleep(0.3)
+            assert managed.state == "starting"
+            for _ in range(100):
+                if ready:
+                    break
+                await asyncio.sleep(0.05)
+            assert ready == [managed] and managed.state == "running"
+            assert managed.ready_latency_ms >= 500
+            assert managed.info()["ready_latency_ms"] == managed.ready_latency_ms
+            await sup.stop("proj_r", grace=2)
+        await prober.close()
+
+    @pytest.mark.asyncio
+    async def test_app_serving_on_its_own_port_is_found(self, tmp_path):
+        prober = ReadinessProber()
+        sup = ProcessSupervisor()
+        sup.ready_check = prober.check
+        allocated, own = _free_ports(2)
+        ready = []
+        command = [sys.executable, "-c",
+                   f"import http.server; "
+                   f"http.server.HTTPServer(('127.0.0.1', {own}), http.server.SimpleHTTPRequestHandler).serve_forever()"]
+        with patch("app.services.process_supervisor.port_allocator", AsyncMock()):
+            managed = await sup.start("proj_own", command, tmp_path, port=allocated, on_ready=ready.append)
+            for _ in range(100):
+                if ready:
+                    break
+                await asyncio.sleep(0.05)
+            assert managed.state == "running" and managed.listen_port == own
+            assert sup._pending_status["proj_own"]["port"] == own
+            await sup.stop("proj_own", grace=2)
+        await prober.close()
+
+    @pytest.mark.asyncio
+    async def test_app_that_never_serves_is_left_running_unready(self, tmp_path, monkeypatch):
+        monkeypatch.setattr("app.services.readiness.settings.READINESS_TIMEOUT_SECONDS", 0.3)
+        prober = ReadinessProber()
+        sup = ProcessSupervisor()
+        sup.ready_check = prober.check
+        ready = []
+        with patch("app.services.process_supervisor.port_allocator", AsyncMock()):
+            managed = await sup.start("proj_s", ["sleep", "30"], tmp_path, port=_free_port(),
+                                      policy=RestartPolicy("never"), on_ready=ready.append)
+            for _ in range(100):
+                if ready:
+                    break
+                await asyncio.sleep(0.05)
+            assert ready == [managed] and managed.state == "unready"
+            assert managed.pid is not None and not managed.task.done()
+            assert managed.ready_latency_ms is None
+            assert managed.tail[-1] == "[supervisor] not serving HTTP in time, left running as unready"
+            assert "proj_s" not in sup._pending_status                  # never queued as running
+            await sup.stop("proj_s", grace=2)
+        assert managed.state == "stopped"
+        await prober.close()
@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+from unittest.mock import patch
+
+import pytest
+from jose import jwt
+from jose.exceptions import ExpiredSignatureError, JWTError
+
+from app.core import fast_jwt, security
+from app.core.config import settings
+
+
+@pytest.fixture(autouse=True)
+def clear_token_cache():
+    security.clear_verified_token_cache()
+    yield
+    security.clear_verified_token_cache()
+
+
+def _claims(**overrides) -> dict:
+    now = datetime.now(timezone.utc)
+    claims = {"sub": "user_1", "role": "user", "iat": now, "exp": now + timedelta(minutes=5)}
+    claims.update(overrides)
+    return claims
+
+
+def test_fast_jwt_tokens_identical_to_jose():
+    claims = _claims()
+    assert fast_jwt.encode(claims, "secret", "HS256") == jwt.encode(dict(claims), "secret", algorithm="HS256")
+
+
+def test_fast_jwt_decodes_jose_tokens():
+    token = jwt.encode(_claims(), "secret", algorithm="HS256")
+    assert fast_jwt.decode(token, "secret", "HS256") == jwt.decode(token, "secret", algorithms=["HS256"])
+
+
+def test_fast_jwt_rejects_expired():
+    token = fast_jwt.encode(_claims(exp=datetime.now(timezone.utc) - timedelta(seconds=5)), "secret", "HS256")
+    with pytest.raises(ExpiredSignatureError):
+        fast_jwt.decode(token, "secret", "HS256")
+
+
+def test_fast_jwt_rejects_bad_signature_and_alg():
+    token = fast_jwt.encode(_claims(), "secret", "HS256")
+    with pytest.raises(JWTError):
+        fast_jwt.decode(token, "other-secret", "HS256")
+    with pytest.raises(JWTError):
+        fast_jwt.decode(token[:-2] + "xx", "secret", "HS256")
+    with pytest.raises(JWTError):
+        fast_jwt.decode(jwt.encode(_claims(), "secret", algorithm="HS512"), "secret", "HS256")
+    with pytest.raises(JWTError):
+        fast_jwt.decode("not-a-token", "secret", "HS256")
+
+
+def test_decode_access_token_served_from_cache():
+    token = security.create_access_token("user_1", "user")
+    first = security.decode_access_token(token)
+    with patch.object(security, "_decode_access_token_uncached", side_effect=AssertionError("cache miss")):
+        second = security.decode_access_token(token)
+    assert second == first
+    second["role"] = "admin"  # callers get a copy, never the cached dict
+    with patch.object(security, "_decode_access_token_uncached", side_effect=AssertionError("cache miss")):
+        assert security.decode_access_token(token)["role"] == "user"
+
+
+def test_decode_access_token_cache_is_bounded():
+    with patch.object(settings, "ACCESS_TOKEN_CACHE_SIZE", 2):
+        for i in range(5):
+            security.decode_access_token(security.create_access_token(f"user_{i}", "user"))
+        assert len(security._verified_tokens) == 2
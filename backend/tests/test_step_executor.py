@@ -0,0 +1,202 @@
+"""
+Setup-step DAG executor tests.
+
+Run with:
+    pytest tests/test_step_executor.py -v
+"""
+import asyncio
+import threading
+import time
+from pathlib import Path
+from unittest.mock import AsyncMock, patch
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.models import Base, ConfigurationTemplate, ErrorPattern, Project
+from app.models.project import ProjectStatus
+from app.services import error_matcher, template_index
+from app.services.step_executor import ENV_STEP, StepExecutor, build_plan, install_project
+
+
+def _deps(plan):
+    return {s.name: s.depends_on for s in plan}
+
+
+class TestBuildPlan:
+    def test_monorepo_sub_projects_are_independent(self, tmp_path):
+        (tmp_path / "frontend").mkdir()
+        (tmp_path / "backend").mkdir()
+        plan = build_plan(tmp_path, [
+            {"order": 1, "action": "install_node", "command": "Install Node.js"},
+            {"order": 2, "action": "install_python", "command": "Install Python 3.x"},
+            {"order": 3, "action": "install_deps", "command": "cd frontend && npm install"},
+            {"order": 4, "action": "install_deps", "command": "pip install -r requirements.txt", "cwd": "backend"},
+            {"order": 5, "action": "build", "command": "cd frontend && npm run build"},
+            {"order": 6, "action": "migrate", "command": "make migrate"},
+            {"order": 7, "action": "run", "command": "npm start"},
+        ], env_vars={"PORT": "3000"})
+        deps = _deps(plan)
+        checks = {"install_node", "install_python"}
+
+        assert deps[ENV_STEP] == set() and deps["install_node"] == set()
+        assert deps["install_deps (frontend)"] == checks
+        assert deps["install_deps (backend)"] == checks
+        assert deps["build (frontend)"] == checks | {ENV_STEP, "install_deps (frontend)"}
+        assert deps["migrate"] == checks | {ENV_STEP, "install_deps (frontend)",
+                                            "install_deps (backend)", "build (frontend)"}
+        assert [s.command for s in plan if s.name == "install_deps (frontend)"] == [["/bin/sh", "-c", "npm install"]]
+        assert {s.name: s.kind for s in plan}["run"] == "run"
+
+    def test_explicit_dependencies_and_cycles(self, tmp_path):
+        plan = build_plan(tmp_path, [
+            {"order": 1, "action": "a", "command": "true"},
+            {"order": 2, "action": "b", "command": "true", "depends_on": []},
+        ])
+        assert _deps(plan) == {"a": set(), "b": set()}
+        with pytest.raises(ValueError):
+            build_plan(tmp_path, [
+                {"order": 1, "action": "a", "command": "true", "depends_on": [2]},
+                {"order": 2, "action": "b", "command": "true", "depends_on": [1]},
+            ])
+
+
+class TestStepExecutor:
+    @pytest.mark.asyncio
+    async def test_independent_steps_run_in_parallel(self, tmp_path):
+        plan = build_plan(tmp_path, [
+            {"order": i, "action": "sleep", "command": "sleep 0.5", "depends_on": []} for i in (1, 2, 3)
+        ])
+        start = time.monotonic()
+        results = await StepExecutor(max_parallel=3).run(plan)
+        assert time.monotonic() - start < 1.2
+        assert {r.status for r in results.values()} == {"finished"}
+
+    @pytest.mark.asyncio
+    async def test_failure_skips_dependents_only(self, tmp_path):
+        (tmp_path / "a").mkdir()
+        (tmp_path / "b").mkdir()
+        lines = []
+        plan = build_plan(tmp_path, [
+            {"order": 1, "action": "install_deps", "command": "echo broken; exit 3", "cwd": "a"},
+            {"order": 2, "action": "build", "command": "echo never", "cwd": "a"},
+            {"order": 3, "action": "install_deps", "command": "printf 'one\\rtwo\\n'", "cwd": "b"},
+        ])
+        results = await StepExecutor(on_line=lambda step, line: lines.append((step.name, line))).run(plan)
+        assert {n: (r.status, r.exit_code) for n, r in results.items()} == {
+            "install_deps (a)": ("failed", 3),
+            "build (a)": ("skipped", None),
+            "install_deps (b)": ("finished", 0),
+        }
+        assert sorted(lines) == [("install_deps (a)", "broken"), ("install_deps (b)", "one"), ("install_deps (b)", "two")]
+
+    @pytest.mark.asyncio
+    async def test_cancellation_kills_running_processes(self, tmp_path):
+        cancelled = threading.Event()
+        started = []
+        plan = build_plan(tmp_path, [{"order": 1, "action": "install_deps", "command": "sleep 30"},
+                                     {"order": 2, "action": "build", "command": "true"}])
+        executor = StepExecutor(is_cancelled=cancelled.is_set, on_process_start=started.append)
+        asyncio.get_running_loop().call_later(0.3, cancelled.set)
+        start = time.monotonic()
+        results = await executor.run(plan)
+        assert time.monotonic() - start < 5
+        assert results["install_deps"].status == "cancelled"
+        assert results["build"].status in ("cancelled", "skipped")
+        assert started and started[0].poll() is not None
+
+
+@pytest_asyncio.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    template_index.clear_template_index()
+    error_matcher.clear_matcher_cache()
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    template_index.clear_template_index()
+    error_matcher.clear_matcher_cache()
+    await engine.dispose()
+
+
+class TestInstallProject:
+    @pytest.mark.asyncio
+    async def test_success_is_recorded_and_learned(self, db, tmp_path):
+        project = Project(id="proj_ok", name="ok", type="nodejs", path=str(tmp_path), metadata_={
+            "detected_pm": "npm",
+            "steps": [{"order": 1, "action": "install_deps", "command": "echo installed"},
+                      {"order": 2, "action": "run", "command": "npm start"}],
+            "env_vars": {"PORT": "3000", "DATABASE_URL": "postgres://me:pw@db/app"},
+        })
+        db.add(project)
+        await db.commit()
+
+        with patch("app.services.error_matcher.get_redis", return_value=AsyncMock()):
+            history = await install_project(db, project)
+
+        assert history.success is True and history.errors == []
+        assert {s["name"]: s["status"] for s in history.steps} == {
+            ENV_STEP: "finished", "install_deps": "finished", "run": "deferred",
+        }
+        assert (tmp_path / ".env").read_text() == "PORT=3000\nDATABASE_URL=postgres://me:pw@db/app\n"
+        await db.refresh(project)
+        assert project.status == ProjectStatus.stopped
+        template = (await db.execute(select(ConfigurationTemplate))).scalar_one()
+        assert (template.project_type, template.framework, template.success_count) == ("nodejs", "npm", 1)
+        assert template.template["env_vars"] == ["DATABASE_URL", "PORT"]     # values stay in the project
+
+    @pytest.mark.asyncio
+    async def test_failure_reports_matches_and_clusters_unknown_errors(self, db, tmp_path):
+        (tmp_path / "web").mkdir()
+        (tmp_path / "api").mkdir()
+        db.add(ErrorPattern(signature="EADDRINUSE", category="port", project_type="nodejs"))
+        project = Project(id="proj_bad", name="bad", type="nodejs", path=str(tmp_path), metadata_={
+            "steps": [
+                {"order": 1, "action": "install_deps", "command": "echo 'listen EADDRINUSE :3000'; exit 1", "cwd": "web"},
+                {"order": 2, "action": "install_deps", "command": "echo 'fatal: lockfile is corrupt'; exit 2", "cwd": "api"},
+            ],
+        })
+        db.add(project)
+        await db.commit()
+
+        redis = AsyncMock()
+        with patch("app.services.error_matcher.get_redis", return_value=redis):
+            history = await install_project(db, project)
+
+        assert history.success is False
+        matched = [e for e in history.errors if "pattern_id" in e]
+        assert [(e["step"], e["category"]) for e in matched] == [("install_deps (web)", "port")]
+        failed = {e["step"]: e["exit_code"] for e in history.errors if "exit_code" in e}
+        assert failed == {"install_deps (web)": 1, "install_deps (api)": 2}
+        await db.refresh(project)
+        assert project.status == ProjectStatus.failed
+        signatures = (await db.execute(select(ErrorPattern.signature))).scalars().all()
+        assert len(signatures) == 2 and any("lockfile" in s for s in signatures)
+        redis.incr.assert_awaited()          # matchers told to reload
+
+
+class TestBackgroundInstall:
+    @pytest.mark.asyncio
+    async def test_missing_project_or_bad_plan_completes_the_task_as_failed(self, tmp_path):
+        from app.api.routes import projects as routes
+
+        engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        sessions = async_sessionmaker(engine, expire_on_commit=False)
+        async with sessions() as db:
+            db.add(Project(id="proj_plan", name="p", type="nodejs", path=str(tmp_path), metadata_={}))
+            await db.commit()
+
+        with patch.object(routes, "AsyncSessionLocal", sessions):
+            await routes._run_install("proj_gone", "task_gone")
+            with patch.object(routes, "build_plan", side_effect=ValueError("cyclic steps")):
+                await routes._run_install("proj_plan", "task_plan")
+        await engine.dispose()
+
+        gone, bad = routes.TASK_PROGRESS.pop("task_gone"), routes.TASK_PROGRESS.pop("task_plan")
+        assert (gone["stage"], gone["done"], gone["error"]) == ("failed", True, "project_not_found")
+        assert (bad["stage"], bad["done"], bad["error"]) == ("failed", True, "cyclic steps")
@@ -0,0 +1,131 @@
+"""
+Configuration-template index tests.
+
+Run with:
+    pytest tests/test_template_index.py -v
+"""
+from pathlib import Path
+
+import pytest
+import pytest_asyncio
+from sqlalchemy import delete, update
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from app.core.analysis.project_analyzer import ProjectInfo
+from app.core.config import settings
+from app.models import Base, ConfigurationTemplate
+from app.services import template_index
+from app.services.template_index import (
+    TemplateIndex,
+    apply_template,
+    find_template,
+    get_template_index,
+    learn_template,
+    record_template_outcome,
+)
+
+NPM_STEPS = [{"order": 1, "action": "install_deps", "command": "npm ci"}]
+
+
+def _template(id, success, uses, project_type="nodejs", framework="npm", steps=NPM_STEPS, **extra):
+    return ConfigurationTemplate(
+        id=id, project_type=project_type, framework=framework,
+        template={"steps": steps, **extra}, success_count=success, use_count=uses,
+    )
+
+
+class TestRanking:
+    def test_smoothing_prefers_evidence_over_single_success(self):
+        index = TemplateIndex()
+        index.apply([_template(1, 1, 1), _template(2, 40, 42)])
+        assert [t.id for t in index.ranked("nodejs", "npm")] == [2, 1]
+        assert index.best("nodejs", "npm").id == 2
+
+    def test_min_score_and_framework_fallback(self):
+        index = TemplateIndex()
+        index.apply([_template(1, 0, 5), _template(2, 9, 9, framework=None)])
+        assert index.best("nodejs", "npm").id == 2          # npm template is below the bar
+        assert index.best("nodejs", "npm", min_score=0.0).id == 1
+        assert index.best("python", "pip") is None
+        assert index.best(None, None) is None
+
+    def test_apply_moves_rows_between_buckets(self):
+        index = TemplateIndex()
+        index.apply([_template(1, 9, 9)])
+        index.apply([_template(1, 9, 9, framework="yarn")])
+        assert index.ranked("nodejs", "npm") == []
+        assert [t.id for t in index.ranked("nodejs", "yarn")] == [1]
+        assert len(index) == 1
+
+    def test_apply_template_keeps_detected_constraints(self):
+        info = ProjectInfo(types=[], path=Path("."), version_constraints={"node": ">=20"})
+        index = TemplateIndex()
+        index.apply([_template(1, 9, 9, env_vars={"PORT": "3000", "API_KEY": "secret"},
+                              version_constraints={"node": ">=18", "npm": ">=9"})])
+        info.env_vars = {"PORT": "8080"}
+        info = apply_template(info, index.best("nodejs", "npm"))
+        assert info.steps == NPM_STEPS
+        assert info.env_vars == {"PORT": "8080", "API_KEY": ""}        # names only, never values
+        assert info.version_constraints == {"node": ">=20", "npm": ">=9"}
+
+
+@pytest_asyncio.fixture
+async def db():
+    engine = create_async_engine("sqlite+aiosqlite:///:memory:")
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
+    template_index.clear_template_index()
+    async with async_sessionmaker(engine, expire_on_commit=False)() as session:
+        yield session
+    template_index.clear_template_index()
+    await engine.dispose()
+
+
+class TestIndexRefresh:
+    @pytest.mark.asyncio
+    async def test_incremental_refresh_and_outcomes(self, db, monkeypatch):
+        db.add_all([_template(1, 2, 2), _template(2, 0, 0, project_type="python", framework="pip")])
+        await db.commit()
+
+        assert (await find_template(db, "nodejs", "npm")) is None       # (2+1)/(2+2) < 0.8
+        await record_template_outcome(db, 1, success=True)
+        await db.commit()
+        found = await find_template(db, "nodejs", "npm")                 # applied without a refresh
+        assert (found.id, found.use_count, found.success_count) == (1, 3, 3)
+
+        # Another process bumps template 2; picked up once the refresh interval passes
+        await db.execute(
+            update(ConfigurationTemplate).where(ConfigurationTemplate.id == 2)
+            .values(success_count=9, use_count=9)
+        )
+        await db.commit()
+        assert (await find_template(db, "python", "pip")) is None       # still within the interval
+        monkeypatch.setattr(settings, "TEMPLATE_INDEX_REFRESH_SECONDS", 0.0)
+        assert (await find_template(db, "python", "pip")).id == 2
+        assert len(await get_template_index(db)) == 2
+
+    @pytest.mark.asyncio
+    async def test_rolled_back_outcomes_never_reach_the_index(self, db):
+        db.add(_template(1, 2, 2))
+        await db.commit()
+        index = await get_template_index(db)
+
+        await record_template_outcome(db, 1, success=False)
+        new_id = await learn_template(db, "python", "pip", {"steps": [{"order": 1, "command": "pip install ."}]})
+        assert index.ranked("nodejs", "npm")[0].use_count == 2 and not index.ranked("python", "pip")
+        await db.rollback()
+        assert index.ranked("nodejs", "npm")[0].use_count == 2 and not index.ranked("python", "pip")
+        assert new_id is not None and len(index) == 1
+
+    @pytest.mark.asyncio
+    async def test_deleted_templates_are_evicted_on_refresh(self, db, monkeypatch):
+        db.add_all([_template(1, 9, 9), _template(2, 9, 9, framework="yarn")])
+        await db.commit()
+        assert len(await get_template_index(db)) == 2
+
+        await db.execute(delete(ConfigurationTemplate).where(ConfigurationTemplate.id == 1))
+        await db.commit()
+        monkeypatch.setattr(settings, "TEMPLATE_INDEX_REFRESH_SECONDS", 0.0)
+        index = await get_template_index(db)
+        assert len(index) == 1 and index.ranked("nodejs", "npm") == []
+        assert (await find_template(db, "nodejs", "npm")) is None